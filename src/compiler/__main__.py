@@ -1,15 +1,22 @@
 import sys
+from typing import Dict
 from compiler.assembler import assemble
 from compiler.ast import Module
 from compiler.interpreter import interpret_module
-from compiler.ir import generate_root_var_types
+from compiler.ir import Instruction, generate_root_var_types
+from compiler.ir_binary import read_ir_file, write_ir_file
 from compiler.tokenizer import tokenize
 from compiler.parser import parse
 from compiler.ir_generator import generate_ir
 from compiler.type_checker import typecheck_module
 from compiler.types import get_global_symbol_table, get_global_symbol_table_types
 from compiler.assembly_generator import generate_ns_assembly
-from compiler.dataflow import DataFlow, generate_blocks, generate_flow_graph
+from compiler.cfg import ControlFlowGraph
+from compiler.dataflow import ReachingDefinitions
+from compiler.inliner import DEFAULT_INLINE_BUDGET
+from compiler.optimizer import optimize
+from compiler.tiered import TieredRunner
+from compiler.unrolling import DEFAULT_UNROLL_BUDGET
 
 usage = f"""
 Usage: {sys.argv[0]} <command> [source_code_file]
@@ -17,8 +24,17 @@ Usage: {sys.argv[0]} <command> [source_code_file]
 Command 'interpret':
     Runs the interpreter on source code.
 
+Command 'tiered':
+    Runs the interpreter on source code, compiling hot functions to native code.
+
 Common arguments:
     source_code_file        Optional. Defaults to standard input if missing.
+    -O0, -O1, -O2           Optional. Optimization level for 'compile', 'asm' and 'ir'. Defaults to -O0.
+    --inline-budget=N       Optional. How many instructions inlining a function may add at -O2. 0 turns inlining off.
+    --unroll-budget=N       Optional. How many instructions unrolling a loop may add at -O2. 0 turns unrolling off.
+    --time-passes           Optional. Reports the time and IR size of every optimization pass on standard error.
+    --emit-ir-bin=FILE      Optional. Writes the IR of 'compile', 'asm' and 'ir' to FILE in the binary IR format.
+    --from-ir-bin=FILE      Optional. Reads the IR for 'compile', 'asm' and 'ir' from a binary IR file instead of source code.
  """.strip() + "\n"
 
 def tokenize_parse_and_typecheck(inpt: str) -> Module:
@@ -29,10 +45,28 @@ def tokenize_parse_and_typecheck(inpt: str) -> Module:
 def main() -> int:
     command: str | None = None
     input_file: str | None = None
+    optimization_level = 0
+    inline_budget = DEFAULT_INLINE_BUDGET
+    unroll_budget = DEFAULT_UNROLL_BUDGET
+    time_passes = False
+    emit_ir_bin: str | None = None
+    from_ir_bin: str | None = None
     for arg in sys.argv[1:]:
         if arg in ['-h', '--help']:
             print(usage)
             return 0
+        elif arg in ['-O0', '-O1', '-O2']:
+            optimization_level = int(arg[2:])
+        elif arg == '--time-passes':
+            time_passes = True
+        elif arg.startswith('--inline-budget='):
+            inline_budget = int(arg[len('--inline-budget='):])
+        elif arg.startswith('--unroll-budget='):
+            unroll_budget = int(arg[len('--unroll-budget='):])
+        elif arg.startswith('--emit-ir-bin='):
+            emit_ir_bin = arg[len('--emit-ir-bin='):]
+        elif arg.startswith('--from-ir-bin='):
+            from_ir_bin = arg[len('--from-ir-bin='):]
         elif arg.startswith('-'):
             raise Exception(f"Unknown argument: {arg}")
         elif command is None:
@@ -49,22 +83,33 @@ def main() -> int:
         else:
             return sys.stdin.read()
 
+    def build_ir() -> Dict[str, list[Instruction]]:
+        if from_ir_bin is not None:
+            ins = read_ir_file(from_ir_bin)
+        else:
+            ins = generate_ir(generate_root_var_types(), tokenize_parse_and_typecheck(read_source_code()))
+        ins = optimize(ins, optimization_level, inline_budget, unroll_budget, time_passes)
+        if emit_ir_bin is not None:
+            write_ir_file(emit_ir_bin, ins)
+        return ins
+
     if command is None:
         print(f"Error: command argument missing\n\n{usage}", file=sys.stderr)
         return 1
     if command == 'interpret':
         source = parse(tokenize(read_source_code()))
         interpret_module(source, get_global_symbol_table())
+    elif command == 'tiered':
+        source = tokenize_parse_and_typecheck(read_source_code())
+        TieredRunner().run(source)
     elif command == 'parse':
         parse(tokenize(read_source_code()))
     elif command == 'compile':
-        source = tokenize_parse_and_typecheck(read_source_code())
-        ins = generate_ir(generate_root_var_types(),source)
-        asm = generate_ns_assembly(ins)
+        ins = build_ir()
+        asm = generate_ns_assembly(ins, reduce_strength=optimization_level >= 1)
         assemble(asm, 'out')
     elif command == 'ir':
-        source = tokenize_parse_and_typecheck(read_source_code())
-        ins = generate_ir(generate_root_var_types(),source)
+        ins = build_ir()
         for k, v in ins.items():
             print(f'{k}:')
             for i in v:
@@ -75,28 +120,23 @@ def main() -> int:
         source = tokenize_parse_and_typecheck(read_source_code())
         ins = generate_ir(generate_root_var_types(),source)
 
-        print()
-        blocks = generate_blocks(ins)
-        for k, bs in blocks.items():
-            for b in bs:
-                print('Printing block')
-                print(''.join(i[0].__str__()+'\n' for i in b))
-
-        graph = generate_flow_graph(blocks)
-
-        for l, g in graph.items():
-            print('------------')
-            print('Node label: ' + l + '\n')
-            print('Block: \n' + ''.join(i[0].__str__()+'\n' for i in g['block']))
-            print('Edges: \n' + ''.join(j+' ' for j in g['edges']))
-            print()
+        for name, instructions in ins.items():
+            cfg = ControlFlowGraph(instructions)
+            print(f'{name}:')
+            for b, block in enumerate(cfg.blocks):
+                label = cfg.labels[b]
+                print('------------')
+                print(f'Block {b}' + (f' ({label.name})' if label is not None else '') + '\n')
+                print(''.join(insn.__str__()+'\n' for insn in block))
+                print('Predecessors: ' + ' '.join(str(p) for p in cfg.predecessors[b]))
+                print('Successors: ' + ' '.join(str(s) for s in cfg.successors[b]))
+                print()
 
     elif command == 'dataflow':
         source = tokenize_parse_and_typecheck(read_source_code())
         ins = generate_ir(generate_root_var_types(),source)
-        blocks = generate_blocks(ins)
 
-        dataflow = DataFlow(blocks)
+        dataflow = ReachingDefinitions(ins)
 
         dataflow.compute()
         print('Input flows')
@@ -106,9 +146,8 @@ def main() -> int:
         dataflow.print_out_flows()
 
     elif command == 'asm':
-        source = tokenize_parse_and_typecheck(read_source_code())
-        ins = generate_ir(generate_root_var_types(),source)
-        asm = generate_ns_assembly(ins)
+        ins = build_ir()
+        asm = generate_ns_assembly(ins, reduce_strength=optimization_level >= 1)
         print(asm)
     elif command == 'tc':
         print(tokenize_parse_and_typecheck(read_source_code()))
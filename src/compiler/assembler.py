@@ -34,6 +34,31 @@ def assemble(
             ['ld', '-o' + output_file, *linker_flags, stdlib_obj, program_obj], check=True)
 
 
+def assemble_shared_object(
+    assembly_code: str,
+    output_file: str,
+    workdir: str | None = None,
+    tempfile_basename: str = 'program',
+) -> None:
+    """Invokes 'as' and 'ld' to generate a shared object that can be loaded with ctypes.
+
+    The standard library is not linked in, so the code must not call
+    'print_int', 'print_bool' or 'read_int'."""
+    cm: ContextManager[str] = nullcontext(
+        workdir) if workdir is not None else tempfile.TemporaryDirectory(prefix='compiler_')  # type: ignore
+    with cm as workdir:
+        program_asm = path.join(workdir, f'{tempfile_basename}.s')
+        program_obj = path.join(workdir, f'{tempfile_basename}.o')
+        with open(program_asm, 'w') as f:
+            f.write(assembly_code)
+        subprocess.run(['as', '-g', '-o' +
+                        program_obj, program_asm], check=True)
+        # '-Bsymbolic' binds calls between our own functions locally,
+        # so nothing already loaded in the process can interpose them
+        subprocess.run(
+            ['ld', '-shared', '-Bsymbolic', '-o' + output_file, program_obj], check=True)
+
+
 stdlib_asm_code: str = """
     .global _start
     .global print_int
@@ -1,19 +1,19 @@
 from typing import Dict
-from compiler.ir import CopyPointer, Instruction, IRVar, Label, LoadBoolParam, LoadIntConst, Jump, LoadBoolConst, Copy, CondJump, Call, LoadIntParam, LoadPointerParam, ReturnValue
-from dataclasses import fields
+from compiler.ir import CopyPointer, Instruction, IRVar, Label, LoadBoolParam, LoadIntConst, Jump, JumpTable, LoadBoolConst, Copy, CondJump, Call, LoadIntParam, LoadPointerParam, NameTable, Phi, ReturnValue, Select, constant_values
 from compiler.intrinsics import all_intrinsics, IntrinsicArgs
+from compiler.ranges import nonnegative_dividends
 from compiler.types import get_global_symbol_table_types
 
 class Locals:
     """Knows the memory location of every local variable."""
-    _var_to_location: dict[str, str]
+    _var_to_location: dict[IRVar, str]
     _stack_used: int
 
     def __init__(self, variables: list[IRVar]) -> None:
         start_loc = -8
         self._var_to_location = {}
         for var in variables:
-            self._var_to_location[var.name] = str(start_loc)+'(%rbp)'
+            self._var_to_location[var] = str(start_loc)+'(%rbp)'
             start_loc += -8
         
         self._stack_used = -1*start_loc-8
@@ -21,7 +21,7 @@ class Locals:
     def get_ref(self, v: IRVar) -> str:
         """Returns an Assembly reference like `-24(%rbp)`
         for the memory location that stores the given variable"""
-        return self._var_to_location[v.name]
+        return self._var_to_location[v]
 
     def stack_used(self) -> int:
         """Returns the number of bytes of stack space needed for the local variables."""
@@ -29,25 +29,8 @@ class Locals:
 
 def get_all_ir_variables(instructions: list[Instruction]) -> list[IRVar]:
     roots = get_global_symbol_table_types()
-    result_list: list[IRVar] = []
-    result_set: set[IRVar] = set()
-
-    def add(v: IRVar) -> None:
-        # we need to make sure we don't add globals to the stack
-        if (v not in result_set) and (v.name not in roots.bindings.keys()):
-            result_list.append(v)
-            result_set.add(v)
-
-    for insn in instructions:
-        for field in fields(insn):
-            value = getattr(insn, field.name)
-            if isinstance(value, IRVar):
-                add(value)
-            elif isinstance(value, list):
-                for v in value:
-                    if isinstance(v, IRVar):
-                        add(v)
-    return result_list 
+    # we need to make sure we don't add globals to the stack
+    return [v for v in NameTable(instructions).variables if v.name not in roots.bindings]
 
 def emit_global(ns: list[str]) -> str:
     lines = []
@@ -64,15 +47,15 @@ def emit_global(ns: list[str]) -> str:
 
     return ''.join(line+'\n' for line in lines)
 
-def generate_ns_assembly(ns_ins: Dict[str, list[Instruction]]) -> str:
+def generate_ns_assembly(ns_ins: Dict[str, list[Instruction]], reduce_strength: bool = False, entry: str = 'main') -> str:
     assembly = []
     for k, v in ns_ins.items():
-        assembly.append(generate_assembly(k,v))
+        assembly.append(generate_assembly(k,v,reduce_strength,entry))
 
     # python doesn't understand what dict_keys is, so I just ignore this
     return emit_global(ns_ins.keys())+''.join(ass+'\n' for ass in assembly) # type: ignore[arg-type]
 
-def generate_assembly(ns:str, instructions: list[Instruction]) -> str:
+def generate_assembly(ns:str, instructions: list[Instruction], reduce_strength: bool = False, entry: str = 'main') -> str:
     lines = []
     param_registers = ['%rdi', '%rsi', '%rdx', '%rcx', '%r8', '%r9']
     param_count = 0
@@ -87,6 +70,22 @@ def generate_assembly(ns:str, instructions: list[Instruction]) -> str:
         variables=vars
     )
 
+    def falls_through_to(i: int, label: Label) -> bool:
+        return i+1 < len(instructions) and isinstance(instructions[i+1], Label) and instructions[i+1] == label
+
+    # Intrinsics use cheaper instructions when they know an operand
+    constants = constant_values(instructions) if reduce_strength else {}
+    def constant(v: IRVar) -> int | None:
+        value = constants.get(v)
+        return value if type(value) is int else None
+
+    # Powers of two divide dividends that are never negative without a sign fix-up
+    divides = reduce_strength and any(isinstance(insn, Call) and insn.fun.name in ['/', '%'] for insn in instructions)
+    nonnegative = nonnegative_dividends(instructions) if divides else set()
+
+    # Selecting between a boolean and a constant is an `and` or an `or`
+    select_constants = constant_values(instructions) if any(isinstance(insn, Select) for insn in instructions) else {}
+
     emit(f'{ns}:')
     emit(f'pushq %rbp')
     emit(f'movq %rsp, %rbp')
@@ -95,12 +94,12 @@ def generate_assembly(ns:str, instructions: list[Instruction]) -> str:
     emit(f'.L{ns}_start:')
     emit('')
 
-    for insn in instructions:
+    for i, insn in enumerate(instructions):
         if (not isinstance(insn, LoadIntParam) and not isinstance(insn, LoadBoolParam) and not isinstance(insn, LoadPointerParam)) and loading_stack_variables:
             addresses = [addr for _, addr in stack_vars]
             addresses.reverse()
-            for i, var in enumerate(stack_vars):
-                emit(f'movq {addresses[i]}(%rbp), %rax')
+            for j, var in enumerate(stack_vars):
+                emit(f'movq {addresses[j]}(%rbp), %rax')
                 emit(f'movq %rax, {locals.get_ref(var[0].dest)}')
             stack_vars = []
             loading_stack_variables = False
@@ -123,6 +122,18 @@ def generate_assembly(ns:str, instructions: list[Instruction]) -> str:
             case Copy():
                 emit(f'movq {locals.get_ref(insn.source)}, %rax')
                 emit(f'movq %rax, {locals.get_ref(insn.dest)}')
+            case Select():
+                if select_constants.get(insn.if_false) is False:
+                    emit(f'movq {locals.get_ref(insn.cond)}, %rax')
+                    emit(f'andq {locals.get_ref(insn.if_true)}, %rax')
+                elif select_constants.get(insn.if_true) is True:
+                    emit(f'movq {locals.get_ref(insn.cond)}, %rax')
+                    emit(f'orq {locals.get_ref(insn.if_false)}, %rax')
+                else:
+                    emit(f'movq {locals.get_ref(insn.if_false)}, %rax')
+                    emit(f'cmpq $0, {locals.get_ref(insn.cond)}')
+                    emit(f'cmovneq {locals.get_ref(insn.if_true)}, %rax')
+                emit(f'movq %rax, {locals.get_ref(insn.dest)}')
             case CopyPointer():
                 emit(f'movq {locals.get_ref(insn.source)}, %rax')
                 emit(f'movq {locals.get_ref(insn.dest)}, %rbx')
@@ -147,17 +158,47 @@ def generate_assembly(ns:str, instructions: list[Instruction]) -> str:
                     stack_arg_address += 8
                 param_count += 1
             case Jump():
-                emit(f'jmp .L{ns}_{insn.label.name}')
+                if not falls_through_to(i, insn.label):
+                    emit(f'jmp .L{ns}_{insn.label.name}')
             case CondJump():
                 emit(f'cmpq $0, {locals.get_ref(insn.cond)}')
-                emit(f'jne .L{ns}_{insn.then_label.name}')
-                emit(f'jmp .L{ns}_{insn.else_label.name}')
+                # Branch on whichever condition lets the next block fall through
+                if falls_through_to(i, insn.else_label):
+                    emit(f'jne .L{ns}_{insn.then_label.name}')
+                elif falls_through_to(i, insn.then_label):
+                    emit(f'je .L{ns}_{insn.else_label.name}')
+                else:
+                    emit(f'jne .L{ns}_{insn.then_label.name}')
+                    emit(f'jmp .L{ns}_{insn.else_label.name}')
+            case JumpTable():
+                # One unsigned comparison catches values on both sides of the table
+                emit(f'movq {locals.get_ref(insn.value)}, %rax')
+                if -2**31 <= insn.low < 2**31:
+                    emit(f'subq ${insn.low}, %rax')
+                else:
+                    emit(f'movabsq ${insn.low}, %rcx')
+                    emit(f'subq %rcx, %rax')
+                emit(f'cmpq ${len(insn.labels) - 1}, %rax')
+                emit(f'ja .L{ns}_{insn.default.name}')
+                # Entries are offsets from the table, which keeps it position independent
+                emit(f'leaq .L{ns}_table{i}(%rip), %rcx')
+                emit(f'movslq (%rcx,%rax,4), %rdx')
+                emit(f'addq %rcx, %rdx')
+                emit(f'jmp *%rdx')
+                emit('.section .rodata')
+                emit('.align 4')
+                emit(f'.L{ns}_table{i}:')
+                for label in insn.labels:
+                    emit(f'.long .L{ns}_{label.name} - .L{ns}_table{i}')
+                emit('.section .text')
             case Call():
                 if insn.fun.name in all_intrinsics:
                     all_intrinsics[insn.fun.name](IntrinsicArgs(
                         arg_refs=[locals.get_ref(arg) for arg in insn.args],
                         result_register='%rax',
-                        emit=emit
+                        emit=emit,
+                        arg_constants=[constant(arg) for arg in insn.args],
+                        arg_nonnegative=[i in nonnegative]
                     ))
                 elif insn.fun.name == 'print_int' or insn.fun.name == 'print_bool':
                     emit(f'movq {locals.get_ref(insn.args[0])}, %rdi')
@@ -181,10 +222,14 @@ def generate_assembly(ns:str, instructions: list[Instruction]) -> str:
 
                 emit(f'movq %rax, {locals.get_ref(insn.dest)}')
             case ReturnValue():
-                if ns == 'main':
+                if ns == entry:
                     emit(f'movq $0, %rax')
                 else:
                     emit(f'movq {locals.get_ref(insn.var)}, %rax')
+                if i+1 < len(instructions):
+                    emit(f'jmp .L{ns}_end')
+            case Phi():
+                raise Exception('Phi instructions must be removed before generating assembly')
 
     emit('')
     emit(f'.L{ns}_end:')
@@ -0,0 +1,97 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable
+from compiler.ast import Module
+from compiler.interpreter import Evaluation, Function, evaluate_module
+from compiler.types import SymbolTable, Value, get_global_symbol_table
+
+DEFAULT_STEP_BUDGET = 1_000_000
+
+class StepBudgetExceeded(Exception):
+    """Raised when a program takes more steps than its budget allows."""
+
+@dataclass
+class ProgramStreams:
+    """Asynchronous standard input and output of a single program."""
+    read_line: Callable[[], Awaitable[str]]
+    write: Callable[[str], Awaitable[None]]
+
+class AsyncFunction(Function):
+    """A function of a program run by an `AsyncInterpreter`, which gives control
+    back to the event loop every time it is called."""
+
+    def call(self, *args: Value) -> Evaluation:
+        yield None
+        return (yield from super().call(*args))
+
+class AsyncInterpreter:
+    """Interprets a single program as a coroutine.
+
+    The program's evaluation gives control back to the event loop on every `while`
+    back-edge, every user function call and every `read_int` and print, so many
+    programs can share one event loop fairly. Every back-edge and call counts as
+    a step against `budget`."""
+    streams: ProgramStreams
+    budget: int
+    steps: int
+
+    def __init__(self, streams: ProgramStreams, budget: int = DEFAULT_STEP_BUDGET) -> None:
+        self.streams = streams
+        self.budget = budget
+        self.steps = 0
+
+    def step(self) -> None:
+        self.steps += 1
+        if self.steps > self.budget:
+            raise StepBudgetExceeded(f'Program exceeded its budget of {self.budget} steps')
+
+    async def read_int(self) -> int:
+        return int(await self.streams.read_line())
+
+    async def interpret_module(self, module: Module, root_table: SymbolTable | None = None) -> Value:
+        if root_table is None:
+            root_table = get_global_symbol_table()
+        root_table.add_local('print_int', lambda x: self.streams.write(f'{int(x)}\n'))
+        root_table.add_local('print_bool', lambda x: self.streams.write(f'{bool(x)}\n'))
+        root_table.add_local('read_int', self.read_int)
+
+        evaluation = evaluate_module(module, root_table, AsyncFunction)
+        reply: Value = None
+        error: Exception | None = None
+        try:
+            while True:
+                try:
+                    request = evaluation.throw(error) if error is not None else evaluation.send(reply)
+                except StopIteration as e:
+                    return e.value
+                reply, error = None, None
+                if request is None:
+                    self.step()
+                    await asyncio.sleep(0)
+                    continue
+                try:
+                    reply = await request
+                except Exception as e:
+                    # The program sees the failure where it called the built-in
+                    error = e
+        finally:
+            evaluation.close()
+
+async def run_programs(
+    programs: Iterable[tuple[Module, ProgramStreams]],
+    budget: int = DEFAULT_STEP_BUDGET,
+    max_concurrent: int | None = None
+) -> list[Value | BaseException]:
+    """Runs many programs concurrently on the current event loop.
+
+    Returns the result of every program in order, or the exception that stopped it,
+    so one failing or runaway program does not affect the others."""
+    limit = asyncio.Semaphore(max_concurrent) if max_concurrent is not None else None
+
+    async def run(module: Module, streams: ProgramStreams) -> Value:
+        if limit is None:
+            return await AsyncInterpreter(streams, budget).interpret_module(module)
+        async with limit:
+            return await AsyncInterpreter(streams, budget).interpret_module(module)
+
+    return await asyncio.gather(*(run(module, streams) for module, streams in programs), return_exceptions=True)
@@ -0,0 +1,157 @@
+from compiler.ir import CondJump, Instruction, Jump, JumpTable, Label, ReturnValue, targets
+
+# Instructions after which execution never continues with the next instruction
+terminators = (Jump, CondJump, JumpTable, ReturnValue)
+
+class ControlFlowGraph:
+    """Basic blocks of a single function and the edges between them.
+
+    Blocks are numbered in program order and block 0 is the entry.
+    A block starts at a label or right after a terminator, and `labels[b]`
+    is None for a block that does not start with a label. Everything is
+    computed once, in time linear in the number of instructions."""
+    blocks: list[list[Instruction]]
+    # The position in the instruction list of the first instruction of every block
+    starts: list[int]
+    labels: list[Label | None]
+    block_of_label: dict[str, int]
+    successors: list[list[int]]
+    predecessors: list[list[int]]
+    # The position of every block in reverse postorder, -1 for unreachable blocks
+    rpo_number: list[int]
+    _postorder: list[int]
+
+    def __init__(self, instructions: list[Instruction]) -> None:
+        self.blocks = []
+        self.starts = [0]
+        block: list[Instruction] = []
+        for i, insn in enumerate(instructions):
+            if isinstance(insn, Label) and block:
+                self.blocks.append(block)
+                self.starts.append(i)
+                block = []
+            block.append(insn)
+            if isinstance(insn, terminators):
+                self.blocks.append(block)
+                self.starts.append(i+1)
+                block = []
+        if block or not self.blocks:
+            self.blocks.append(block)
+        else:
+            self.starts.pop()
+
+        self.labels = [b[0] if b and isinstance(b[0], Label) else None for b in self.blocks]
+        self.block_of_label = {l.name: i for i, l in enumerate(self.labels) if l is not None}
+
+        self.successors = [[] for _ in self.blocks]
+        self.predecessors = [[] for _ in self.blocks]
+        for i, b in enumerate(self.blocks):
+            succs: list[int] = []
+            last = b[-1] if b else None
+            if last is not None:
+                for label in targets(last):
+                    target = self.block_of_label[label.name]
+                    if target not in succs:
+                        succs.append(target)
+            if not isinstance(last, terminators) and i+1 < len(self.blocks):
+                succs.append(i+1)
+            self.successors[i] = succs
+            for s in succs:
+                self.predecessors[s].append(i)
+
+        # Searching successors last to first puts the body of a loop right after its condition
+        self._postorder = []
+        visited = [False] * len(self.blocks)
+        visited[0] = True
+        stack = [(0, reversed(self.successors[0]))]
+        while stack:
+            current, rest = stack[-1]
+            for s in rest:
+                if not visited[s]:
+                    visited[s] = True
+                    stack.append((s, reversed(self.successors[s])))
+                    break
+            else:
+                stack.pop()
+                self._postorder.append(current)
+        self.rpo_number = [-1] * len(self.blocks)
+        for position, reached in enumerate(reversed(self._postorder)):
+            self.rpo_number[reached] = position
+
+    def instructions(self) -> list[Instruction]:
+        return [insn for b in self.blocks for insn in b]
+
+    def postorder(self) -> list[int]:
+        """Returns the blocks reachable from the entry in postorder."""
+        return list(self._postorder)
+
+    def reverse_postorder(self) -> list[int]:
+        """Returns the blocks reachable from the entry in reverse postorder."""
+        return self.postorder()[::-1]
+
+    def reachable(self) -> list[bool]:
+        return [number != -1 for number in self.rpo_number]
+
+def immediate_dominators(cfg: ControlFlowGraph) -> list[int]:
+    """Returns the immediate dominator of every block, -1 for the entry and unreachable blocks.
+
+    Uses the iterative algorithm of Cooper, Harvey and Kennedy."""
+    rpo = cfg.reverse_postorder()
+    rpo_number = cfg.rpo_number
+
+    idom = [-1] * len(cfg.blocks)
+    idom[0] = 0
+
+    def intersect(a: int, b: int) -> int:
+        while a != b:
+            while rpo_number[a] > rpo_number[b]:
+                a = idom[a]
+            while rpo_number[b] > rpo_number[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for b in rpo[1:]:
+            new_idom = -1
+            for p in cfg.predecessors[b]:
+                if idom[p] == -1:
+                    continue
+                new_idom = p if new_idom == -1 else intersect(p, new_idom)
+            if idom[b] != new_idom:
+                idom[b] = new_idom
+                changed = True
+
+    idom[0] = -1
+    return idom
+
+def dominator_tree(idom: list[int]) -> list[list[int]]:
+    """Returns the children of every block in the dominator tree."""
+    children: list[list[int]] = [[] for _ in idom]
+    for b, d in enumerate(idom):
+        if d != -1:
+            children[d].append(b)
+    return children
+
+def dominates(idom: list[int], a: int, b: int) -> bool:
+    """Tells whether block `a` dominates block `b`."""
+    while b != -1:
+        if a == b:
+            return True
+        b = idom[b]
+    return False
+
+def dominance_frontiers(cfg: ControlFlowGraph, idom: list[int]) -> list[set[int]]:
+    frontiers: list[set[int]] = [set() for _ in cfg.blocks]
+    reachable = cfg.reachable()
+    for b, preds in enumerate(cfg.predecessors):
+        preds = [p for p in preds if reachable[p]]
+        if len(preds) < 2:
+            continue
+        for p in preds:
+            runner = p
+            while runner != -1 and runner != idom[b]:
+                frontiers[runner].add(b)
+                runner = idom[runner]
+    return frontiers
@@ -0,0 +1,80 @@
+from typing import Dict
+from compiler.cfg import ControlFlowGraph, terminators
+from compiler.ir import CondJump, Instruction, Jump, Label, Phi, map_targets, targets
+
+def thread_jumps(cfg: ControlFlowGraph) -> list[Instruction]:
+    """Makes jumps into empty blocks go straight to where those blocks lead."""
+    def forward(label: Label) -> Label:
+        seen: set[str] = set()
+        while label.name not in seen:
+            seen.add(label.name)
+            b = cfg.block_of_label[label.name]
+            block = cfg.blocks[b]
+            if len(block) == 2 and isinstance(block[1], Jump):
+                label = block[1].label
+            elif len(block) == 1 and b+1 < len(cfg.blocks) and cfg.labels[b+1] is not None:
+                label = cfg.labels[b+1] # type: ignore[assignment]
+            else:
+                break
+        return label
+
+    result: list[Instruction] = []
+    for insn in cfg.instructions():
+        insn = map_targets(insn, forward)
+        if isinstance(insn, CondJump) and insn.then_label == insn.else_label:
+            insn = Jump(insn.location, insn.then_label)
+        result.append(insn)
+    return result
+
+def merge_blocks(cfg: ControlFlowGraph) -> list[Instruction]:
+    """Moves a block that is only entered by a jump from another block to replace that jump."""
+    blocks = [list(block) for block in cfg.blocks]
+    merged = [False] * len(blocks)
+    for a, block in enumerate(blocks):
+        if merged[a] or not block or not isinstance(block[-1], Jump):
+            continue
+        b = cfg.block_of_label[block[-1].label.name]
+        moved = blocks[b]
+        if b == 0 or b == a or b == a+1 or merged[b] or cfg.predecessors[b] != [a]:
+            continue
+        # A block falling through into the next one would end up somewhere else
+        if not moved or not isinstance(moved[-1], terminators):
+            continue
+        # The block may itself have been extended by merging
+        block[-1:] = moved[1:]
+        blocks[b] = []
+        merged[b] = True
+    return [insn for block in blocks for insn in block]
+
+def remove_redundant_jumps_and_labels(instructions: list[Instruction]) -> list[Instruction]:
+    """Removes jumps to the next instruction and labels that nothing jumps to."""
+    result: list[Instruction] = []
+    for i, insn in enumerate(instructions):
+        if isinstance(insn, Jump) and i+1 < len(instructions) and instructions[i+1] == insn.label:
+            continue
+        result.append(insn)
+
+    used = {label.name for insn in result for label in targets(insn)}
+    # The first label names the function, it is kept for readability
+    return [insn for i, insn in enumerate(result) if i == 0 or not isinstance(insn, Label) or insn.name in used]
+
+def simplify_function_control_flow(instructions: list[Instruction]) -> list[Instruction]:
+    if any(isinstance(insn, Phi) for insn in instructions):
+        return instructions
+    while True:
+        previous = instructions
+        instructions = thread_jumps(ControlFlowGraph(instructions))
+        cfg = ControlFlowGraph(instructions)
+        reachable = cfg.reachable()
+        instructions = [insn for b, block in enumerate(cfg.blocks) if reachable[b] for insn in block]
+        instructions = merge_blocks(ControlFlowGraph(instructions))
+        instructions = remove_redundant_jumps_and_labels(instructions)
+        if instructions == previous:
+            return instructions
+
+def simplify_control_flow(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    """Threads jumps through empty blocks, merges blocks and removes unreachable code,
+    jumps to the next instruction and unused labels.
+
+    Functions in SSA form are left alone, since their phis name predecessor blocks."""
+    return {name: simplify_function_control_flow(instructions) for name, instructions in ns_ins.items()}
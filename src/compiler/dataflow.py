@@ -1,195 +1,375 @@
-from typing import Dict, Self, Set
-from compiler.ir import Call, CondJump, IRVar, Instruction, LoadBoolConst, LoadIntConst, Label, Copy, Jump, LoadIntParam, LoadBoolParam, LoadPointerParam
-
-
-def generate_blocks(ins: Dict[str, list[Instruction]]) -> Dict[str, list[list[tuple[IRVar, int]]]]:
-    block_dict: Dict[str, list[list[tuple[IRVar, int]]]] = {}
-
-    unique_indx = 0
-
-    for name, instructions in ins.items():
-        block_dict[name] = []
-        block: list[tuple[Instruction, int]] = []
-        for instruction in instructions:
-            if isinstance(instruction, Label) and len(block) > 0:
-                block_dict[name].append(block)
-                block = []
-            block.append((instruction, unique_indx))
-            unique_indx += 1
-            if isinstance(instruction, CondJump) or isinstance(instruction, Jump):
-                block_dict[name].append(block)
-                block = []
-
-        if block:
-            block_dict[name].append(block)
-
-    return block_dict
-
-def generate_flow_graph(ns_blocks: Dict[str, list[list[tuple[IRVar, int]]]]) -> Dict[str, Dict[str, list[Instruction | str]]]:
-    graph = {}
-
-    for name, blocks in ns_blocks.items():
-        for i, block in enumerate(blocks):
-            graph[block[0][0].name] = {'block': block,
-                                    'edges': []}
-
-            if isinstance(block[0][-1], Jump):
-                graph[block[0][0].name]['edges'].append(block[0][-1].label.name)
-            elif isinstance(block[0][-1], CondJump):
-                graph[block[0][0].name]['edges'].append(block[0][-1].then_label.name)
-                graph[block[0][0].name]['edges'].append(block[0][-1].else_label.name)
-            else:
-                if i+1 < len(blocks):
-                    graph[block[0][0].name]['edges'].append(blocks[i+1][0][0].name)
-
-    return graph
-
-type State = Dict[str, Set[int]]
-
-class DataFlow:
-    ins: Dict[str, list[list[tuple[Instruction, int]]]] = {}
-    inp: Dict[int, State] = {}
-    outp: Dict[int, State] = {}
-    change_log_in: Dict[int, bool] = {}
-    change_log_out: Dict[int, bool] = {}
-
-    def set_initial_state(self: Self):
-        init_state = {}
-        ins_count = 0
-        for name, blocks in self.ins.items():
-            for block in blocks:
-                for var, _ in block:
-                    ins_count += 1
-                    self.change_log_in[_] = False
-                    self.change_log_out[_] = False
-                    match var:
-                        case LoadBoolConst():
-                            init_state[var.dest.name] = set([-2])
-                        case LoadIntConst():
-                            init_state[var.dest.name] = set([-2])
-                        case Copy():
-                            init_state[var.source.name] = set([-2])
-                            init_state[var.dest.name] = set([-2])
-                        case Call():
-                            init_state[var.fun.name] = set([-1])
-                            for arg in var.args:
-                                init_state[arg.name] = set([-2])
-                            init_state[var.dest.name] = set([-2])
-                        case CondJump():
-                            init_state[var.cond.name] = set([-2])
-                        case LoadIntParam():
-                            init_state[var.symbol.name] = set([-2])
-                            init_state[var.dest.name] = set([-2])
-                        case LoadBoolParam():
-                            init_state[var.symbol.name] = set([-2])
-                            init_state[var.dest.name] = set([-2])
-
-        for i in range(0, ins_count+1):
-            self.inp[i] = {}
-            self.outp[i] = {}
-            for var in init_state.keys():
-                self.inp[i][var] = set([])
-                self.outp[i][var] = set([])
-
-        self.inp[0] = init_state
-
-    def __init__(self: Self, ins: Dict[str, list[list[tuple[Instruction, int]]]]) -> None:
-        self.ins = ins
-
-    def init_change_log(self: Self, value: bool) -> None:
-        for key in self.change_log_in.keys():
-            self.change_log_in[key] = value
-            self.change_log_out[key] = value
+import heapq
+from abc import ABC, abstractmethod
+from typing import Dict, Generic, Self, TypeVar
+from compiler.cfg import ControlFlowGraph
+from compiler.ir import Copy, IRVar, Instruction, NameTable, defs
+
+
+# Stands for "not defined in this function" in a reaching definitions set
+UNINITIALIZED = -2
+
+S = TypeVar('S')
+
+class DataFlow(ABC, Generic[S]):
+    """Forward dataflow analysis over the basic blocks of a program, solved with a worklist.
+
+    A block is visited again only when the input merged from its predecessors changed.
+    Subclasses give the states through `set_initial_state`, `enter_function`, `merge`,
+    `transfer` and, when a block can be handled at once, `transfer_block`."""
+    # The ids of the variables of every function, in the order of the program. Functions
+    # never share states, so each numbers its variables from 0.
+    tables: list[NameTable]
+    cfgs: Dict[str, ControlFlowGraph]
+    # States before and after instructions. Analyses that transfer whole blocks
+    # only keep them for the first and the last instruction of every block.
+    inp: Dict[int, S]
+    outp: Dict[int, S]
+    # The blocks of all functions in program order with the program-wide index of every
+    # instruction, and the blocks that start a function
+    blocks: list[list[tuple[Instruction, int]]]
+    function_entries: set[int]
+    # For every block, the instructions control enters it from and the blocks it continues to
+    block_predecessors: list[list[int]]
+    block_successors: list[list[int]]
+    block_of: Dict[int, int]
+    # The function of every block, by its position in the program
+    function_of: list[int]
+    # The position of every block in the order the worklist prefers. Blocks come in
+    # reverse postorder of their function, which visits a block after the blocks it is
+    # entered from, followed by the unreachable blocks.
+    order: list[int]
+    # How many times `compute` ran the transfer of a block
+    visits: int
+
+    def __init__(self: Self, ns_ins: Dict[str, list[Instruction]]) -> None:
+        self.inp = {}
+        self.outp = {}
+        self.tables = []
+        self.cfgs = {}
+        self.blocks = []
+        self.function_entries = set()
+        self.block_predecessors = []
+        self.block_successors = []
+        self.block_of = {}
+        self.function_of = []
+        self.order = []
+        offset = 0
+        for f, (name, instructions) in enumerate(ns_ins.items()):
+            self.tables.append(NameTable(instructions))
+            cfg = self.cfgs[name] = ControlFlowGraph(instructions)
+            if instructions:
+                first = len(self.blocks)
+                self.function_entries.add(first)
+                reachable = len(cfg.postorder())
+                for b, block in enumerate(cfg.blocks):
+                    start = offset + cfg.starts[b]
+                    self.blocks.append([(insn, start + k) for k, insn in enumerate(block)])
+                    for k in range(len(block)):
+                        self.block_of[start + k] = first + b
+                    self.function_of.append(f)
+                    self.block_successors.append([first + s for s in cfg.successors[b]])
+                    self.block_predecessors.append([offset + cfg.starts[p] + len(cfg.blocks[p]) - 1 for p in cfg.predecessors[b]])
+                    if cfg.rpo_number[b] == -1:
+                        self.order.append(first + reachable)
+                        reachable += 1
+                    else:
+                        self.order.append(first + cfg.rpo_number[b])
+            offset += len(instructions)
+
+    def function_at(self: Self, index: int) -> int:
+        """Returns the position in the program of the function holding instruction `index`."""
+        return self.function_of[self.block_of[index]]
+
+    def set_initial_state(self: Self) -> None:
+        self.inp = {}
+        self.outp = {}
 
     def compute(self: Self) -> None:
         self.set_initial_state()
-        first_round = True
-
-        self.init_change_log(True)
-
-        while any(self.change_log_out.values()) or any(self.change_log_in.values()):
-            if not first_round:
-                self.init_change_log(False)
-            for name, blocks in self.ins.items():
-                for block in blocks:
-                    for ins, index in block:
-                        if isinstance(ins, Label):
-                            prev = self.inp[index].copy()
-                            jumps = self.jumps_to(ins)
-                            if any([self.change_log_out[j] for j in jumps]):
-                                self.inp[index] = self.merge(jumps)
-                            if not self.equal(prev, self.inp[index]):
-                                self.change_log_in[index] = True
-
-                        if self.change_log_in[index]:
-                            prev = self.outp[index].copy()
-                            self.transfer(index, ins)
-                            if not self.equal(prev, self.outp[index]):
-                                self.change_log_out[index] = True
-                            if index+1 < len(block):
-                                prev = self.inp[index+1].copy()
-                                self.inp[index+1] = self.outp[index].copy()
-                                if not self.equal(prev, self.inp[index+1]):
-                                    self.change_log_in[index+1] = True
-            first_round = False
+        # Visiting the queued block that comes first in reverse postorder lets an inner loop
+        # settle before the blocks after it are visited
+        worklist = [(self.order[b], b) for b in range(len(self.blocks))]
+        heapq.heapify(worklist)
+        queued = [True] * len(self.blocks)
+        visited = [False] * len(self.blocks)
+        self.visits = 0
+        while worklist:
+            _, b = heapq.heappop(worklist)
+            queued[b] = False
+            block = self.blocks[b]
+            entry, last = block[0][1], block[-1][1]
+            state = self.merge(self.block_predecessors[b], entry)
+            if b in self.function_entries:
+                state = self.enter_function(state, self.function_of[b])
+            if visited[b] and self.equal(state, self.inp[entry]):
+                continue
+            visited[b] = True
+            self.inp[entry] = state
+            previous = self.outp.get(last)
+            self.transfer_block(b)
+            self.visits += 1
+            if previous is None or not self.equal(previous, self.outp[last]):
+                for s in self.block_successors[b]:
+                    if not queued[s]:
+                        queued[s] = True
+                        heapq.heappush(worklist, (self.order[s], s))
 
-    def print_out_flows(self: Self) -> None:
-        for steps, state in self.outp.items():
-            if len([s for s in state.values() if len(s) > 0]) == 0:
+    def instruction_states(self: Self) -> None:
+        """Fills in the states of the instructions inside blocks, which `transfer_block` may skip."""
+        for b in range(len(self.blocks)):
+            self.transfer_instructions(b)
+
+    def print_flows(self: Self, states: Dict[int, S]) -> None:
+        for steps, state in sorted(states.items()):
+            lines = self.describe(steps, state)
+            if not lines:
                 continue
             print(f'Step {steps}')
-            for var, sets in state.items():
-                if len(sets) == 0:
-                    continue
-                print(f'{var} => {sets}')
+            for line in lines:
+                print(line)
             print()
 
+    def print_out_flows(self: Self) -> None:
+        self.instruction_states()
+        self.print_flows(self.outp)
+
     def print_in_flows(self: Self) -> None:
-        for steps, state in self.inp.items():
-            if len([s for s in state.values() if len(s) > 0]) == 0:
-                continue
-            print(f'Step {steps}')
-            for var, sets in state.items():
-                if len(sets) == 0:
-                    continue
-                print(f'{var} => {sets}')
-            print()
+        self.instruction_states()
+        self.print_flows(self.inp)
+
+    @abstractmethod
+    def describe(self: Self, index: int, state: S) -> list[str]:
+        """Returns lines showing the non-empty parts of a state of instruction `index`."""
+
+    def equal(self: Self, state_a: S, state_b: S) -> bool:
+        return state_a == state_b
+
+    @abstractmethod
+    def enter_function(self: Self, state: S, function: int) -> S:
+        """Adds what holds at the start of function number `function` to the input of its first block."""
+
+    @abstractmethod
+    def merge(self: Self, jumps: list[int], entry: int) -> S:
+        """Combines the outputs of the instructions in `jumps` into the input of the block
+        starting at instruction `entry`."""
+
+    @abstractmethod
+    def transfer(self: Self, index: int, instruction: Instruction) -> None:
+        """Computes the output of instruction `index` from its input."""
 
-    def equal(self: Self, state_a: State, state_b: State) -> bool:
-        for key, value in state_a.items():
-            if value != state_b[key]:
-                return False
+    def transfer_instructions(self: Self, b: int) -> None:
+        """Runs `transfer` over block `b`, starting from the input of its first instruction."""
+        block = self.blocks[b]
+        for position, (insn, index) in enumerate(block):
+            if position > 0:
+                self.inp[index] = self.outp[block[position-1][1]]
+            self.transfer(index, insn)
 
-        return set(state_a.keys()) == set(state_b.keys())
+    def transfer_block(self: Self, b: int) -> None:
+        """Computes the output of the last instruction of block `b` from the input of its first one."""
+        self.transfer_instructions(b)
 
-    def jumps_to(self: Self, label: Label) -> list[int]:
-        jumps = []
-        for name, blocks in self.ins.items():
-            for block in blocks:
-                for var, j in block:
-                    match var:
-                        case CondJump():
-                            if var.then_label.name == label.name or var.else_label == label.name:
-                                jumps.append(j)
-                        case Jump():
-                            if var.label.name == label.name:
-                                jumps.append(j)
+class BitVectorDataFlow(DataFlow[int]):
+    """A dataflow analysis whose states are sets of facts, stored as the bits of an int.
 
-        return jumps
+    Subclasses number their facts and tell which facts each instruction generates and kills.
+    The masks of every block are composed once, so a visit to a block takes a few operations on ints."""
+    # The facts that hold at the start of each function. Every function numbers its own
+    # facts from 0, so its states are only as wide as it has facts.
+    initial: list[int]
+    block_gen: list[int]
+    block_kill: list[int]
 
-    def merge(self: Self, jumps: list[int]) -> State:
-        merger = self.outp[jumps[0]]
-        for j in jumps[1:]:
-            for key, value in self.outp[j].items():
-                merger[key].union(value)
+    @abstractmethod
+    def gen_kill(self: Self, index: int, instruction: Instruction) -> tuple[int, int]:
+        """Returns the facts instruction `index` makes hold and the facts it ends."""
 
-        return merger
+    def set_initial_state(self: Self) -> None:
+        super().set_initial_state()
+        self.block_gen = []
+        self.block_kill = []
+        for block in self.blocks:
+            gen = kill = 0
+            for insn, index in block:
+                insn_gen, insn_kill = self.gen_kill(index, insn)
+                gen = insn_gen | (gen & ~insn_kill)
+                kill |= insn_kill
+            self.block_gen.append(gen)
+            self.block_kill.append(kill)
+
+    def enter_function(self: Self, state: int, function: int) -> int:
+        return state | self.initial[function]
+
+    def merge(self: Self, jumps: list[int], entry: int) -> int:
+        merged = 0
+        for j in jumps:
+            merged |= self.outp.get(j, 0)
+        return merged
 
     def transfer(self: Self, index: int, instruction: Instruction) -> None:
-        match instruction:
-            case LoadBoolConst() | LoadIntConst() | Copy()| Call() | LoadIntParam() | LoadBoolParam() | LoadPointerParam():
-                dest = instruction.dest.name
-                curr_in = self.inp[index].copy()
-                for key in curr_in.keys():
-                    if key == dest:
-                        self.outp[index][dest] = set([index])
\ No newline at end of file
+        gen, kill = self.gen_kill(index, instruction)
+        self.outp[index] = gen | (self.inp[index] & ~kill)
+
+    def transfer_block(self: Self, b: int) -> None:
+        block = self.blocks[b]
+        self.outp[block[-1][1]] = self.block_gen[b] | (self.inp[block[0][1]] & ~self.block_kill[b])
+
+class ReachingDefinitions(BitVectorDataFlow):
+    """Finds the definitions that may reach every instruction.
+
+    There is a fact for every instruction that defines a variable, and one for
+    every variable standing for it not being defined in the current function."""
+    # The instruction index of each fact of every function, or UNINITIALIZED
+    facts: list[list[int]]
+    fact_of_instruction: Dict[int, int]
+    # The facts that define each variable of every function, by NameTable id
+    variable_facts: list[list[int]]
+
+    def __init__(self: Self, ns_ins: Dict[str, list[Instruction]]) -> None:
+        super().__init__(ns_ins)
+        self.facts = []
+        self.fact_of_instruction = {}
+        self.variable_facts = []
+        self.initial = []
+        for table in self.tables:
+            count = len(table.variables)
+            self.facts.append([UNINITIALIZED] * count)
+            self.variable_facts.append([1 << var_id for var_id in range(count)])
+            self.initial.append((1 << count) - 1)
+        for block, f in zip(self.blocks, self.function_of):
+            facts, variable_facts, table = self.facts[f], self.variable_facts[f], self.tables[f]
+            for insn, index in block:
+                for var in defs(insn):
+                    if index not in self.fact_of_instruction:
+                        self.fact_of_instruction[index] = len(facts)
+                        facts.append(index)
+                    variable_facts[table.var_id(var)] |= 1 << self.fact_of_instruction[index]
+
+    def gen_kill(self: Self, index: int, instruction: Instruction) -> tuple[int, int]:
+        fact = self.fact_of_instruction.get(index)
+        if fact is None:
+            return 0, 0
+        f = self.function_at(index)
+        kill = 0
+        for var in defs(instruction):
+            kill |= self.variable_facts[f][self.tables[f].var_id(var)]
+        return 1 << fact, kill
+
+    def definitions(self: Self, function: int, state: int, var_id: int) -> frozenset[int]:
+        """Returns the instructions whose definition of the variable `var_id` of function
+        number `function` is in `state`."""
+        facts = self.facts[function]
+        bits = state & self.variable_facts[function][var_id]
+        result = []
+        while bits:
+            lowest = bits & -bits
+            result.append(facts[lowest.bit_length() - 1])
+            bits ^= lowest
+        return frozenset(result)
+
+    def reaching(self: Self, index: int, var: IRVar) -> frozenset[int]:
+        """Returns the instructions whose definition of `var` may reach instruction `index`."""
+        block = self.blocks[self.block_of[index]]
+        entry = block[0][1]
+        for insn, j in reversed(block[:index - entry]):
+            if var in defs(insn):
+                return frozenset([j])
+        f = self.function_at(index)
+        var_id = self.tables[f].var_id(var)
+        if var_id >= len(self.variable_facts[f]):
+            return frozenset([UNINITIALIZED])
+        return self.definitions(f, self.inp[entry], var_id)
+
+    def describe(self: Self, index: int, state: int) -> list[str]:
+        f = self.function_at(index)
+        lines = []
+        for var_id, var in enumerate(self.tables[f].variables[:len(self.variable_facts[f])]):
+            definitions = self.definitions(f, state, var_id)
+            if definitions:
+                lines.append(f'{var} => {set(definitions)}')
+        return lines
+
+def reaching_definitions(ns_ins: Dict[str, list[Instruction]]) -> ReachingDefinitions:
+    """Computes the reaching definitions of a program.
+
+    Instructions are numbered in the order of `ns_ins`, starting from 0."""
+    dataflow = ReachingDefinitions(ns_ins)
+    dataflow.compute()
+    return dataflow
+
+class AvailableCopies(BitVectorDataFlow):
+    """Finds the copies that are available at every instruction.
+
+    `Copy(source, dest)` is available where every path from the start of the function
+    runs it and defines neither `source` nor `dest` after it, so `dest` holds the value of `source`."""
+    # The instruction index of each fact of every function
+    facts: list[list[int]]
+    fact_of_instruction: Dict[int, int]
+    # The facts of the copies reading or writing each variable of every function, by NameTable id
+    variable_facts: list[list[int]]
+    # The facts of the copies into each variable of every function
+    destination_facts: list[list[int]]
+    every_fact: list[int]
+
+    def __init__(self: Self, ns_ins: Dict[str, list[Instruction]]) -> None:
+        super().__init__(ns_ins)
+        self.initial = [0] * len(self.tables)
+        self.facts = [[] for _ in self.tables]
+        self.fact_of_instruction = {}
+        self.variable_facts = [[0] * len(table.variables) for table in self.tables]
+        self.destination_facts = [[0] * len(table.variables) for table in self.tables]
+        for block, f in zip(self.blocks, self.function_of):
+            facts, table = self.facts[f], self.tables[f]
+            for insn, index in block:
+                if isinstance(insn, Copy) and insn.source != insn.dest:
+                    fact = 1 << len(facts)
+                    self.fact_of_instruction[index] = len(facts)
+                    facts.append(index)
+                    self.variable_facts[f][table.var_id(insn.source)] |= fact
+                    self.variable_facts[f][table.var_id(insn.dest)] |= fact
+                    self.destination_facts[f][table.var_id(insn.dest)] |= fact
+        self.every_fact = [(1 << len(facts)) - 1 for facts in self.facts]
+
+    def gen_kill(self: Self, index: int, instruction: Instruction) -> tuple[int, int]:
+        f = self.function_at(index)
+        kill = 0
+        for var in defs(instruction):
+            kill |= self.variable_facts[f][self.tables[f].var_id(var)]
+        fact = self.fact_of_instruction.get(index)
+        return (0 if fact is None else 1 << fact), kill
+
+    def enter_function(self: Self, state: int, function: int) -> int:
+        # Nothing has been copied when a function starts, even if a loop jumps back to its first block
+        return self.initial[function]
+
+    def merge(self: Self, jumps: list[int], entry: int) -> int:
+        # A copy is available only if it is available on every incoming edge. Edges that
+        # have not been visited yet do not rule anything out.
+        every_fact = self.every_fact[self.function_at(entry)]
+        merged = every_fact
+        for j in jumps:
+            merged &= self.outp.get(j, every_fact)
+        return merged
+
+    def available_copy(self: Self, index: int, var: IRVar) -> int | None:
+        """Returns the copy into `var` that is available at instruction `index`, if there is one."""
+        f = self.function_at(index)
+        var_id = self.tables[f].var_id(var)
+        if var_id >= len(self.destination_facts[f]):
+            return None
+        bits = self.inp[index] & self.destination_facts[f][var_id]
+        # A copy into `var` ends every other copy into it, so at most one is available
+        return self.facts[f][bits.bit_length() - 1] if bits else None
+
+    def describe(self: Self, index: int, state: int) -> list[str]:
+        facts = self.facts[self.function_at(index)]
+        return [f'{facts[fact]} available' for fact in range(len(facts)) if state >> fact & 1]
+
+def available_copies(ns_ins: Dict[str, list[Instruction]]) -> AvailableCopies:
+    """Computes the copies available at every instruction of a program.
+
+    Instructions are numbered in the order of `ns_ins`, starting from 0."""
+    dataflow = AvailableCopies(ns_ins)
+    dataflow.compute()
+    dataflow.instruction_states()
+    return dataflow
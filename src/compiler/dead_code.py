@@ -0,0 +1,51 @@
+from typing import Dict
+from compiler.cfg import ControlFlowGraph
+from compiler.dataflow import ReachingDefinitions, reaching_definitions
+from compiler.ir import Call, Copy, Instruction, LoadBoolConst, LoadIntConst, Select, defs, uses
+from compiler.ir_interpreter import intrinsic_semantics
+from compiler.ssa import address_taken_variables
+
+# Intrinsics that can be removed when their result is not used.
+# Division and remainder are kept because they may trap.
+removable_intrinsics = [name for name in intrinsic_semantics if name not in ['/', '%']]
+
+def is_removable(insn: Instruction) -> bool:
+    """Tells whether `insn` has no effect other than defining its destination."""
+    if isinstance(insn, Call):
+        return insn.fun.name in removable_intrinsics
+    return isinstance(insn, (LoadIntConst, LoadBoolConst, Copy, Select))
+
+def eliminate_dead_code(ns_ins: Dict[str, list[Instruction]], dataflow: ReachingDefinitions | None = None) -> Dict[str, list[Instruction]]:
+    """Removes the side effect free instructions whose definition reaches no use."""
+    dataflow = dataflow or reaching_definitions(ns_ins)
+    used: set[int] = set()
+    index = 0
+    for instructions in ns_ins.values():
+        for insn in instructions:
+            for var in uses(insn):
+                used |= dataflow.reaching(index, var)
+            index += 1
+
+    result: Dict[str, list[Instruction]] = {}
+    index = 0
+    for name, instructions in ns_ins.items():
+        # Address-taken variables can be read through pointers
+        address_taken = address_taken_variables(instructions)
+        live: list[Instruction] = []
+        for insn in instructions:
+            if index in used or not is_removable(insn) or any(var in address_taken for var in defs(insn)):
+                live.append(insn)
+            index += 1
+        result[name] = live
+
+    return result
+
+def remove_unreachable_blocks(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    """Removes the basic blocks that cannot be reached from the start of their function."""
+    result: Dict[str, list[Instruction]] = {}
+    for name, instructions in ns_ins.items():
+        cfg = ControlFlowGraph(instructions)
+        reachable = cfg.reachable()
+        result[name] = [insn for b, block in enumerate(cfg.blocks) if reachable[b] for insn in block]
+
+    return result
@@ -0,0 +1,129 @@
+from typing import Dict
+from compiler.ir import Call, Copy, CopyPointer, Instruction, IRVar, LoadPointerParam, Phi, ReturnValue, Select, uses
+from compiler.ssa import address_taken_variables
+
+# Stands for the addresses of variables the function cannot see,
+# such as pointers it gets as parameters or loads from memory
+UNKNOWN = IRVar('<unknown>')
+
+def points_to(instructions: list[Instruction]) -> Dict[IRVar, set[IRVar]]:
+    """Returns the variables whose address each variable of a function may hold.
+
+    The analysis ignores the order of instructions. A pointer read from memory or returned
+    by a call may point to any variable whose address has escaped, which shows as UNKNOWN."""
+    result: Dict[IRVar, set[IRVar]] = {}
+    copies: list[tuple[IRVar, IRVar]] = []
+    loads: list[tuple[IRVar, IRVar]] = []
+    stores: list[tuple[IRVar, IRVar]] = []
+    for insn in instructions:
+        match insn:
+            case Call() if insn.fun.name == 'unary_&':
+                result.setdefault(insn.dest, set()).add(insn.args[0])
+            case Call() | LoadPointerParam():
+                if isinstance(insn, Call) and insn.fun.name == 'unary_*':
+                    loads.append((insn.args[0], insn.dest))
+                result.setdefault(insn.dest, set()).add(UNKNOWN)
+            case Copy():
+                copies.append((insn.source, insn.dest))
+            case CopyPointer():
+                stores.append((insn.source, insn.dest))
+            case Phi():
+                copies.extend((source, insn.dest) for source in insn.sources)
+            case Select():
+                copies += [(insn.if_true, insn.dest), (insn.if_false, insn.dest)]
+
+    def flow(source: IRVar, dest: IRVar) -> bool:
+        new = result.get(source, set()) - result.get(dest, set())
+        if new:
+            result.setdefault(dest, set()).update(new)
+        return bool(new)
+
+    changed = True
+    while changed:
+        changed = False
+        for source, dest in copies:
+            changed |= flow(source, dest)
+        # Loading through a pointer reads, and storing writes, the variables it points to
+        for pointer, dest in loads:
+            for var in list(result.get(pointer, set()) - {UNKNOWN}):
+                changed |= flow(var, dest)
+        for source, pointer in stores:
+            for var in list(result.get(pointer, set()) - {UNKNOWN}):
+                changed |= flow(source, var)
+    return result
+
+def escaping_variables(instructions: list[Instruction], pointers: Dict[IRVar, set[IRVar]]) -> set[IRVar]:
+    """Returns the variables of a function whose address may be used other than by
+    loading or storing through it, or may outlive the function.
+
+    An address escapes when it is passed to a call, returned, stored in memory or
+    kept in a variable whose own address is taken."""
+    in_memory = address_taken_variables(instructions)
+    escaping: set[IRVar] = set()
+    for insn in instructions:
+        match insn:
+            case Call() if insn.fun.name in ['unary_&', 'unary_*']:
+                leaked = []
+            case Call() | ReturnValue():
+                leaked = uses(insn)
+            case CopyPointer():
+                leaked = [insn.source]
+            case _:
+                leaked = []
+        for var in leaked:
+            escaping |= pointers.get(var, set())
+    for var in in_memory:
+        escaping |= pointers.get(var, set())
+
+    # Variables reachable through an escaping address escape as well
+    worklist = list(escaping)
+    while worklist:
+        for var in pointers.get(worklist.pop(), set()):
+            if var not in escaping:
+                escaping.add(var)
+                worklist.append(var)
+    escaping.discard(UNKNOWN)
+    return escaping
+
+def promotable_variables(instructions: list[Instruction]) -> set[IRVar]:
+    """Returns the address-taken variables of a function that can live in a variable
+    instead of memory: their address does not escape, and every pointer that may hold
+    it can hold no other address."""
+    pointers = points_to(instructions)
+    escaping = escaping_variables(instructions, pointers)
+    candidates = address_taken_variables(instructions) - escaping
+    for targets in pointers.values():
+        if len(targets) > 1:
+            candidates -= targets
+    return candidates
+
+def promote_function_variables(instructions: list[Instruction]) -> list[Instruction]:
+    """Turns loads and stores through pointers to promotable variables into copies,
+    and removes taking and copying their addresses."""
+    promoted = promotable_variables(instructions)
+    if not promoted:
+        return instructions
+    pointers = points_to(instructions)
+
+    def target(pointer: IRVar) -> IRVar | None:
+        targets = pointers.get(pointer, set())
+        return next(iter(targets)) if len(targets) == 1 and targets <= promoted else None
+
+    result: list[Instruction] = []
+    for insn in instructions:
+        match insn:
+            case Call() if insn.fun.name == 'unary_&' and insn.args[0] in promoted:
+                continue
+            case Call() if insn.fun.name == 'unary_*' and (var := target(insn.args[0])) is not None:
+                insn = Copy(insn.location, var, insn.dest)
+            case CopyPointer() if (var := target(insn.dest)) is not None:
+                insn = Copy(insn.location, insn.source, var)
+            case Copy() | Phi() | Select() if target(insn.dest) is not None:
+                # Only loads and stores read these pointers, and those are gone
+                continue
+        result.append(insn)
+    return result
+
+def promote_variables(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    """Keeps address-taken variables out of memory when their address does not escape."""
+    return {name: promote_function_variables(instructions) for name, instructions in ns_ins.items()}
@@ -0,0 +1,143 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict
+from compiler.cfg import terminators
+from compiler.dead_code import is_removable
+from compiler.ir import Call, CondJump, Instruction, IRVar, Jump, Label, NameTable, Phi, Select, defs, map_defs, map_uses, targets, uses
+from compiler.ssa import address_taken_variables
+
+# A mispredicted branch costs about this many cycles. Branches on data are
+# assumed to go either way at random, so half of them are mispredicted.
+MISPREDICT_PENALTY = 16
+# A select reads the condition and both values
+SELECT_COST = 2
+# Cycles taken by the intrinsics that are slower than the rest
+intrinsic_costs = {'*': 3}
+
+@dataclass
+class Diamond:
+    """A conditional jump to one or two straight-line arms that meet again at a label,
+    as positions in the instruction list. The first arm follows the jump, the second
+    one is empty when the first falls through to the join label."""
+    branch: int
+    first: tuple[int, int]
+    second: tuple[int, int]
+    join: int
+    # Whether the first arm runs when the condition is true
+    first_if_true: bool
+
+def cost(arm: list[Instruction]) -> int:
+    return sum(intrinsic_costs.get(insn.fun.name, 1) if isinstance(insn, Call) else 1 for insn in arm)
+
+def is_profitable(first: list[Instruction], second: list[Instruction], selects: int) -> bool:
+    """Tells whether running both arms and selecting the results is expected to be faster
+    than running one of them after a branch that is mispredicted half of the time."""
+    both = cost(first) + cost(second)
+    return both + SELECT_COST*selects <= (both + MISPREDICT_PENALTY) / 2
+
+def diamond(instructions: list[Instruction], i: int, references: Counter[str]) -> Diamond | None:
+    """Recognizes the diamond or triangle starting with the conditional jump at `i`."""
+    branch = instructions[i]
+    assert isinstance(branch, CondJump)
+
+    def straight_line(start: int) -> int:
+        end = start
+        while end < len(instructions) and not isinstance(instructions[end], (Label, *terminators)):
+            end += 1
+        return end
+
+    def falls_to(j: int, label: Label) -> int | None:
+        # Where the code at `j` continues at `label`, possibly through a jump to the next instruction
+        if j < len(instructions) and instructions[j] == label:
+            return j
+        insn = instructions[j] if j+1 < len(instructions) else None
+        if isinstance(insn, Jump) and insn.label == label and instructions[j+1] == label:
+            return j+1
+        return None
+
+    def entered_by_branch(j: int) -> bool:
+        insn = instructions[j] if j < len(instructions) else None
+        return isinstance(insn, Label) and insn in [branch.then_label, branch.else_label] and references[insn.name] == 1
+
+    if branch.then_label == branch.else_label or not entered_by_branch(i+1):
+        return None
+    first_label = instructions[i+1]
+    other = branch.else_label if first_label == branch.then_label else branch.then_label
+    first_end = straight_line(i+2)
+    first_if_true = first_label == branch.then_label
+    join = falls_to(first_end, other)
+    if join is not None:
+        # The first arm continues where the branch goes otherwise
+        return Diamond(i, (i+2, first_end), (first_end, first_end), join, first_if_true)
+    end = instructions[first_end] if first_end < len(instructions) else None
+    if not isinstance(end, Jump) or not entered_by_branch(first_end+1) or instructions[first_end+1] != other:
+        return None
+    second_end = straight_line(first_end+2)
+    join = falls_to(second_end, end.label)
+    if join is None:
+        return None
+    return Diamond(i, (i+2, first_end), (first_end+2, second_end), join, first_if_true)
+
+def if_convert_function(instructions: list[Instruction]) -> list[Instruction]:
+    """Replaces branches over short side effect free arms by running both arms
+    and selecting the values they computed, when the cost model favours it."""
+    if any(isinstance(insn, Phi) for insn in instructions):
+        return instructions
+    address_taken = address_taken_variables(instructions)
+    names = {var.name for var in NameTable(instructions).variables}
+    temps = 0
+
+    def fresh() -> IRVar:
+        nonlocal temps
+        while f'select_tmp{temps}' in names:
+            temps += 1
+        names.add(f'select_tmp{temps}')
+        return IRVar(f'select_tmp{temps}')
+
+    def speculate(arm: list[Instruction]) -> tuple[list[Instruction], Dict[IRVar, IRVar]]:
+        # Every definition gets a new variable, so neither arm sees what the other one wrote
+        renamed: Dict[IRVar, IRVar] = {}
+        result: list[Instruction] = []
+        for insn in arm:
+            insn = map_uses(insn, lambda var: renamed.get(var, var))
+            for var in defs(insn):
+                renamed[var] = fresh()
+            result.append(map_defs(insn, lambda var: renamed[var]))
+        return result, renamed
+
+    changed = True
+    while changed:
+        changed = False
+        references = Counter(label.name for insn in instructions for label in targets(insn))
+        for i, insn in enumerate(instructions):
+            if not isinstance(insn, CondJump) or (d := diamond(instructions, i, references)) is None:
+                continue
+            first = instructions[d.first[0]:d.first[1]]
+            second = instructions[d.second[0]:d.second[1]]
+            if not all(is_removable(insn) for insn in first + second):
+                continue
+            defined = list(dict.fromkeys(var for insn in first + second for var in defs(insn)))
+            if insn.cond in defined or any(var in address_taken for var in defined):
+                continue
+            # Variables only used inside the arms need no select
+            outside = {var for j, other in enumerate(instructions) if not i <= j < d.join for var in uses(other)}
+            outputs = [var for var in defined if var in outside]
+            if not is_profitable(first, second, len(outputs)):
+                continue
+
+            first, first_values = speculate(first)
+            second, second_values = speculate(second)
+            if not d.first_if_true:
+                first_values, second_values = second_values, first_values
+            selects: list[Instruction] = [
+                Select(insn.location, insn.cond, first_values.get(var, var), second_values.get(var, var), var)
+                for var in outputs
+            ]
+            instructions = instructions[:i] + first + second + selects + instructions[d.join:]
+            changed = True
+            break
+    return instructions
+
+def if_convert(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    """Turns short branches, such as those of `and`, `or` and small if-expressions, into selects."""
+    return {name: if_convert_function(instructions) for name, instructions in ns_ins.items()}
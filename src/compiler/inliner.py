@@ -0,0 +1,117 @@
+from typing import Dict
+from compiler.ir import Call, Copy, Instruction, IRVar, Jump, Label, LoadBoolParam, LoadIntParam, LoadPointerParam, ReturnValue, map_defs, map_targets, map_uses
+
+# How many instructions inlining may add to the program for every inlined function
+DEFAULT_INLINE_BUDGET = 60
+
+def call_graph(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[str]]:
+    """Returns the user functions every function calls."""
+    return {
+        name: list(dict.fromkeys(insn.fun.name for insn in instructions if isinstance(insn, Call) and insn.fun.name in ns_ins))
+        for name, instructions in ns_ins.items()
+    }
+
+def recursive_functions(graph: Dict[str, list[str]]) -> set[str]:
+    """Returns the functions that can end up calling themselves."""
+    result = set()
+    for start in graph:
+        stack = list(graph[start])
+        seen: set[str] = set()
+        while stack:
+            name = stack.pop()
+            if name == start:
+                result.add(start)
+                break
+            if name not in seen:
+                seen.add(name)
+                stack.extend(graph[name])
+    return result
+
+def bottom_up_order(graph: Dict[str, list[str]]) -> list[str]:
+    """Returns the functions so that every function comes after the functions it calls,
+    except for calls within a cycle."""
+    order: list[str] = []
+    visited: set[str] = set()
+    for root in graph:
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(graph[root]))]
+        while stack:
+            name, callees = stack[-1]
+            for callee in callees:
+                if callee not in visited:
+                    visited.add(callee)
+                    stack.append((callee, iter(graph[callee])))
+                    break
+            else:
+                stack.pop()
+                order.append(name)
+    return order
+
+def size(instructions: list[Instruction]) -> int:
+    return len([insn for insn in instructions if not isinstance(insn, Label)])
+
+def inline_call(call: Call, callee: list[Instruction], suffix: str) -> list[Instruction]:
+    """Returns the instructions that replace `call`: the body of the callee with its
+    variables and labels renamed, parameters copied from the arguments and the
+    return value copied to the destination of the call."""
+    def rename(var: IRVar) -> IRVar:
+        return var if var.name == 'unit' else IRVar(f'{var.name}_{suffix}')
+
+    def relabel(label: Label) -> Label:
+        return Label(label.location, f'{label.name}_{suffix}')
+
+    end = Label(call.location, f'inline_end_{suffix}')
+    param_count = 0
+    result: list[Instruction] = []
+    for insn in callee:
+        match insn:
+            case LoadIntParam() | LoadBoolParam() | LoadPointerParam():
+                result.append(Copy(insn.location, call.args[param_count], rename(insn.dest)))
+                param_count += 1
+            case ReturnValue():
+                result.append(Copy(insn.location, rename(insn.var), call.dest))
+                result.append(Jump(insn.location, end))
+            case Label():
+                result.append(relabel(insn))
+            case _:
+                result.append(map_targets(map_defs(map_uses(insn, rename), rename), relabel))
+    result.append(end)
+    return result
+
+def inline_functions(ns_ins: Dict[str, list[Instruction]], budget: int = DEFAULT_INLINE_BUDGET) -> Dict[str, list[Instruction]]:
+    """Copies the bodies of user functions into their callers.
+
+    Functions are handled callees first, so callees of an inlined function are already
+    inlined into it. A function is inlined at all of its call sites when the copies add
+    at most `budget` instructions to the program, counting the original function as
+    removed. Recursive functions are never inlined, and a budget of 0 turns inlining off."""
+    if budget <= 0:
+        return ns_ins
+    ns_ins = dict(ns_ins)
+    graph = call_graph(ns_ins)
+    recursive = recursive_functions(graph)
+    copies = 0
+
+    for callee in bottom_up_order(graph):
+        if callee == 'main' or callee in recursive:
+            continue
+        sites = len([insn for instructions in ns_ins.values() for insn in instructions if isinstance(insn, Call) and insn.fun.name == callee])
+        if sites == 0 or size(ns_ins[callee]) * (sites - 1) > budget:
+            continue
+
+        for name, instructions in ns_ins.items():
+            if name == callee or not any(isinstance(insn, Call) and insn.fun.name == callee for insn in instructions):
+                continue
+            inlined: list[Instruction] = []
+            for insn in instructions:
+                if isinstance(insn, Call) and insn.fun.name == callee:
+                    copies += 1
+                    inlined.extend(inline_call(insn, ns_ins[callee], f'in{copies}'))
+                else:
+                    inlined.append(insn)
+            ns_ins[name] = inlined
+        del ns_ins[callee]
+
+    return ns_ins
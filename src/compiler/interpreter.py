@@ -1,78 +1,177 @@
-from compiler.ast import Expression, Literal, IfThenElse, Module, While, BinaryOp, Var, Block, Identifier, UnaryOp, FuncCall
+from inspect import isawaitable
+from typing import Any, Callable, Generator
+from compiler.ast import Expression, FuncDef, Literal, IfThenElse, Module, While, BinaryOp, Var, Block, Identifier, UnaryOp, FuncCall
 from compiler.types import SymbolTable, Unit, Value
 
-def interpret_module(module: Module, root_table: SymbolTable) -> Value:
+# Evaluating an expression yields None at every loop back-edge, and yields the awaitables
+# returned by asynchronous built-ins to be sent back what they resolve to. Only an
+# asynchronous runner ever gives it such built-ins, so `run` just resumes it.
+type Evaluation = Generator[Any, Any, Value]
+
+def run(evaluation: Evaluation) -> Value:
+    """Evaluates to completion without ever giving control away."""
+    try:
+        while True:
+            evaluation.send(None)
+    except StopIteration as e:
+        return e.value
+
+class Function:
+    """A user defined function, callable from interpreted code like any built-in.
+
+    Counts its calls and the loop back-edges taken inside its body, so that
+    a runner can decide when the function is hot enough to run natively."""
+    definition: FuncDef
+    closure: SymbolTable
+    calls: int
+    back_edges: int
+    native: Callable[..., Value] | None
+
+    def __init__(self, definition: FuncDef, closure: SymbolTable) -> None:
+        self.definition = definition
+        self.closure = closure
+        self.calls = 0
+        self.back_edges = 0
+        self.native = None
+
+    def __call__(self, *args: Value) -> Value:
+        return run(self.call(*args))
+
+    def call(self, *args: Value) -> Evaluation:
+        """Evaluates a call from interpreted code, which resumes the caller's evaluation."""
+        self.calls += 1
+        if self.native is not None:
+            return self.native(*args)
+
+        frame = Frame(
+            bindings={arg.name: value for arg, value in zip(self.definition.args, args)},
+            parent=self.closure,
+            function=self
+        )
+        return (yield from evaluate(self.definition.body, frame))
+
+    def back_edge(self) -> None:
+        """Called every time a loop in the body of the function goes back to its condition."""
+        self.back_edges += 1
+
+class Frame(SymbolTable):
+    """Symbol table holding the arguments of a single function invocation."""
+    function: Function
+
+    def __init__(self, bindings: dict, parent: SymbolTable | None, function: Function) -> None:
+        super().__init__(bindings, parent)
+        self.function = function
+
+def enclosing_function(symbol_table: SymbolTable) -> Function | None:
+    current: SymbolTable | None = symbol_table
+    while current is not None:
+        if isinstance(current, Frame):
+            return current.function
+        current = current.parent
+
+    return None
+
+def interpret_module(
+    module: Module,
+    root_table: SymbolTable,
+    make_function: Callable[[FuncDef, SymbolTable], Function] = Function
+) -> Value:
+    return run(evaluate_module(module, root_table, make_function))
+
+def evaluate_module(
+    module: Module,
+    root_table: SymbolTable,
+    make_function: Callable[[FuncDef, SymbolTable], Function] = Function
+) -> Evaluation:
+    # Functions are bound before anything runs so that they can call each other
+    for f in module.expressions:
+        if isinstance(f, FuncDef):
+            root_table.add_local(f.name.name, make_function(f, root_table))
+
     for expr in module.expressions[:len(module.expressions)-1]:
-        interpret(expr, root_table)
+        yield from evaluate(expr, root_table)
 
-    return interpret(module.expressions[-1], root_table)
+    return (yield from evaluate(module.expressions[-1], root_table))
 
 def interpret(node: Expression, symbol_table: SymbolTable) -> Value:
+    return run(evaluate(node, symbol_table))
+
+def evaluate(node: Expression, symbol_table: SymbolTable) -> Evaluation:
     match node:
         case Literal():
             return node.value
 
+        case FuncDef():
+            if not isinstance(symbol_table.bindings.get(node.name.name), Function):
+                symbol_table.add_local(node.name.name, Function(node, symbol_table))
+
         case FuncCall():
             func = symbol_table.require(node.name.name)
-            interpreted_args = [interpret(arg, symbol_table) for arg in node.args]
+            interpreted_args = []
+            for arg in node.args:
+                interpreted_args.append((yield from evaluate(arg, symbol_table)))
             if node.name.name == 'print_int' or node.name.name == 'print_bool':
                 if len(interpreted_args) != 1:
                     raise Exception(f'Function expects 1 argument, {len(interpreted_args)} given')
-                else:
-                    return func(interpreted_args[0])
             elif node.name.name == 'read_int':
                 if len(interpreted_args) > 0:
                     raise Exception(f'Function expects 0 arguments, {len(interpreted_args)} given')
-                else:
-                    return func()
-            else:
-                return func(*interpreted_args)
+
+            if isinstance(func, Function):
+                return (yield from func.call(*interpreted_args))
+            result = func(*interpreted_args)
+            if isawaitable(result):
+                result = yield result
+            return result
 
         case Identifier():
             return symbol_table.require(node.name)
 
         case BinaryOp():
             if node.op == '=':
-                return symbol_table.require(node.left.name, interpret(node.right, symbol_table)) # type: ignore[attr-defined]
+                return symbol_table.require(node.left.name, (yield from evaluate(node.right, symbol_table))) # type: ignore[attr-defined, arg-type]
 
             if node.op == 'and':
-                return interpret(node.left, symbol_table) and interpret(node.right, symbol_table)
+                return (yield from evaluate(node.left, symbol_table)) and (yield from evaluate(node.right, symbol_table))
 
             if node.op == 'or':
-                return interpret(node.left, symbol_table) or interpret(node.right, symbol_table)
+                return (yield from evaluate(node.left, symbol_table)) or (yield from evaluate(node.right, symbol_table))
 
-            return symbol_table.require(node.op)(
-                interpret(node.left, symbol_table),
-                interpret(node.right, symbol_table)
-            )
+            left = yield from evaluate(node.left, symbol_table)
+            right = yield from evaluate(node.right, symbol_table)
+            return symbol_table.require(node.op)(left, right)
 
         case UnaryOp():
             return symbol_table.require('unary_'+node.op)(
-                interpret(node.right, symbol_table)
+                (yield from evaluate(node.right, symbol_table))
             )
 
         case IfThenElse():
-            if interpret(node.cond, symbol_table):
-                return interpret(node.then, symbol_table)
+            if (yield from evaluate(node.cond, symbol_table)):
+                return (yield from evaluate(node.then, symbol_table))
             else:
                 if node.otherwise:
-                    return interpret(node.otherwise, symbol_table)
+                    return (yield from evaluate(node.otherwise, symbol_table))
 
         case While():
-            while interpret(node.cond, symbol_table):
-                interpret(node.body, symbol_table)
+            function = enclosing_function(symbol_table)
+            while (yield from evaluate(node.cond, symbol_table)):
+                yield from evaluate(node.body, symbol_table)
+                if function is not None:
+                    function.back_edge()
+                yield None
 
             return None
 
         case Var():
-            symbol_table.add_local(node.name.name, interpret(node.initialization, symbol_table))
+            symbol_table.add_local(node.name.name, (yield from evaluate(node.initialization, symbol_table)))
         
         case Block():
             new_symbol_table = SymbolTable(bindings={}, parent=symbol_table)
 
             for expr in node.statements[:len(node.statements)-1]:
-                interpret(expr, new_symbol_table)
+                yield from evaluate(expr, new_symbol_table)
 
-            return interpret(node.statements[-1], new_symbol_table)
+            return (yield from evaluate(node.statements[-1], new_symbol_table))
 
     return None
\ No newline at end of file
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Callable
 
 
@@ -7,6 +7,16 @@ class IntrinsicArgs():
     arg_refs: list[str]
     result_register: str
     emit: Callable[[str], None]
+    # Values of the arguments known at compile time, None for the others
+    arg_constants: list[int | None] = field(default_factory=list)
+    # Whether each argument is known to never be negative
+    arg_nonnegative: list[bool] = field(default_factory=list)
+
+    def constant(self, i: int) -> int | None:
+        return self.arg_constants[i] if i < len(self.arg_constants) else None
+
+    def nonnegative(self, i: int) -> bool:
+        return i < len(self.arg_nonnegative) and self.arg_nonnegative[i]
 
 Intrinsic = Callable[[IntrinsicArgs], None]
 
@@ -55,6 +65,11 @@ def minus(a: IntrinsicArgs) -> None:
 
 @_intrinsic("*")
 def multiply(a: IntrinsicArgs) -> None:
+    for i in [1, 0]:
+        factor = a.constant(i)
+        if factor is not None:
+            _multiply_by_constant(a, a.arg_refs[1-i], factor)
+            return
     if a.result_register != a.arg_refs[0]:
         a.emit(f'movq {a.arg_refs[0]}, {a.result_register}')
     a.emit(f'imulq {a.arg_refs[1]}, {a.result_register}')
@@ -62,6 +77,12 @@ def multiply(a: IntrinsicArgs) -> None:
 
 @_intrinsic("/")
 def divide(a: IntrinsicArgs) -> None:
+    divisor = a.constant(1)
+    if divisor is not None and can_divide_by_constant(divisor):
+        _divide_by_constant(a.arg_refs[0], divisor, a.emit, a.nonnegative(0))
+        if a.result_register != '%rax':
+            a.emit(f'movq %rax, {a.result_register}')
+        return
     a.emit(f'movq {a.arg_refs[0]}, %rax')
     a.emit('cqto')  # TODO: explain
     a.emit(f'idivq {a.arg_refs[1]}')
@@ -71,6 +92,21 @@ def divide(a: IntrinsicArgs) -> None:
 
 @_intrinsic("%")
 def remainder(a: IntrinsicArgs) -> None:
+    divisor = a.constant(1)
+    if divisor is not None and can_divide_by_constant(divisor) and a.nonnegative(0) and _is_power_of_two(abs(divisor)):
+        # The remainder of a non-negative dividend is its low bits
+        _and_mask(a.arg_refs[0], abs(divisor) - 1, a.result_register, a.emit)
+        return
+    if divisor is not None and can_divide_by_constant(divisor):
+        # n % d == n - (n / d) * d
+        _divide_by_constant(a.arg_refs[0], divisor, a.emit)
+        _multiply_register(divisor, '%rax', a.emit)
+        a.emit('movq %rax, %rdx')
+        a.emit(f'movq {a.arg_refs[0]}, %rax')
+        a.emit('subq %rdx, %rax')
+        if a.result_register != '%rax':
+            a.emit(f'movq %rax, {a.result_register}')
+        return
     # Same as division, but remainder is in register 'rdx'
     a.emit(f'movq {a.arg_refs[0]}, %rax')
     a.emit('cqto')
@@ -118,3 +154,124 @@ def _int_comparison(a: IntrinsicArgs, setcc_insn: str) -> None:
     a.emit(f'{setcc_insn} %al')
     if a.result_register != '%rax':
         a.emit(f'movq %rax, {a.result_register}')
+
+
+# Strength reduction of multiplication, division and remainder by constants.
+# Every sequence computes the same result as 'imulq' or 'idivq' would.
+
+def _is_power_of_two(x: int) -> bool:
+    return x > 0 and x & (x-1) == 0
+
+
+def _multiply_by_constant(a: IntrinsicArgs, ref: str, factor: int) -> None:
+    result = a.result_register
+    if factor == 0:
+        a.emit(f'xorq {result}, {result}')
+        return
+    a.emit(f'movq {ref}, {result}')
+    _multiply_register(factor, result, a.emit)
+
+
+def _multiply_register(factor: int, register: str, emit: Callable[[str], None]) -> None:
+    """Multiplies the value in `register` by `factor` in place."""
+    magnitude = abs(factor)
+    if magnitude == 1:
+        pass
+    elif _is_power_of_two(magnitude):
+        emit(f'shlq ${magnitude.bit_length()-1}, {register}')
+    elif magnitude in [3, 5, 9]:
+        emit(f'leaq ({register},{register},{magnitude-1}), {register}')
+    elif -2**31 <= factor < 2**31:
+        emit(f'imulq ${factor}, {register}, {register}')
+        return
+    else:
+        emit(f'movabsq ${factor}, %rcx')
+        emit(f'imulq %rcx, {register}')
+        return
+    if factor < 0:
+        emit(f'negq {register}')
+
+
+def can_divide_by_constant(divisor: int) -> bool:
+    """Tells whether division by `divisor` can be done without 'idivq'.
+
+    Division by 0 and -1 may trap, so it is left to 'idivq'. The smallest
+    64-bit integer is left to it too, because its magnitude does not fit."""
+    return divisor not in [0, -1] and -2**63 < divisor < 2**63
+
+
+def magic_numbers(divisor: int) -> tuple[int, int]:
+    """Returns the signed 64-bit multiplier and the shift that divide by `divisor`,
+    following Hacker's Delight, section 10-4. `abs(divisor)` must be at least 2."""
+    magnitude = abs(divisor)
+    t = 2**63 + (1 if divisor < 0 else 0)
+    anc = t - 1 - t % magnitude
+    p = 63
+    q1, r1 = divmod(2**63, anc)
+    q2, r2 = divmod(2**63, magnitude)
+    while True:
+        p += 1
+        q1, r1 = 2*q1, 2*r1
+        if r1 >= anc:
+            q1, r1 = q1 + 1, r1 - anc
+        q2, r2 = 2*q2, 2*r2
+        if r2 >= magnitude:
+            q2, r2 = q2 + 1, r2 - magnitude
+        delta = magnitude - r2
+        if not (q1 < delta or (q1 == delta and r1 == 0)):
+            break
+    multiplier = (q2 + 1) % 2**64
+    if multiplier >= 2**63:
+        multiplier -= 2**64
+    if divisor < 0:
+        multiplier = -multiplier
+    return multiplier, p - 64
+
+
+def _and_mask(ref: str, mask: int, register: str, emit: Callable[[str], None]) -> None:
+    """Emits the bitwise and of the value at `ref` and `mask` into `register`."""
+    emit(f'movq {ref}, {register}')
+    if mask < 2**31:
+        emit(f'andq ${mask}, {register}')
+    else:
+        emit(f'movabsq ${mask}, %rcx')
+        emit(f'andq %rcx, {register}')
+
+
+def _divide_by_constant(ref: str, divisor: int, emit: Callable[[str], None], nonnegative: bool = False) -> None:
+    """Emits a division of the value at `ref` by `divisor` that rounds toward zero.
+    The quotient ends up in 'rax' and 'rdx' is overwritten. A `nonnegative` dividend
+    needs no rounding fix-up when the divisor is a power of two."""
+    magnitude = abs(divisor)
+    if magnitude == 1:
+        emit(f'movq {ref}, %rax')
+    elif _is_power_of_two(magnitude) and nonnegative:
+        emit(f'movq {ref}, %rax')
+        emit(f'sarq ${magnitude.bit_length()-1}, %rax')
+    elif _is_power_of_two(magnitude):
+        k = magnitude.bit_length()-1
+        # Negative dividends are biased by divisor-1 so the shift rounds toward zero
+        emit(f'movq {ref}, %rax')
+        emit('movq %rax, %rdx')
+        if k > 1:
+            emit('sarq $63, %rdx')
+        emit(f'shrq ${64-k}, %rdx')
+        emit('addq %rdx, %rax')
+        emit(f'sarq ${k}, %rax')
+    else:
+        multiplier, shift = magic_numbers(divisor)
+        emit(f'movabsq ${multiplier}, %rax')
+        emit(f'imulq {ref}')
+        if divisor > 0 and multiplier < 0:
+            emit(f'addq {ref}, %rdx')
+        elif divisor < 0 and multiplier > 0:
+            emit(f'subq {ref}, %rdx')
+        if shift > 0:
+            emit(f'sarq ${shift}, %rdx')
+        # Adding the sign bit rounds negative quotients toward zero
+        emit('movq %rdx, %rax')
+        emit('shrq $63, %rax')
+        emit('addq %rdx, %rax')
+        return
+    if divisor < 0:
+        emit('negq %rax')
@@ -1,17 +1,26 @@
 from dataclasses import dataclass, fields
-from typing import Any, Dict
+from operator import attrgetter
+from typing import Any, Callable, Dict, TypeVar
 from compiler.location import Location
 from compiler.types import Type, get_global_symbol_table_types
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True, eq=False)
 class IRVar:
     """Represents the name of a memory location or built-in."""
     name: str
 
+    # The generated dataclass versions build a tuple on every call,
+    # which dominates dict and set operations in the analyses
+    def __eq__(self, other: object) -> bool:
+        return self is other or (type(other) is IRVar and self.name == other.name)
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
     def __str__(self) -> str:
         return self.name
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Instruction():
     """Base class for IR instructions."""
     location: Location
@@ -32,72 +41,292 @@ class Instruction():
         return f'{type(self).__name__}({args})'
 
 @dataclass(frozen=True)
+class OperandInfo:
+    """Describes which fields of an instruction class are variables it reads (`uses`),
+    variables it writes (`defs`) and labels it may jump to (`targets`).
+
+    The accessors are built once when the class is registered, from closures over
+    the field names, so analyses never need to inspect the fields of instructions."""
+    uses: tuple[str, ...]
+    defs: tuple[str, ...]
+    targets: tuple[str, ...]
+    get_uses: Callable[[Instruction], list['IRVar']]
+    get_defs: Callable[[Instruction], list['IRVar']]
+    get_targets: Callable[[Instruction], list['Label']]
+    map_uses: Callable[[Instruction, Callable[['IRVar'], 'IRVar']], Instruction]
+    map_defs: Callable[[Instruction, Callable[['IRVar'], 'IRVar']], Instruction]
+    map_targets: Callable[[Instruction, Callable[['Label'], 'Label']], Instruction]
+
+operand_info: Dict[type, OperandInfo] = {}
+
+I = TypeVar('I', bound=type)
+
+def _list_fields(cls: type) -> set[str]:
+    return {f.name for f in fields(cls) if getattr(f.type, '__origin__', None) is list}
+
+def _generate_getter(cls: type, names: tuple[str, ...]) -> Callable[[Instruction], list[Any]]:
+    list_fields = _list_fields(cls)
+    if not names:
+        return lambda insn: []
+    if len(names) == 1:
+        get = attrgetter(names[0])
+        if names[0] in list_fields:
+            return lambda insn: list(get(insn))
+        return lambda insn: [get(insn)]
+    parts = tuple((name, name in list_fields) for name in names)
+
+    def getter(insn: Instruction) -> list[Any]:
+        result = []
+        for name, is_list in parts:
+            if is_list:
+                result.extend(getattr(insn, name))
+            else:
+                result.append(getattr(insn, name))
+        return result
+    return getter
+
+def _generate_mapper(cls: type, names: tuple[str, ...]) -> Callable[[Instruction, Callable[[Any], Any]], Instruction]:
+    list_fields = _list_fields(cls)
+    # Every field in order, with whether `f` maps it and whether it holds a list
+    parts = tuple((f.name, f.name in names, f.name in list_fields) for f in fields(cls))
+
+    def mapper(insn: Instruction, f: Callable[[Any], Any]) -> Instruction:
+        args = []
+        for name, mapped, is_list in parts:
+            value = getattr(insn, name)
+            if mapped:
+                value = [f(v) for v in value] if is_list else f(value)
+            args.append(value)
+        return cls(*args)
+    return mapper
+
+def _operands(uses: tuple[str, ...] = (), defs: tuple[str, ...] = (), targets: tuple[str, ...] = ()) -> Callable[[I], I]:
+    """Class decorator that registers the operands of an instruction class."""
+    def wrapper(cls: I) -> I:
+        assert cls not in operand_info
+        operand_info[cls] = OperandInfo(
+            uses, defs, targets,
+            _generate_getter(cls, uses), _generate_getter(cls, defs), _generate_getter(cls, targets),
+            _generate_mapper(cls, uses), _generate_mapper(cls, defs), _generate_mapper(cls, targets),
+        )
+        return cls
+    return wrapper
+
+def uses(insn: Instruction) -> list['IRVar']:
+    """Returns the variables whose values the instruction reads."""
+    return operand_info[type(insn)].get_uses(insn)
+
+def defs(insn: Instruction) -> list['IRVar']:
+    """Returns the variables the instruction assigns a new value to."""
+    return operand_info[type(insn)].get_defs(insn)
+
+def targets(insn: Instruction) -> list['Label']:
+    """Returns the labels the instruction may jump to."""
+    return operand_info[type(insn)].get_targets(insn)
+
+def variables(insn: Instruction) -> list['IRVar']:
+    """Returns every variable the instruction reads or writes."""
+    info = operand_info[type(insn)]
+    return info.get_uses(insn) + info.get_defs(insn)
+
+def map_uses(insn: Instruction, f: Callable[['IRVar'], 'IRVar']) -> Instruction:
+    """Returns a copy of the instruction with every used variable `v` replaced by `f(v)`."""
+    return operand_info[type(insn)].map_uses(insn, f)
+
+def map_defs(insn: Instruction, f: Callable[['IRVar'], 'IRVar']) -> Instruction:
+    """Returns a copy of the instruction with every defined variable `v` replaced by `f(v)`."""
+    return operand_info[type(insn)].map_defs(insn, f)
+
+def map_targets(insn: Instruction, f: Callable[['Label'], 'Label']) -> Instruction:
+    """Returns a copy of the instruction with every jump target `l` replaced by `f(l)`."""
+    return operand_info[type(insn)].map_targets(insn, f)
+
+@_operands(defs=('dest',))
+@dataclass(frozen=True, slots=True)
 class LoadBoolConst(Instruction):
     """Loads a boolean constant value to `dest`."""
     value: bool
     dest: IRVar
 
-@dataclass(frozen=True)
+@_operands(defs=('dest',))
+@dataclass(frozen=True, slots=True)
 class LoadIntConst(Instruction):
     """Loads a constant value to `dest`."""
     value: int
     dest: IRVar
 
-@dataclass(frozen=True)
+@_operands(uses=('source',), defs=('dest',))
+@dataclass(frozen=True, slots=True)
 class Copy(Instruction):
     """Copies a value from one variable to another."""
     source: IRVar
     dest: IRVar
 
-@dataclass(frozen=True)
+# Writes through the pointer in `dest`, so both variables are only read
+@_operands(uses=('source', 'dest'))
+@dataclass(frozen=True, slots=True)
 class CopyPointer(Instruction):
     """Copies a memory address from one variable to another."""
     source: IRVar
     dest: IRVar
 
-@dataclass(frozen=True)
+@_operands(uses=('args',), defs=('dest',))
+@dataclass(frozen=True, slots=True)
 class Call(Instruction):
     """Calls a function or built-in."""
     fun: IRVar
     args: list[IRVar]
     dest: IRVar
 
-@dataclass(frozen=True)
+@_operands(uses=('var',))
+@dataclass(frozen=True, slots=True)
 class ReturnValue(Instruction):
     var: IRVar
 
-@dataclass(frozen=True)
+@_operands()
+@dataclass(frozen=True, slots=True, eq=False)
 class Label(Instruction):
-    """Marks the destination of a jump instruction."""
+    """Marks the destination of a jump instruction.
+
+    Labels are identified by name alone, wherever they appear in the code."""
     name: str
 
-@dataclass(frozen=True)
+    def __eq__(self, other: object) -> bool:
+        return self is other or (isinstance(other, Label) and self.name == other.name)
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+@_operands(targets=('label',))
+@dataclass(frozen=True, slots=True)
 class Jump(Instruction):
     """Unconditionally continues execution from the given label."""
     label: Label
 
-@dataclass(frozen=True)
+@_operands(uses=('cond',), targets=('then_label', 'else_label'))
+@dataclass(frozen=True, slots=True)
 class CondJump(Instruction):
     """Continues execution from `then_label` if `cond` is true, otherwise from `else_label`."""
     cond: IRVar
     then_label: Label
     else_label: Label
 
-@dataclass(frozen=True)
+@_operands(uses=('value',), targets=('labels', 'default'))
+@dataclass(frozen=True, slots=True)
+class JumpTable(Instruction):
+    """Continues execution from `labels[value - low]`, or from `default` when `value` is out of range."""
+    value: IRVar
+    low: int
+    labels: list[Label]
+    default: Label
+
+@_operands(uses=('cond', 'if_true', 'if_false'), defs=('dest',))
+@dataclass(frozen=True, slots=True)
+class Select(Instruction):
+    """Copies `if_true` to `dest` if `cond` is true, otherwise `if_false`, without jumping."""
+    cond: IRVar
+    if_true: IRVar
+    if_false: IRVar
+    dest: IRVar
+
+@_operands(defs=('dest',))
+@dataclass(frozen=True, slots=True)
 class LoadIntParam(Instruction):
     symbol: IRVar
     dest: IRVar
 
-@dataclass(frozen=True)
+@_operands(defs=('dest',))
+@dataclass(frozen=True, slots=True)
 class LoadBoolParam(Instruction):
     symbol: IRVar
     dest: IRVar
 
-@dataclass(frozen=True)
+@_operands(defs=('dest',))
+@dataclass(frozen=True, slots=True)
 class LoadPointerParam(Instruction):
     symbol: IRVar
     dest: IRVar
 
+@_operands(uses=('sources',), defs=('dest',))
+@dataclass(frozen=True, slots=True)
+class Phi(Instruction):
+    """Copies `sources[i]` to `dest` when control arrives from the block labelled `blocks[i]`.
+
+    Only exists while a function is in SSA form. All phis at the start of a block
+    read their sources before any of them writes its destination."""
+    sources: list[IRVar]
+    blocks: list[Label]
+    dest: IRVar
+
+class NameTable:
+    """Gives the variables and labels of a piece of IR dense integer ids.
+
+    Analyses index their state by these ids rather than by names;
+    the names are only needed again for printing."""
+    variables: list[IRVar]
+    labels: list[str]
+    _var_ids: Dict[IRVar, int]
+    _label_ids: Dict[str, int]
+
+    def __init__(self, instructions: list[Instruction]) -> None:
+        self.variables = []
+        self.labels = []
+        self._var_ids = {}
+        self._label_ids = {}
+        for insn in instructions:
+            if isinstance(insn, Label):
+                self.label_id(insn.name)
+            for var in variables(insn):
+                self.var_id(var)
+
+    def var_id(self, var: IRVar) -> int:
+        """Returns the id of `var`, numbering it if it has not been seen yet."""
+        id = self._var_ids.get(var)
+        if id is None:
+            id = self._var_ids[var] = len(self.variables)
+            self.variables.append(var)
+        return id
+
+    def label_id(self, name: str) -> int:
+        """Returns the id of the label called `name`, numbering it if it has not been seen yet."""
+        id = self._label_ids.get(name)
+        if id is None:
+            id = self._label_ids[name] = len(self.labels)
+            self.labels.append(name)
+        return id
+
+def constant_values(instructions: list[Instruction]) -> Dict[IRVar, int | bool]:
+    """Returns the variables that are only ever assigned a single constant value."""
+    definitions: Dict[IRVar, list[Instruction]] = {}
+    address_taken = set()
+    for insn in instructions:
+        if isinstance(insn, Call) and insn.fun.name == 'unary_&':
+            address_taken.update(insn.args)
+        for var in defs(insn):
+            definitions.setdefault(var, []).append(insn)
+
+    constants: Dict[IRVar, int | bool] = {}
+
+    def lookup(var: IRVar, seen: set[IRVar]) -> int | bool | None:
+        if var in constants:
+            return constants[var]
+        defs = definitions.get(var, [])
+        if len(defs) != 1 or var in address_taken or var in seen:
+            return None
+        insn = defs[0]
+        if isinstance(insn, LoadIntConst) or isinstance(insn, LoadBoolConst):
+            return insn.value
+        if isinstance(insn, Copy):
+            return lookup(insn.source, seen | {var})
+        return None
+
+    for var in definitions:
+        value = lookup(var, set())
+        if value is not None:
+            constants[var] = value
+
+    return constants
+
 def generate_root_var_types() -> Dict[IRVar, Type]: # type: ignore[valid-type]
     global_types = get_global_symbol_table_types().bindings
     root_types = {}
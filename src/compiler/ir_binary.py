@@ -0,0 +1,238 @@
+import mmap
+import struct
+from dataclasses import fields
+from typing import Any, BinaryIO, Dict, Self
+from compiler.ir import Call, CondJump, Copy, CopyPointer, Instruction, IRVar, Jump, JumpTable, Label, LoadBoolConst, LoadBoolParam, LoadIntConst, LoadIntParam, LoadPointerParam, Phi, ReturnValue, Select
+from compiler.location import Location
+
+# A binary IR file is laid out as
+#   header
+#   string table: (offset, length) of every string, then the UTF-8 bytes of all strings
+#   operand pool: the variables and labels of list operands, as string and label ids
+#   label table: (name, file, line, column) of every label operand
+#   function table: (name, instruction count, offset of the first record) of every function
+#   instruction records, one fixed-width record per instruction
+# All integers are little-endian. Names, variables and file names are string ids, label
+# operands are label ids so they keep their own locations.
+
+MAGIC = b'INIR'
+VERSION = 2
+
+HEADER = struct.Struct('<4sIIIIQQQQ')
+STRING = struct.Struct('<II')
+LABEL = struct.Struct('<IIii')
+FUNCTION = struct.Struct('<IIQ')
+# Opcode, file, line, column, five operand slots and a constant
+RECORD = struct.Struct('<IIii5Iq')
+OPERAND_SLOTS = 5
+CONSTANT_MIN = -2**63
+CONSTANT_MAX = 2**63 - 1
+
+# The opcode of an instruction is the position of its class here, new classes go at the end
+opcodes: list[type[Instruction]] = [
+    LoadBoolConst, LoadIntConst, Copy, CopyPointer, Call, ReturnValue, Label,
+    Jump, CondJump, LoadIntParam, LoadBoolParam, LoadPointerParam, Phi, Select,
+    JumpTable,
+]
+
+def _field_kind(t: Any) -> str:
+    if t is IRVar or t is Label or t is str:
+        return 'name'
+    if t is int or t is bool:
+        return 'value'
+    assert getattr(t, '__origin__', None) is list, t
+    return 'names'
+
+# The fields of every instruction class other than its location, with how they are stored.
+# Names take one operand slot and lists of names take two, an offset into the operand pool and a count.
+layouts: list[list[tuple[str, type, str]]] = [
+    [(f.name, f.type, _field_kind(f.type)) for f in fields(cls) if f.name != 'location'] # type: ignore[misc]
+    for cls in opcodes
+]
+
+class IRFormatError(Exception):
+    pass
+
+def write_ir(file: BinaryIO, ns_ins: Dict[str, list[Instruction]]) -> None:
+    """Writes a program in the binary IR format."""
+    strings: Dict[str, int] = {}
+    def string_id(s: str) -> int:
+        if s not in strings:
+            strings[s] = len(strings)
+        return strings[s]
+
+    labels: Dict[tuple[str, str, int, int], int] = {}
+    def operand_id(value: IRVar | Label | str) -> int:
+        if isinstance(value, IRVar):
+            return string_id(value.name)
+        if isinstance(value, Label):
+            key = (value.name, value.location.file, value.location.line, value.location.column)
+            if key not in labels:
+                labels[key] = len(labels)
+            return labels[key]
+        return string_id(value)
+
+    opcode_of = {cls: i for i, cls in enumerate(opcodes)}
+    pool: list[int] = []
+    records = bytearray()
+    function_table: list[tuple[int, int, int]] = []
+    for name, instructions in ns_ins.items():
+        function_table.append((string_id(name), len(instructions), len(records)))
+        for insn in instructions:
+            opcode = opcode_of[type(insn)]
+            slots: list[int] = []
+            value = 0
+            for field, _, kind in layouts[opcode]:
+                operand = getattr(insn, field)
+                if kind == 'name':
+                    slots.append(operand_id(operand))
+                elif kind == 'names':
+                    slots += [len(pool), len(operand)]
+                    pool.extend(operand_id(o) for o in operand)
+                else:
+                    value = int(operand)
+                    if not CONSTANT_MIN <= value <= CONSTANT_MAX:
+                        raise IRFormatError(f'{insn.location}: constant {value} does not fit in 64 bits')
+            slots += [0] * (OPERAND_SLOTS - len(slots))
+            location = insn.location
+            records += RECORD.pack(opcode, string_id(location.file), location.line, location.column, *slots, value)
+
+    encoded = [s.encode() for s in strings]
+    string_table = bytearray()
+    offset = 0
+    for data in encoded:
+        string_table += STRING.pack(offset, len(data))
+        offset += len(data)
+    string_table += b''.join(encoded)
+    label_table = b''.join(LABEL.pack(string_id(name), string_id(file), line, column) for name, file, line, column in labels)
+
+    strings_offset = HEADER.size
+    operands_offset = strings_offset + len(string_table)
+    labels_offset = operands_offset + len(pool) * 4
+    functions_offset = labels_offset + len(label_table)
+    records_offset = functions_offset + len(function_table) * FUNCTION.size
+
+    file.write(HEADER.pack(MAGIC, VERSION, len(function_table), len(strings), len(labels), strings_offset, operands_offset, labels_offset, functions_offset))
+    file.write(string_table)
+    file.write(struct.pack(f'<{len(pool)}I', *pool))
+    file.write(label_table)
+    for name_id, count, offset in function_table:
+        file.write(FUNCTION.pack(name_id, count, records_offset + offset))
+    file.write(records)
+
+def write_ir_file(path: str, ns_ins: Dict[str, list[Instruction]]) -> None:
+    with open(path, 'wb') as file:
+        write_ir(file, ns_ins)
+
+class IRFile:
+    """A binary IR file mapped into memory.
+
+    Nothing is read until it is asked for: the records of a function are decoded straight
+    from the mapping when the function is loaded, so separate processes can each load
+    their own functions from the same file."""
+    view: memoryview
+    function_offsets: Dict[str, tuple[int, int]]
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise IRFormatError(f'{path} is empty')
+        self.view = memoryview(self._map)
+        if len(self.view) < HEADER.size:
+            self.close()
+            raise IRFormatError(f'{path} is not a binary IR file')
+        magic, version, function_count, string_count, label_count, self._strings, self._operands, self._labels, functions = HEADER.unpack_from(self.view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise IRFormatError(f'{path} is not a binary IR file of version {VERSION}')
+        self._string_data = self._strings + string_count * STRING.size
+        self._string_cache: list[str | None] = [None] * string_count
+        self._vars: Dict[int, IRVar] = {}
+        self._label_cache: list[Label | None] = [None] * label_count
+        self.function_offsets = {}
+        for i in range(function_count):
+            name, count, offset = FUNCTION.unpack_from(self.view, functions + i * FUNCTION.size)
+            self.function_offsets[self.string(name)] = (count, offset)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.view.release()
+        self._map.close()
+        self._file.close()
+
+    def string(self, i: int) -> str:
+        cached = self._string_cache[i]
+        if cached is None:
+            offset, length = STRING.unpack_from(self.view, self._strings + i * STRING.size)
+            start = self._string_data + offset
+            cached = self._string_cache[i] = str(self.view[start:start+length], 'utf-8')
+        return cached
+
+    def var(self, i: int) -> IRVar:
+        # Every use of a variable shares one object, which makes comparing them cheap
+        var = self._vars.get(i)
+        if var is None:
+            var = self._vars[i] = IRVar(self.string(i))
+        return var
+
+    def label(self, i: int) -> Label:
+        label = self._label_cache[i]
+        if label is None:
+            name, file, line, column = LABEL.unpack_from(self.view, self._labels + i * LABEL.size)
+            label = self._label_cache[i] = Label(Location(self.string(file), line, column), self.string(name))
+        return label
+
+    def functions(self) -> list[str]:
+        return list(self.function_offsets)
+
+    def load(self, name: str) -> list[Instruction]:
+        """Decodes the instructions of a function."""
+        count, offset = self.function_offsets[name]
+        locations: Dict[tuple[int, int, int], Location] = {}
+        instructions: list[Instruction] = []
+        for opcode, file, line, column, *slots, value in RECORD.iter_unpack(self.view[offset:offset + count * RECORD.size]):
+            if opcode >= len(opcodes):
+                raise IRFormatError(f'Unknown opcode {opcode} in function {name}')
+            key = (file, line, column)
+            location = locations.get(key)
+            if location is None:
+                location = locations[key] = Location(self.string(file), line, column)
+            args: list[Any] = []
+            slot = 0
+            for _, t, kind in layouts[opcode]:
+                if kind == 'value':
+                    args.append(t(value))
+                elif kind == 'name':
+                    args.append(self.operand(t, slots[slot]))
+                    slot += 1
+                else:
+                    start, length = slots[slot], slots[slot+1]
+                    item = t.__args__[0]
+                    ids = struct.unpack_from(f'<{length}I', self.view, self._operands + start * 4)
+                    args.append([self.operand(item, i) for i in ids])
+                    slot += 2
+            instructions.append(opcodes[opcode](location, *args))
+        return instructions
+
+    def operand(self, t: type, i: int) -> IRVar | Label | str:
+        if t is IRVar:
+            return self.var(i)
+        if t is Label:
+            return self.label(i)
+        return self.string(i)
+
+    def load_all(self) -> Dict[str, list[Instruction]]:
+        return {name: self.load(name) for name in self.function_offsets}
+
+def read_ir_file(path: str) -> Dict[str, list[Instruction]]:
+    """Reads a whole program from a binary IR file."""
+    with IRFile(path) as file:
+        return file.load_all()
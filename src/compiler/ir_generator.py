@@ -7,7 +7,9 @@ def generate_ir(
     # 'root_types' parameter should map all global names
     # like 'print_int' and '+' to their types.
     root_types: dict[IRVar, Type], # type: ignore[valid-type]
-    root_module: Module 
+    root_module: Module,
+    # The top-level expressions of the module go into a function of this name
+    entry: str = 'main'
 ) -> Dict[str, list[Instruction]]:
     var_types: dict[IRVar, Type] = root_types.copy() # type: ignore[valid-type]
     # 'var_unit' is used when an expression's type is 'Unit'.
@@ -28,7 +30,7 @@ def generate_ir(
     # into this list.
     ins: list[Instruction] = []
     loop_context: list[tuple[Label, Label]] = []
-    ns_ins: Dict[str, list[Instruction]] = {'main': []}
+    ns_ins: Dict[str, list[Instruction]] = {entry: []}
 
     functions: list[FuncDef] = []
 
@@ -248,7 +250,7 @@ def generate_ir(
         var_counts['x'] = x_count
 
     ins.append(ReturnValue(root_module.location, IRVar('-1')))
-    ns_ins['main'] = ins
+    ns_ins[entry] = ins
     for f in functions:
         ins = []
         ins.append(Label(f.location, f'Start_{f.name.name}'))
@@ -0,0 +1,195 @@
+from typing import Callable, Dict
+from compiler.ir import Call, CondJump, Copy, CopyPointer, IRVar, Instruction, Jump, JumpTable, Label, LoadBoolConst, LoadBoolParam, LoadIntConst, LoadIntParam, LoadPointerParam, Phi, ReturnValue, Select
+from compiler.types import truncating_division
+
+DEFAULT_STEP_BUDGET = 100_000
+
+type IRValue = int | bool | Address | None
+
+class IRExecutionError(Exception):
+    """Raised when IR cannot be executed the same way as the native code would run it."""
+
+class StepBudgetExceeded(IRExecutionError):
+    """Raised when execution takes more instructions than the budget allows."""
+
+class InputRequired(IRExecutionError):
+    """Raised when the program calls `read_int` but no input was provided."""
+
+class Address:
+    """Pointer to a variable in the frame of a running function, as produced by `unary_&`."""
+    frame: Dict[IRVar, IRValue]
+    var: IRVar
+
+    def __init__(self, frame: Dict[IRVar, IRValue], var: IRVar) -> None:
+        self.frame = frame
+        self.var = var
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Address):
+            return NotImplemented
+        return self.frame is other.frame and self.var == other.var
+
+def wrap(value: int) -> int:
+    """Wraps an integer to the signed 64-bit range like x86-64 arithmetic does."""
+    return ((value + 2**63) % 2**64) - 2**63
+
+def divide(x: int, y: int) -> int:
+    # 'idivq' traps on both of these
+    if y == 0 or (x == -2**63 and y == -1):
+        raise IRExecutionError('Division overflow')
+    return truncating_division(x, y)
+
+intrinsic_semantics: dict[str, Callable[..., IRValue]] = {
+    'unary_-': lambda x: wrap(-x),
+    'unary_not': lambda x: not x,
+    '+': lambda x, y: wrap(x + y),
+    '-': lambda x, y: wrap(x - y),
+    '*': lambda x, y: wrap(x * y),
+    '/': lambda x, y: divide(x, y),
+    '%': lambda x, y: x - y*divide(x, y),
+    '<': lambda x, y: x < y,
+    '<=': lambda x, y: x <= y,
+    '>': lambda x, y: x > y,
+    '>=': lambda x, y: x >= y,
+    '==': lambda x, y: x == y,
+    '!=': lambda x, y: x != y,
+}
+
+class IRInterpreter:
+    """Executes IR with the same 64-bit semantics as the generated assembly.
+
+    Printed values are collected into `outputs` as `(function name, value)` pairs.
+    Every executed instruction counts against `budget`."""
+    ns_ins: Dict[str, list[Instruction]]
+    budget: int
+    steps: int
+    read_int: Callable[[], int] | None
+    outputs: list[tuple[str, int | bool]]
+    _labels: Dict[str, Dict[str, int]]
+
+    def __init__(
+        self,
+        ns_ins: Dict[str, list[Instruction]],
+        budget: int = DEFAULT_STEP_BUDGET,
+        read_int: Callable[[], int] | None = None
+    ) -> None:
+        self.ns_ins = ns_ins
+        self.budget = budget
+        self.steps = 0
+        self.read_int = read_int
+        self.outputs = []
+        self._labels = {}
+
+    def output_text(self) -> str:
+        """Returns the outputs formatted the way the native `print_int` and `print_bool` write them."""
+        return ''.join(
+            (str(value).lower() if name == 'print_bool' else str(value)) + '\n'
+            for name, value in self.outputs
+        )
+
+    def run(self) -> None:
+        self.call('main', [])
+
+    def call(self, name: str, args: list[IRValue]) -> IRValue:
+        if name not in self.ns_ins:
+            raise IRExecutionError(f'Unknown function {name}')
+
+        instructions = self.ns_ins[name]
+        if name not in self._labels:
+            self._labels[name] = {insn.name: i for i, insn in enumerate(instructions) if isinstance(insn, Label)}
+        labels = self._labels[name]
+
+        frame: Dict[IRVar, IRValue] = {}
+        param_count = 0
+
+        def read(var: IRVar) -> IRValue:
+            if var in frame:
+                return frame[var]
+            if var.name == 'unit':
+                return None
+            raise IRExecutionError(f'Variable {var} read before it was written')
+
+        # Phis pick their source by the label of the block control came from
+        previous_block: str | None = None
+        current_block: str | None = None
+
+        pc = 0
+        while pc < len(instructions):
+            self.steps += 1
+            if self.steps > self.budget:
+                raise StepBudgetExceeded(f'Execution exceeded its budget of {self.budget} steps')
+
+            insn = instructions[pc]
+            pc += 1
+            match insn:
+                case Label():
+                    previous_block, current_block = current_block, insn.name
+                case Phi():
+                    # All phis of a block read their sources before any of them is written
+                    phis = [insn]
+                    while pc < len(instructions) and isinstance(instructions[pc], Phi):
+                        phis.append(instructions[pc]) # type: ignore[arg-type]
+                        pc += 1
+                    values = [read(phi.sources[[l.name for l in phi.blocks].index(previous_block)]) for phi in phis] # type: ignore[arg-type]
+                    for phi, value in zip(phis, values):
+                        frame[phi.dest] = value
+                case LoadIntConst():
+                    frame[insn.dest] = wrap(insn.value)
+                case LoadBoolConst():
+                    frame[insn.dest] = insn.value
+                case Copy():
+                    frame[insn.dest] = read(insn.source)
+                case Select():
+                    frame[insn.dest] = read(insn.if_true) if read(insn.cond) else read(insn.if_false)
+                case CopyPointer():
+                    address = read(insn.dest)
+                    if not isinstance(address, Address):
+                        raise IRExecutionError(f'{insn.dest} is not a pointer')
+                    address.frame[address.var] = read(insn.source)
+                case LoadIntParam() | LoadBoolParam() | LoadPointerParam():
+                    if param_count >= len(args):
+                        raise IRExecutionError(f'Function {name} called with too few arguments')
+                    frame[insn.dest] = args[param_count]
+                    param_count += 1
+                case Jump():
+                    pc = labels[insn.label.name]
+                case CondJump():
+                    pc = labels[insn.then_label.name] if read(insn.cond) else labels[insn.else_label.name]
+                case JumpTable():
+                    offset = read(insn.value) - insn.low # type: ignore[operator]
+                    target = insn.labels[offset] if 0 <= offset < len(insn.labels) else insn.default
+                    pc = labels[target.name]
+                case Call():
+                    frame[insn.dest] = self.call_function(insn, frame, read)
+                case ReturnValue():
+                    return None if name == 'main' else read(insn.var)
+                case _:
+                    raise IRExecutionError(f'Cannot execute {insn}')
+
+        return None
+
+    def call_function(self, insn: Call, frame: Dict[IRVar, IRValue], read: Callable[[IRVar], IRValue]) -> IRValue:
+        fun = insn.fun.name
+        if fun == 'unary_&':
+            return Address(frame, insn.args[0])
+
+        args = [read(arg) for arg in insn.args]
+        if fun == 'unary_*':
+            address = args[0]
+            if not isinstance(address, Address) or address.var not in address.frame:
+                raise IRExecutionError(f'Invalid dereference in {insn}')
+            return address.frame[address.var]
+        if fun in intrinsic_semantics:
+            return intrinsic_semantics[fun](*args)
+        if fun == 'print_int' or fun == 'print_bool':
+            self.outputs.append((fun, args[0])) # type: ignore[arg-type]
+            return None
+        if fun == 'read_int':
+            if self.read_int is None:
+                raise InputRequired('read_int called without input')
+            return wrap(self.read_int())
+
+        try:
+            return self.call(fun, args)
+        except RecursionError:
+            raise IRExecutionError('Recursion too deep to execute')
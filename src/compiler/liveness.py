@@ -0,0 +1,53 @@
+from compiler.cfg import ControlFlowGraph
+from compiler.ir import IRVar, Phi, defs, uses
+
+def phi_uses(cfg: ControlFlowGraph, block: int, successor: int) -> set[IRVar]:
+    """Returns the variables the phis of `successor` read when entered from `block`."""
+    label = cfg.labels[block]
+    result = set()
+    for insn in cfg.blocks[successor]:
+        if isinstance(insn, Phi):
+            for source, pred in zip(insn.sources, insn.blocks):
+                if pred == label:
+                    result.add(source)
+    return result
+
+def liveness(cfg: ControlFlowGraph) -> tuple[list[set[IRVar]], list[set[IRVar]]]:
+    """Returns the variables live at the start and at the end of every block.
+
+    A phi reads its source at the end of the corresponding predecessor
+    and writes its destination at the start of its own block, so neither
+    shows up in the live-in set of the phi's block."""
+    n = len(cfg.blocks)
+    gen: list[set[IRVar]] = [set() for _ in range(n)]
+    kill: list[set[IRVar]] = [set() for _ in range(n)]
+    for b, block in enumerate(cfg.blocks):
+        for insn in block:
+            if isinstance(insn, Phi):
+                kill[b].add(insn.dest)
+                continue
+            for var in uses(insn):
+                if var not in kill[b]:
+                    gen[b].add(var)
+            kill[b].update(defs(insn))
+
+    edge_uses = {(b, s): phi_uses(cfg, b, s) for b in range(n) for s in cfg.successors[b]}
+
+    live_in: list[set[IRVar]] = [set() for _ in range(n)]
+    live_out: list[set[IRVar]] = [set() for _ in range(n)]
+    order = cfg.postorder()
+    changed = True
+    while changed:
+        changed = False
+        for b in order:
+            out: set[IRVar] = set()
+            for s in cfg.successors[b]:
+                out |= live_in[s]
+                out |= edge_uses[(b, s)]
+            new_in = gen[b] | (out - kill[b])
+            if out != live_out[b] or new_in != live_in[b]:
+                live_out[b] = out
+                live_in[b] = new_in
+                changed = True
+
+    return live_in, live_out
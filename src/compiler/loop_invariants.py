@@ -0,0 +1,89 @@
+from typing import Dict
+from compiler.cfg import ControlFlowGraph, immediate_dominators
+from compiler.intrinsics import all_intrinsics
+from compiler.ir import Call, Copy, CopyPointer, IRVar, Instruction, LoadBoolConst, LoadIntConst, Select, defs, uses
+from compiler.ir_interpreter import intrinsic_semantics
+from compiler.loops import Loop, insert_preheader, natural_loops
+from compiler.partial_evaluator import impure_builtins
+from compiler.pass_manager import AnalysisManager
+from compiler.ssa import address_taken_variables, from_ssa, to_ssa
+
+def writes_memory(insn: Instruction, address_taken: set[IRVar]) -> bool:
+    if isinstance(insn, CopyPointer):
+        return True
+    if isinstance(insn, Call) and insn.fun.name not in all_intrinsics and insn.fun.name not in impure_builtins:
+        return True
+    return any(var in address_taken for var in defs(insn))
+
+def invariant_instructions(cfg: ControlFlowGraph, loop: Loop, address_taken: set[IRVar]) -> list[Instruction]:
+    """Returns the instructions of a loop in SSA form that compute the same value on every
+    iteration and can run even when the loop would not, in an order they can run in."""
+    body = [insn for b in cfg.reverse_postorder() if b in loop.blocks for insn in cfg.blocks[b]]
+    defined_in_loop = {var for insn in body for var in defs(insn)}
+    memory_changes = any(writes_memory(insn, address_taken) for insn in body)
+    definitions = {var: insn for insn in cfg.instructions() for var in defs(insn)}
+    invariant: set[IRVar] = set()
+    hoisted: list[Instruction] = []
+
+    def is_invariant(var: IRVar) -> bool:
+        return var not in address_taken and (var not in defined_in_loop or var in invariant)
+
+    def can_hoist(insn: Instruction) -> bool:
+        if any(var in address_taken for var in defs(insn)):
+            return False
+        match insn:
+            case LoadIntConst() | LoadBoolConst():
+                return True
+            case Copy():
+                return is_invariant(insn.source)
+            case Select():
+                return all(is_invariant(var) for var in uses(insn))
+            case Call() if insn.fun.name in intrinsic_semantics or insn.fun.name == 'unary_*':
+                if not all(is_invariant(arg) for arg in insn.args):
+                    return False
+                if insn.fun.name == 'unary_*':
+                    return not memory_changes
+                if insn.fun.name in ['/', '%']:
+                    # Division may only run early if it cannot trap
+                    divisor = definitions.get(insn.args[1])
+                    return isinstance(divisor, LoadIntConst) and divisor.value not in [0, -1]
+                return True
+        return False
+
+    changed = True
+    while changed:
+        changed = False
+        for insn in body:
+            dests = defs(insn)
+            if len(dests) == 1 and dests[0] not in invariant and can_hoist(insn):
+                invariant.add(dests[0])
+                hoisted.append(insn)
+                changed = True
+
+    return hoisted
+
+def hoist_function_invariants(instructions: list[Instruction]) -> list[Instruction]:
+    """Moves loop-invariant computations of a function in SSA form into loop preheaders.
+
+    Inner loops are handled first, so invariants of nested loops can move out several levels."""
+    address_taken = address_taken_variables(instructions)
+    done: set[str] = set()
+    while True:
+        cfg = ControlFlowGraph(instructions)
+        loops = [loop for loop in natural_loops(cfg, immediate_dominators(cfg)) if cfg.labels[loop.header].name not in done] # type: ignore[union-attr]
+        if not loops:
+            return instructions
+        loop = loops[0]
+        header = cfg.labels[loop.header].name # type: ignore[union-attr]
+        done.add(header)
+
+        hoisted = invariant_instructions(cfg, loop, address_taken)
+        if hoisted:
+            moved = set(map(id, hoisted))
+            instructions = insert_preheader([insn for insn in instructions if id(insn) not in moved], header, hoisted)
+
+def hoist_loop_invariants(ns_ins: Dict[str, list[Instruction]], analyses: AnalysisManager | None = None) -> Dict[str, list[Instruction]]:
+    """Runs loop-invariant code motion on every function, going through SSA form.
+    `analyses` holds the analyses of `ns_ins` when they are already known."""
+    ssa = to_ssa(ns_ins, analyses)
+    return from_ssa({name: hoist_function_invariants(instructions) for name, instructions in ssa.items()})
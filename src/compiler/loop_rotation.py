@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+from typing import Dict
+from compiler.cfg import terminators
+from compiler.ir import CondJump, Instruction, Jump, Label, Phi, targets
+
+# Longest loop condition that is copied in front of its loop
+MAX_HEADER_SIZE = 10
+
+@dataclass
+class WhileLoop:
+    """A loop laid out the way `while` is lowered, as positions in the instruction list:
+    the start label, the conditional jump that ends the header, and the exit label."""
+    start: int
+    branch: int
+    end: int
+
+def while_loop(instructions: list[Instruction], start: int, references: Dict[int, list[int]]) -> WhileLoop | None:
+    """Recognizes the loop whose start label is at `start`.
+
+    The header must be straight-line code ending in a jump into the body right after it,
+    and the body must end by jumping back to the start. The loop must only be entered
+    by falling into its start, every other jump there must come from inside the body."""
+    i = start + 1
+    while i < len(instructions) and not isinstance(instructions[i], (Label, *terminators)):
+        i += 1
+    if i == len(instructions) or i - start > MAX_HEADER_SIZE or not isinstance(instructions[i], CondJump):
+        return None
+    branch = instructions[i]
+    assert isinstance(branch, CondJump)
+    if i+1 == len(instructions) or instructions[i+1] != branch.then_label or branch.then_label == branch.else_label:
+        return None
+    end = next((j for j in range(i+2, len(instructions)) if instructions[j] == branch.else_label), None)
+    if end is None:
+        return None
+    back = instructions[end-1]
+    if not isinstance(back, Jump) or back.label != instructions[start]:
+        return None
+    if isinstance(instructions[start-1], terminators) or any(not i < j < end for j in references.get(start, [])):
+        return None
+    return WhileLoop(start, i, end)
+
+def rotate_function_loops(instructions: list[Instruction]) -> list[Instruction]:
+    """Moves the condition of every while loop to the bottom of the loop and puts a copy
+    of it in front of the loop, so an iteration ends in a single conditional jump.
+
+    Jumps to the start label, such as those of `continue`, now reach the condition at the bottom."""
+    if any(isinstance(insn, Phi) for insn in instructions):
+        return instructions
+    changed = True
+    while changed:
+        changed = False
+        labels = {insn.name: i for i, insn in enumerate(instructions) if isinstance(insn, Label)}
+        references: Dict[int, list[int]] = {}
+        for i, insn in enumerate(instructions):
+            for label in targets(insn):
+                references.setdefault(labels[label.name], []).append(i)
+        for i, insn in enumerate(instructions):
+            if not isinstance(insn, Label) or i == 0 or (loop := while_loop(instructions, i, references)) is None:
+                continue
+            header = instructions[loop.start:loop.branch+1]
+            guard = header[1:]
+            body = instructions[loop.branch+1:loop.end-1]
+            instructions = instructions[:loop.start] + guard + body + header + instructions[loop.end:]
+            changed = True
+            break
+    return instructions
+
+def rotate_loops(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    """Turns while loops into a guarded loop that tests its condition at the bottom."""
+    return {name: rotate_function_loops(instructions) for name, instructions in ns_ins.items()}
@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from compiler.cfg import ControlFlowGraph, dominates, immediate_dominators, terminators
+from compiler.ir import Instruction, IRVar, Jump, Label, Phi, map_targets
+
+@dataclass
+class Loop:
+    """A natural loop: the blocks of a CFG that reach a back edge into `header` without passing it."""
+    header: int
+    blocks: set[int]
+    latches: list[int]
+
+def natural_loops(cfg: ControlFlowGraph, idom: list[int]) -> list[Loop]:
+    """Returns the natural loops of a CFG, inner loops before the loops containing them.
+
+    Back edges into the same header make up a single loop."""
+    reachable = cfg.reachable()
+    loops: dict[int, Loop] = {}
+    for b, succs in enumerate(cfg.successors):
+        if not reachable[b]:
+            continue
+        for header in succs:
+            if not dominates(idom, header, b):
+                continue
+            loop = loops.setdefault(header, Loop(header, {header}, []))
+            loop.latches.append(b)
+            worklist = [b]
+            while worklist:
+                block = worklist.pop()
+                if block in loop.blocks:
+                    continue
+                loop.blocks.add(block)
+                worklist.extend(cfg.predecessors[block])
+
+    return sorted(loops.values(), key=lambda loop: len(loop.blocks))
+
+def find_loop(cfg: ControlFlowGraph, header: str) -> Loop | None:
+    """Returns the natural loop whose header starts with the label `header`."""
+    h = cfg.block_of_label.get(header)
+    return next((loop for loop in natural_loops(cfg, immediate_dominators(cfg)) if loop.header == h), None)
+
+def insert_preheader(instructions: list[Instruction], header: str, body: list[Instruction] = []) -> list[Instruction]:
+    """Inserts a block containing `body` that control passes through right before entering
+    the loop at label `header` from outside of the loop.
+
+    Phis of the header get a single entry from the preheader. When the loop is entered
+    from several places, the preheader gets phis of its own."""
+    cfg = ControlFlowGraph(instructions)
+    loop = find_loop(cfg, header)
+    assert loop is not None, f'No loop starts at {header}'
+    h = loop.header
+    target = cfg.labels[h]
+    assert target is not None
+    outside = [p for p in cfg.predecessors[h] if p not in loop.blocks]
+
+    name = f'{header}_preheader'
+    while name in cfg.block_of_label:
+        name += '_'
+    preheader = Label(target.location, name)
+    outside_labels = [cfg.labels[p] for p in outside]
+
+    preheader_phis: list[Instruction] = []
+    header_block: list[Instruction] = []
+    for insn in cfg.blocks[h]:
+        if isinstance(insn, Phi):
+            entries = [(source, label) for source, label in zip(insn.sources, insn.blocks) if label not in outside_labels]
+            incoming = [source for source, label in zip(insn.sources, insn.blocks) if label in outside_labels]
+            if len(incoming) == 1:
+                entries.append((incoming[0], preheader))
+            elif incoming:
+                merged = IRVar(f'{insn.dest.name}.pre')
+                preheader_phis.append(Phi(insn.location, incoming, [label for label in insn.blocks if label in outside_labels], merged))
+                entries.append((merged, preheader))
+            insn = Phi(insn.location, [source for source, _ in entries], [label for _, label in entries], insn.dest)
+        header_block.append(insn)
+
+    result: list[Instruction] = []
+    for b, block in enumerate(cfg.blocks):
+        if b == h:
+            result.extend([preheader, *preheader_phis, *body, Jump(target.location, target)])
+            result.extend(header_block)
+            continue
+        if b in outside and block and isinstance(block[-1], terminators):
+            block = [*block[:-1], map_targets(block[-1], lambda l: preheader if l == target else l)]
+        result.extend(block)
+        if b+1 == h and b in loop.blocks and not (block and isinstance(block[-1], terminators)):
+            # A latch falling through into the header would now fall into the preheader
+            result.append(Jump(target.location, target))
+
+    return result
@@ -0,0 +1,82 @@
+from typing import Dict
+from compiler.cfg_simplification import simplify_control_flow
+from compiler.escape_analysis import promote_variables
+from compiler.if_conversion import if_convert
+from compiler.dead_code import eliminate_dead_code, remove_unreachable_blocks
+from compiler.inliner import DEFAULT_INLINE_BUDGET, inline_functions
+from compiler.ir import Instruction
+from compiler.loop_invariants import hoist_loop_invariants
+from compiler.loop_rotation import rotate_loops
+from compiler.pass_manager import Pass, PassManager, Repeat
+from compiler.partial_evaluator import partially_evaluate
+from compiler.propagation import propagate_constants, propagate_copies
+from compiler.ranges import fold_ranges
+from compiler.specialization import specialize_functions
+from compiler.switch_lowering import lower_switches
+from compiler.tail_calls import eliminate_tail_calls
+from compiler.unrolling import DEFAULT_UNROLL_BUDGET, unroll_loops
+from compiler.value_numbering import eliminate_common_subexpressions
+
+# Folding, propagation and dead code elimination enable each other,
+# they are repeated until nothing changes or this many rounds have run
+MAX_SIMPLIFY_ROUNDS = 10
+
+SIMPLIFY = Repeat('simplify', [
+    Pass('propagate_constants', lambda ns_ins, analyses: propagate_constants(ns_ins, analyses.get('reaching_definitions')), requires=('reaching_definitions',)),
+    Pass('remove_unreachable_blocks', lambda ns_ins, _: remove_unreachable_blocks(ns_ins)),
+    # Only uses change, definitions stay where they were
+    Pass('propagate_copies', lambda ns_ins, analyses: propagate_copies(ns_ins, analyses.get('available_copies')), requires=('available_copies',), invalidates=('cfg', 'liveness')),
+    Pass('eliminate_dead_code', lambda ns_ins, analyses: eliminate_dead_code(ns_ins, analyses.get('reaching_definitions')), requires=('reaching_definitions',)),
+], MAX_SIMPLIFY_ROUNDS)
+
+# Going into SSA form reuses these analyses of every function
+SSA_ANALYSES = ('cfg', 'dominators', 'liveness')
+
+def simplify(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    """Runs constant and copy propagation and dead code elimination until they stop making progress."""
+    return PassManager([SIMPLIFY]).run(ns_ins)
+
+def pipeline(level: int, inline_budget: int = DEFAULT_INLINE_BUDGET, unroll_budget: int = DEFAULT_UNROLL_BUDGET) -> list[Pass | Repeat]:
+    """Returns the passes run at an optimization level.
+
+    -O1 runs the passes that do not make the program larger. -O2 also evaluates what it can
+    at compile time and runs the passes that trade code size for speed."""
+    passes: list[Pass | Repeat] = []
+    if level >= 2:
+        passes.append(Pass('partially_evaluate', lambda ns_ins, _: partially_evaluate(ns_ins)))
+    if level >= 1:
+        passes.append(Pass('promote_variables', lambda ns_ins, _: promote_variables(ns_ins)))
+        # Functions whose only recursion is a tail call become loops, which can be inlined
+        passes.append(Pass('eliminate_tail_calls', lambda ns_ins, _: eliminate_tail_calls(ns_ins)))
+    if level >= 2:
+        passes += [
+            Pass('specialize_functions', lambda ns_ins, _: specialize_functions(ns_ins)),
+            Pass('inline_functions', lambda ns_ins, _: inline_functions(ns_ins, inline_budget)),
+            Pass('unroll_loops', lambda ns_ins, _: unroll_loops(ns_ins, unroll_budget)),
+        ]
+    if level >= 1:
+        passes += [
+            SIMPLIFY,
+            # Branches the ranges decide become jumps, the next simplification removes the dead arms
+            Pass('fold_ranges', lambda ns_ins, _: fold_ranges(ns_ins)),
+            Pass('eliminate_common_subexpressions', lambda ns_ins, analyses: eliminate_common_subexpressions(ns_ins, analyses), requires=SSA_ANALYSES),
+            Pass('hoist_loop_invariants', lambda ns_ins, analyses: hoist_loop_invariants(ns_ins, analyses), requires=SSA_ANALYSES),
+            # Before if-conversion, which would turn the last links of a chain into selects
+            Pass('lower_switches', lambda ns_ins, _: lower_switches(ns_ins)),
+            Pass('if_convert', lambda ns_ins, _: if_convert(ns_ins)),
+            # After if-conversion has turned `and` and `or` in loop conditions into straight-line code
+            Pass('rotate_loops', lambda ns_ins, _: rotate_loops(ns_ins)),
+            SIMPLIFY,
+            Pass('simplify_control_flow', lambda ns_ins, _: simplify_control_flow(ns_ins)),
+        ]
+    return passes
+
+def optimize(ns_ins: Dict[str, list[Instruction]], level: int, inline_budget: int = DEFAULT_INLINE_BUDGET, unroll_budget: int = DEFAULT_UNROLL_BUDGET, time_passes: bool = False) -> Dict[str, list[Instruction]]:
+    """Runs the IR optimizations enabled at the given optimization level.
+
+    With `time_passes`, the time and IR size of every pass are reported on standard error."""
+    manager = PassManager(pipeline(level, inline_budget, unroll_budget))
+    ns_ins = manager.run(ns_ins)
+    if time_passes:
+        manager.report()
+    return ns_ins
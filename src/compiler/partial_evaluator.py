@@ -0,0 +1,111 @@
+from typing import Dict
+from compiler.intrinsics import all_intrinsics
+from compiler.ir import Call, CopyPointer, IRVar, Instruction, Label, LoadBoolConst, LoadIntConst, LoadPointerParam, ReturnValue, constant_values
+from compiler.ir_interpreter import DEFAULT_STEP_BUDGET, IRExecutionError, IRInterpreter
+
+# Functions whose effects are visible outside of the program
+impure_builtins = ['print_int', 'print_bool', 'read_int']
+
+# Programs printing more than this are not replaced by their output, to keep the code small
+MAX_FOLDED_OUTPUTS = 1000
+
+def pure_functions(ns_ins: Dict[str, list[Instruction]]) -> set[str]:
+    """Returns the user functions that have no effects other than computing their return value.
+
+    Pure functions do not print, read input or touch pointers, and only call
+    intrinsics and other pure functions. Reading a global is not detected here,
+    but executing such a function at compile time fails, so it never gets folded."""
+    candidates = set()
+    for name, instructions in ns_ins.items():
+        if name == 'main':
+            continue
+        pure = True
+        for insn in instructions:
+            if isinstance(insn, LoadPointerParam) or isinstance(insn, CopyPointer):
+                pure = False
+            elif isinstance(insn, Call):
+                if insn.fun.name in impure_builtins or insn.fun.name in ['unary_&', 'unary_*']:
+                    pure = False
+                elif insn.fun.name not in all_intrinsics and insn.fun.name not in ns_ins:
+                    pure = False
+        if pure:
+            candidates.add(name)
+
+    # Drop functions calling impure ones until nothing changes
+    changed = True
+    while changed:
+        changed = False
+        for name in list(candidates):
+            for insn in ns_ins[name]:
+                if isinstance(insn, Call) and insn.fun.name in ns_ins and insn.fun.name not in candidates:
+                    candidates.remove(name)
+                    changed = True
+                    break
+
+    return candidates
+
+def evaluate_calls(ns_ins: Dict[str, list[Instruction]], budget: int = DEFAULT_STEP_BUDGET) -> Dict[str, list[Instruction]]:
+    """Replaces calls to pure functions with constant arguments by the value they return."""
+    pure = pure_functions(ns_ins)
+    result: Dict[str, list[Instruction]] = {}
+
+    for name, instructions in ns_ins.items():
+        instructions = list(instructions)
+        changed = True
+        # Folding a call makes its result constant, which can enable folding the next one
+        while changed:
+            changed = False
+            constants = constant_values(instructions)
+            for i, insn in enumerate(instructions):
+                if not isinstance(insn, Call) or insn.fun.name not in pure:
+                    continue
+                if any(arg not in constants for arg in insn.args):
+                    continue
+                try:
+                    value = IRInterpreter(ns_ins, budget).call(insn.fun.name, [constants[arg] for arg in insn.args])
+                except IRExecutionError:
+                    continue
+                if isinstance(value, bool):
+                    instructions[i] = LoadBoolConst(insn.location, value, insn.dest)
+                    changed = True
+                elif isinstance(value, int):
+                    instructions[i] = LoadIntConst(insn.location, value, insn.dest)
+                    changed = True
+        result[name] = instructions
+
+    return result
+
+def evaluate_program(ns_ins: Dict[str, list[Instruction]], budget: int = DEFAULT_STEP_BUDGET) -> Dict[str, list[Instruction]] | None:
+    """Runs the whole program at compile time if it reads no input and finishes within `budget`.
+
+    Returns a program that only prints the precomputed output, or None if the program
+    could not be evaluated."""
+    interpreter = IRInterpreter(ns_ins, budget)
+    try:
+        interpreter.run()
+    except IRExecutionError:
+        return None
+    if len(interpreter.outputs) > MAX_FOLDED_OUTPUTS:
+        return None
+
+    main = ns_ins['main']
+    location = main[0].location
+    ins: list[Instruction] = [Label(location, 'Start_1')]
+    for i, (fun, value) in enumerate(interpreter.outputs):
+        var = IRVar(f'x{i*2+1}')
+        if isinstance(value, bool):
+            ins.append(LoadBoolConst(location, value, var))
+        else:
+            ins.append(LoadIntConst(location, value, var))
+        ins.append(Call(location, IRVar(fun), [var], IRVar(f'x{i*2+2}')))
+    ins.append(ReturnValue(location, IRVar('-1')))
+
+    return {'main': ins}
+
+def partially_evaluate(ns_ins: Dict[str, list[Instruction]], budget: int = DEFAULT_STEP_BUDGET) -> Dict[str, list[Instruction]]:
+    """Evaluates everything that can be known at compile time within the step budget."""
+    evaluated = evaluate_program(ns_ins, budget)
+    if evaluated is not None:
+        return evaluated
+
+    return evaluate_calls(ns_ins, budget)
@@ -0,0 +1,143 @@
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, TextIO
+from compiler.cfg import ControlFlowGraph, immediate_dominators
+from compiler.dataflow import available_copies, reaching_definitions
+from compiler.inliner import call_graph
+from compiler.ir import Instruction
+from compiler.liveness import liveness
+
+type Program = Dict[str, list[Instruction]]
+
+# Analyses of a single function, computed from the analysis manager and the function's name
+function_analyses: Dict[str, Callable[['AnalysisManager', str], Any]] = {
+    'cfg': lambda analyses, name: ControlFlowGraph(analyses.program[name]),
+    'dominators': lambda analyses, name: immediate_dominators(analyses.get('cfg', name)),
+    'liveness': lambda analyses, name: liveness(analyses.get('cfg', name)),
+}
+
+# Analyses of the whole program
+program_analyses: Dict[str, Callable[['AnalysisManager'], Any]] = {
+    'reaching_definitions': lambda analyses: reaching_definitions(analyses.program),
+    'available_copies': lambda analyses: available_copies(analyses.program),
+    'call_graph': lambda analyses: call_graph(analyses.program),
+}
+
+# The analyses each analysis is computed from, which become stale along with them
+dependencies: Dict[str, list[str]] = {
+    'dominators': ['cfg'],
+    'liveness': ['cfg'],
+}
+
+ALL_ANALYSES = (*function_analyses, *program_analyses)
+
+def ir_size(program: Program) -> int:
+    return sum(len(instructions) for instructions in program.values())
+
+class AnalysisManager:
+    """Computes analyses of a program when they are first asked for and keeps
+    them until a pass that changes the program invalidates them."""
+    program: Program
+    cache: Dict[tuple[str, str | None], Any]
+
+    def __init__(self, program: Program) -> None:
+        self.program = program
+        self.cache = {}
+
+    def get(self, analysis: str, function: str | None = None) -> Any:
+        """Returns an analysis of the program, or of `function` for function analyses."""
+        key = (analysis, function)
+        if key not in self.cache:
+            if analysis in function_analyses:
+                assert function is not None, f'{analysis} is an analysis of a function'
+                self.cache[key] = function_analyses[analysis](self, function)
+            else:
+                self.cache[key] = program_analyses[analysis](self)
+        return self.cache[key]
+
+    def update(self, program: Program, invalidated: tuple[str, ...]) -> None:
+        """Replaces the program with the result of a pass, dropping the invalidated analyses
+        and the ones computed from them."""
+        self.program = program
+        stale = set(invalidated)
+        changed = True
+        while changed:
+            changed = False
+            for analysis, sources in dependencies.items():
+                if analysis not in stale and any(source in stale for source in sources):
+                    stale.add(analysis)
+                    changed = True
+        self.cache = {key: value for key, value in self.cache.items() if key[0] not in stale}
+
+@dataclass(frozen=True)
+class Pass:
+    """A transformation of the program.
+
+    `requires` names the analyses the pass reads from the analysis manager, they are computed
+    before it runs. `invalidates` names the analyses that are out of date once it changes the program."""
+    name: str
+    run: Callable[[Program, AnalysisManager], Program]
+    requires: tuple[str, ...] = ()
+    invalidates: tuple[str, ...] = ALL_ANALYSES
+
+@dataclass(frozen=True)
+class Repeat:
+    """Runs a group of passes until the program stops changing or `max_rounds` rounds have run."""
+    name: str
+    passes: list['Pass | Repeat']
+    max_rounds: int
+
+@dataclass(frozen=True)
+class PassTiming:
+    name: str
+    seconds: float
+    size_before: int
+    size_after: int
+
+class PassManager:
+    """Runs a pipeline of passes, sharing analyses between them."""
+    pipeline: list[Pass | Repeat]
+    timings: list[PassTiming]
+
+    def __init__(self, pipeline: list[Pass | Repeat]) -> None:
+        self.pipeline = pipeline
+        self.timings = []
+
+    def run(self, program: Program) -> Program:
+        return self.run_passes(self.pipeline, program, AnalysisManager(program))
+
+    def run_passes(self, passes: list[Pass | Repeat], program: Program, analyses: AnalysisManager) -> Program:
+        for p in passes:
+            if isinstance(p, Repeat):
+                for _ in range(p.max_rounds):
+                    previous = program
+                    program = self.run_passes(p.passes, program, analyses)
+                    if program == previous:
+                        break
+            else:
+                program = self.run_pass(p, program, analyses)
+        return program
+
+    def run_pass(self, p: Pass, program: Program, analyses: AnalysisManager) -> Program:
+        start = time.perf_counter()
+        for analysis in p.requires:
+            if analysis in function_analyses:
+                for name in program:
+                    analyses.get(analysis, name)
+            else:
+                analyses.get(analysis)
+        result = p.run(program, analyses)
+        self.timings.append(PassTiming(p.name, time.perf_counter() - start, ir_size(program), ir_size(result)))
+        if result is not program and result != program:
+            analyses.update(result, p.invalidates)
+        return result
+
+    def report(self, file: TextIO = sys.stderr) -> None:
+        """Prints the wall time of every pass run, including the analyses it required,
+        and the number of instructions before and after it."""
+        print(f'{"Pass":<40} {"Time (ms)":>10} {"Before":>8} {"After":>8}', file=file)
+        for timing in self.timings:
+            print(f'{timing.name:<40} {timing.seconds*1000:>10.3f} {timing.size_before:>8} {timing.size_after:>8}', file=file)
+        total = sum(timing.seconds for timing in self.timings)
+        print(f'{"Total":<40} {total*1000:>10.3f}', file=file)
@@ -0,0 +1,112 @@
+from typing import Dict
+from compiler.dataflow import AvailableCopies, ReachingDefinitions, available_copies, reaching_definitions
+from compiler.ir import Call, CondJump, Copy, IRVar, Instruction, Jump, JumpTable, LoadBoolConst, LoadIntConst, Select, map_uses, uses
+from compiler.ir_interpreter import IRExecutionError, intrinsic_semantics
+from compiler.ssa import address_taken_variables
+
+def constant_definition(value: int | bool, insn: Instruction, dest: IRVar) -> Instruction:
+    if isinstance(value, bool):
+        return LoadBoolConst(insn.location, value, dest)
+    return LoadIntConst(insn.location, value, dest)
+
+def propagate_constants(ns_ins: Dict[str, list[Instruction]], dataflow: ReachingDefinitions | None = None) -> Dict[str, list[Instruction]]:
+    """Folds intrinsic calls, copies and conditional jumps whose operands are known constants.
+
+    A variable is constant at an instruction if every definition reaching it loads
+    the same constant. Variables whose address is taken are never constant.
+    `dataflow` holds the reaching definitions of `ns_ins` when they are already known."""
+    dataflow = dataflow or reaching_definitions(ns_ins)
+    program = [insn for instructions in ns_ins.values() for insn in instructions]
+    result: Dict[str, list[Instruction]] = {}
+
+    index = 0
+    for name, instructions in ns_ins.items():
+        address_taken = address_taken_variables(instructions)
+
+        def constant(var: IRVar) -> int | bool | None:
+            if var in address_taken:
+                return None
+            values = set()
+            for d in dataflow.reaching(index, var):
+                definition = program[d] if d >= 0 else None
+                if not isinstance(definition, (LoadIntConst, LoadBoolConst)):
+                    return None
+                # True == 1, so the type has to be part of the value
+                values.add((type(definition.value), definition.value))
+            return values.pop()[1] if len(values) == 1 else None
+
+        folded: list[Instruction] = []
+        for insn in instructions:
+            match insn:
+                case Call() if insn.fun.name in intrinsic_semantics:
+                    args = [constant(arg) for arg in insn.args]
+                    if all(arg is not None for arg in args):
+                        try:
+                            value = intrinsic_semantics[insn.fun.name](*args)
+                            assert isinstance(value, (int, bool))
+                            insn = constant_definition(value, insn, insn.dest)
+                        except IRExecutionError:
+                            # Leave the trap to run time
+                            pass
+                case Copy():
+                    value = constant(insn.source)
+                    if value is not None:
+                        insn = constant_definition(value, insn, insn.dest)
+                case CondJump():
+                    value = constant(insn.cond)
+                    if value is not None:
+                        insn = Jump(insn.location, insn.then_label if value else insn.else_label)
+                case JumpTable():
+                    value = constant(insn.value)
+                    if type(value) is int:
+                        offset = value - insn.low
+                        insn = Jump(insn.location, insn.labels[offset] if 0 <= offset < len(insn.labels) else insn.default)
+                case Select():
+                    value = constant(insn.cond)
+                    if value is not None:
+                        insn = Copy(insn.location, insn.if_true if value else insn.if_false, insn.dest)
+                    elif insn.if_true == insn.if_false:
+                        insn = Copy(insn.location, insn.if_true, insn.dest)
+            folded.append(insn)
+            index += 1
+        result[name] = folded
+
+    return result
+
+def propagate_copies(ns_ins: Dict[str, list[Instruction]], copies: AvailableCopies | None = None) -> Dict[str, list[Instruction]]:
+    """Replaces uses of variables copied from another variable by the original variable.
+
+    A use of `dest` is replaced when `Copy(source, dest)` is available at it, that is when
+    no path from the copy to the use defines `source` or `dest` again.
+    Only uses change, so the dataflow facts of the result are those of `ns_ins`.
+    `copies` holds the available copies of `ns_ins` when they are already known."""
+    copies = copies or available_copies(ns_ins)
+    program = [insn for instructions in ns_ins.values() for insn in instructions]
+    result: Dict[str, list[Instruction]] = {}
+
+    index = 0
+    for name, instructions in ns_ins.items():
+        address_taken = address_taken_variables(instructions)
+
+        def original(var: IRVar) -> IRVar:
+            if var in address_taken:
+                return var
+            d = copies.available_copy(index, var)
+            if d is None:
+                return var
+            definition = program[d]
+            assert isinstance(definition, Copy)
+            # Writes through pointers are not definitions
+            if definition.source in address_taken:
+                return var
+            return definition.source
+
+        propagated: list[Instruction] = []
+        for insn in instructions:
+            if uses(insn):
+                insn = map_uses(insn, original)
+            propagated.append(insn)
+            index += 1
+        result[name] = propagated
+
+    return result
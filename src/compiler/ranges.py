@@ -0,0 +1,441 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Self
+from compiler.dataflow import DataFlow
+from compiler.ir import Call, CondJump, Copy, Instruction, IRVar, Jump, Label, LoadBoolConst, LoadIntConst, NameTable, Phi, Select, defs
+from compiler.liveness import liveness
+from compiler.ssa import address_taken_variables
+
+INT_MIN = -2**63
+INT_MAX = 2**63 - 1
+
+# The input of a loop header that keeps changing this many times is widened, so loops converge
+WIDENING_DELAY = 3
+
+def trailing_zeros(x: int) -> int:
+    return (x & -x).bit_length() - 1 if x else 64
+
+@dataclass(frozen=True)
+class Bounds:
+    """The values a variable may hold: the integers from `low` to `high` whose lowest
+    `known` bits are `bits`. Booleans are 0 and 1. Bounds with `low > high` hold no
+    value, which is what variables have where the code cannot be reached.
+
+    `a | b` holds the values of both."""
+    low: int
+    high: int
+    known: int = 0
+    bits: int = 0
+
+    def is_empty(self) -> bool:
+        return self.low > self.high
+
+    def constant(self) -> int | None:
+        return self.low if self.low == self.high else None
+
+    def __or__(self, other: 'Bounds') -> 'Bounds':
+        if self.is_empty():
+            return other
+        if other.is_empty():
+            return self
+        known = min(self.known, other.known, trailing_zeros(self.bits ^ other.bits))
+        return bounds(min(self.low, other.low), max(self.high, other.high), known, self.bits)
+
+    def __and__(self, other: 'Bounds') -> 'Bounds':
+        """Returns the values held by both."""
+        if self.is_empty() or other.is_empty():
+            return EMPTY
+        common = min(self.known, other.known)
+        if (self.bits - other.bits) % 2**common:
+            return EMPTY
+        widest = self if self.known >= other.known else other
+        return bounds(max(self.low, other.low), min(self.high, other.high), widest.known, widest.bits)
+
+def bounds(low: int, high: int, known: int = 0, bits: int = 0) -> Bounds:
+    """Returns the bounds of the values from `low` to `high` with the lowest `known` bits
+    equal to those of `bits`, tightening the range to the first and last such value."""
+    if known > 0:
+        modulus = 2**known
+        low += (bits - low) % modulus
+        high -= (high - bits) % modulus
+    if low > high:
+        return EMPTY
+    if low == high:
+        return Bounds(low, low, 64, low % 2**64)
+    return Bounds(low, high, known, bits % 2**known)
+
+EMPTY = Bounds(1, 0)
+TOP = Bounds(INT_MIN, INT_MAX)
+FALSE = bounds(0, 0)
+TRUE = bounds(1, 1)
+BOOL = Bounds(0, 1)
+
+def wrapped(low: int, high: int, known: int, bits: int) -> Bounds:
+    # Results that may overflow wrap around, which keeps their low bits
+    if low < INT_MIN or high > INT_MAX:
+        return bounds(INT_MIN, INT_MAX, known, bits)
+    return bounds(low, high, known, bits)
+
+def add(a: Bounds, b: Bounds) -> Bounds:
+    known = min(a.known, b.known)
+    return wrapped(a.low + b.low, a.high + b.high, known, a.bits + b.bits)
+
+def subtract(a: Bounds, b: Bounds) -> Bounds:
+    known = min(a.known, b.known)
+    return wrapped(a.low - b.high, a.high - b.low, known, a.bits - b.bits)
+
+def multiply(a: Bounds, b: Bounds) -> Bounds:
+    corners = [x * y for x in [a.low, a.high] for y in [b.low, b.high]]
+    known = min(a.known, b.known)
+    bits = a.bits * b.bits
+    # Trailing zeros of the factors add up, however many of their other bits are known
+    zeros = min(64, min(a.known, trailing_zeros(a.bits)) + min(b.known, trailing_zeros(b.bits)))
+    if zeros > known:
+        known, bits = zeros, 0
+    return wrapped(min(corners), max(corners), known, bits)
+
+def truncate(x: int, y: int) -> int:
+    quotient = abs(x) // abs(y)
+    return quotient if (x < 0) == (y < 0) else -quotient
+
+def divide(a: Bounds, b: Bounds) -> Bounds:
+    # Only positive divisors: the others may be zero or trap on the smallest integer
+    if b.low < 1:
+        return TOP
+    corners = [truncate(x, y) for x in [a.low, a.high] for y in [b.low, b.high]]
+    return bounds(min(corners), max(corners))
+
+def remainder(a: Bounds, b: Bounds) -> Bounds:
+    if b.low < 1:
+        return TOP
+    if is_remainder_identity(a, b):
+        return a
+    # The remainder takes the sign of the dividend and is smaller than the divisor
+    largest = b.high - 1
+    low = 0 if a.low >= 0 else max(a.low, -largest)
+    high = 0 if a.high <= 0 else min(a.high, largest)
+    divisor = b.constant()
+    if divisor is not None and divisor & (divisor - 1) == 0:
+        # Remainders by a power of two keep the low bits of the dividend
+        known = min(a.known, divisor.bit_length() - 1)
+        return bounds(low, high, known, a.bits)
+    return bounds(low, high)
+
+def is_remainder_identity(a: Bounds, b: Bounds) -> bool:
+    """Tells whether every dividend in `a` is its own remainder by every divisor in `b`."""
+    return b.low >= 1 and -b.low < a.low and a.high < b.low
+
+def negate(a: Bounds) -> Bounds:
+    return subtract(bounds(0, 0), a)
+
+def compare(op: str, a: Bounds, b: Bounds) -> Bounds:
+    """Returns TRUE or FALSE when every pair of values compares the same way, otherwise BOOL."""
+    if op in ['>', '>=']:
+        op, a, b = {'>': '<', '>=': '<='}[op], b, a
+    if op == '<':
+        return TRUE if a.high < b.low else FALSE if a.low >= b.high else BOOL
+    if op == '<=':
+        return TRUE if a.high <= b.low else FALSE if a.low > b.high else BOOL
+    equal = compare_equal(a, b)
+    if op == '!=' and equal != BOOL:
+        return TRUE if equal == FALSE else FALSE
+    return equal
+
+def compare_equal(a: Bounds, b: Bounds) -> Bounds:
+    if a.constant() is not None and a.constant() == b.constant():
+        return TRUE
+    if (a & b).is_empty():
+        # The ranges do not overlap or the known bits differ
+        return FALSE
+    return BOOL
+
+negated = {'<': '>=', '<=': '>', '>': '<=', '>=': '<', '==': '!=', '!=': '=='}
+
+def refine(op: str, a: Bounds, b: Bounds) -> tuple[Bounds, Bounds]:
+    """Narrows `a` and `b` to the values for which `a op b` holds."""
+    if op in ['>', '>=']:
+        b, a = refine({'>': '<', '>=': '<='}[op], b, a)
+        return a, b
+    if op == '<':
+        return a & Bounds(INT_MIN, b.high - 1), b & Bounds(a.low + 1, INT_MAX)
+    if op == '<=':
+        return a & Bounds(INT_MIN, b.high), b & Bounds(a.low, INT_MAX)
+    if op == '==':
+        return a & b, a & b
+
+    def exclude(x: Bounds, value: int | None) -> Bounds:
+        if value == x.low:
+            return x & Bounds(x.low + 1, INT_MAX)
+        if value == x.high:
+            return x & Bounds(INT_MIN, x.high - 1)
+        return x
+    return exclude(a, b.constant()), exclude(b, a.constant())
+
+arithmetic: Dict[str, Callable[[Bounds, Bounds], Bounds]] = {
+    '+': add, '-': subtract, '*': multiply, '/': divide, '%': remainder,
+}
+
+def evaluate(fun: str, args: list[Bounds]) -> Bounds:
+    """Returns the bounds of the result of an intrinsic, TOP for other functions."""
+    if any(arg.is_empty() for arg in args):
+        return EMPTY
+    if fun in arithmetic:
+        return arithmetic[fun](*args)
+    if fun in negated:
+        return compare(fun, *args)
+    if fun == 'unary_-':
+        return negate(args[0])
+    if fun == 'unary_not':
+        return subtract(TRUE, args[0]) & BOOL
+    return TOP
+
+# Maps the NameTable id of each variable to its bounds. Variables that are not in the
+# map may hold any value. None stands for code that cannot be reached.
+type RangeState = Dict[int, Bounds] | None
+
+def join(a: RangeState, b: RangeState) -> RangeState:
+    """Returns the state holding the values of both."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    joined = {}
+    for var, value in a.items():
+        other = b.get(var)
+        if other is not None and (value := value | other) != TOP:
+            joined[var] = value
+    return joined
+
+class RangeAnalysis(DataFlow[RangeState]):
+    """Computes the bounds of every variable before each instruction of a function.
+
+    Conditional jumps on a comparison narrow the bounds of its operands on each edge,
+    and edges that the bounds show can never be taken carry nothing. States are only
+    kept at the start and the end of every block, `bounds_of` replays the block to
+    find those of the instructions inside it. The input of a block only keeps the
+    variables live there, so `bounds_of` knows nothing about dead variables."""
+    instructions: Dict[int, Instruction]
+    # The ids of the variables of the function
+    names: NameTable
+    address_taken: set[IRVar]
+    # The comparison deciding each conditional jump whose operands hold until the jump
+    branch_conditions: Dict[int, Call]
+    widenings: Dict[int, int]
+    # The ids of the variables each block may read before writing them, the only ones
+    # whose bounds its input keeps
+    live_in: list[set[int]]
+
+    def __init__(self: Self, instructions: list[Instruction]) -> None:
+        super().__init__({'f': instructions})
+        self.names = self.tables[0]
+        self.instructions = dict(enumerate(instructions))
+        self.address_taken = address_taken_variables(instructions)
+        self.branch_conditions = {}
+        self.widenings = {}
+        live_in, _ = liveness(self.cfgs['f'])
+        self.live_in = [
+            {self.names.var_id(var) for var in live | {source for insn, _ in block if isinstance(insn, Phi) for source in insn.sources}}
+            for live, block in zip(live_in, self.blocks)
+        ]
+        for block in self.blocks:
+            jump, index = block[-1]
+            if not isinstance(jump, CondJump):
+                continue
+            for k in range(len(block) - 2, -1, -1):
+                insn = block[k][0]
+                if jump.cond not in defs(insn):
+                    continue
+                if isinstance(insn, Call) and insn.fun.name in negated and insn.dest not in insn.args:
+                    between = [var for later, _ in block[k+1:-1] for var in defs(later)]
+                    if not any(arg in between for arg in insn.args):
+                        self.branch_conditions[index] = insn
+                break
+
+    def value(self: Self, state: RangeState, var: IRVar) -> Bounds:
+        if state is None:
+            return EMPTY
+        if var in self.address_taken:
+            return TOP
+        return state.get(self.names.var_id(var), TOP)
+
+    def bounds_of(self: Self, index: int, var: IRVar) -> Bounds:
+        """Returns the bounds of `var` right before instruction `index`."""
+        block = self.blocks[self.block_of[index]]
+        entry = block[0][1]
+        state = self.inp.get(entry)
+        state = None if state is None else dict(state)
+        for insn, _ in block[:index - entry]:
+            state = self.apply(state, insn)
+        return self.value(state, var)
+
+    def states(self: Self) -> Iterator[tuple[int, Instruction, RangeState]]:
+        """Yields every instruction with the state right before it, walking each block
+        once. The state is only valid until the next one is yielded."""
+        for block in self.blocks:
+            state = self.inp.get(block[0][1])
+            state = None if state is None else dict(state)
+            for insn, i in block:
+                yield i, insn, state
+                state = self.apply(state, insn)
+
+    def edge(self: Self, jump: int, entry: int) -> RangeState:
+        """Returns the output of instruction `jump` narrowed by the condition that holds
+        when control goes from it to the block starting at `entry`."""
+        state = self.outp.get(jump)
+        branch = self.instructions[jump]
+        target = self.instructions[entry]
+        if state is None or not isinstance(branch, CondJump) or branch.then_label == branch.else_label or not isinstance(target, Label):
+            return state
+        taken = target == branch.then_label
+        narrowed = dict(state)
+        cond = self.names.var_id(branch.cond)
+        narrowed[cond] = narrowed.get(cond, TOP) & (TRUE if taken else FALSE)
+        changed = [cond]
+        comparison = self.branch_conditions.get(jump)
+        if comparison is not None and not any(arg in self.address_taken for arg in comparison.args):
+            op = comparison.fun.name if taken else negated[comparison.fun.name]
+            a, b = (self.names.var_id(arg) for arg in comparison.args)
+            narrowed[a], narrowed[b] = refine(op, narrowed.get(a, TOP), narrowed.get(b, TOP))
+            changed += [a, b]
+        for var in changed:
+            if var in narrowed and narrowed[var].is_empty():
+                # The condition can never go this way
+                return None
+            if narrowed.get(var) == TOP:
+                del narrowed[var]
+        return narrowed
+
+    def enter_function(self: Self, state: RangeState, function: int) -> RangeState:
+        # Every variable may hold anything when the function starts
+        return {}
+
+    def merge(self: Self, jumps: list[int], entry: int) -> RangeState:
+        merged: RangeState = None
+        for j in jumps:
+            merged = join(merged, self.edge(j, entry))
+        if merged is not None:
+            live = self.live_in[self.block_of[entry]]
+            merged = {var: value for var, value in merged.items() if var in live}
+        # Inputs only grow, and widening where loops come back around makes them stop growing
+        previous = self.inp.get(entry)
+        merged = join(previous, merged)
+        if previous is not None and merged is not None and merged != previous and any(j >= entry for j in jumps):
+            self.widenings[entry] = self.widenings.get(entry, 0) + 1
+            if self.widenings[entry] > WIDENING_DELAY:
+                widened = {var: widen(previous[var], value) for var, value in merged.items()}
+                merged = {var: value for var, value in widened.items() if value != TOP}
+        return merged
+
+    def apply(self: Self, state: RangeState, instruction: Instruction) -> RangeState:
+        """Updates `state` in place to the state after `instruction` and returns it."""
+        if state is None:
+            # Nothing reaches the instruction
+            return None
+        dests = [var for var in defs(instruction) if var not in self.address_taken]
+        if not dests:
+            return state
+
+        def value(var: IRVar) -> Bounds:
+            return self.value(state, var)
+
+        result: Bounds
+        match instruction:
+            case LoadIntConst():
+                result = bounds(instruction.value, instruction.value)
+            case LoadBoolConst():
+                result = TRUE if instruction.value else FALSE
+            case Copy():
+                result = value(instruction.source)
+            case Select():
+                cond = value(instruction.cond)
+                result = value(instruction.if_true) if cond == TRUE else value(instruction.if_false) if cond == FALSE else value(instruction.if_true) | value(instruction.if_false)
+            case Phi():
+                result = EMPTY
+                for source in instruction.sources:
+                    result = result | value(source)
+            case Call():
+                result = evaluate(instruction.fun.name, [value(arg) for arg in instruction.args])
+            case _:
+                result = TOP
+        if result.is_empty():
+            return None
+        for var in dests:
+            if result == TOP:
+                state.pop(self.names.var_id(var), None)
+            else:
+                state[self.names.var_id(var)] = result
+        return state
+
+    def transfer(self: Self, index: int, instruction: Instruction) -> None:
+        state = self.inp[index]
+        self.outp[index] = self.apply(None if state is None else dict(state), instruction)
+
+    def transfer_block(self: Self, b: int) -> None:
+        block = self.blocks[b]
+        state = self.inp[block[0][1]]
+        # One copy for the whole block, the instructions update it in place
+        state = None if state is None else dict(state)
+        for insn, _ in block:
+            state = self.apply(state, insn)
+        self.outp[block[-1][1]] = state
+
+    def describe(self: Self, index: int, state: RangeState) -> list[str]:
+        if state is None:
+            return ['unreachable']
+        return [f'{self.names.variables[var]} => [{value.low}, {value.high}]' for var, value in sorted(state.items())]
+
+def widen(previous: Bounds, current: Bounds) -> Bounds:
+    """Moves the bounds that grew since `previous` to the end of the integer range."""
+    if previous.is_empty() or current.is_empty():
+        return current
+    low = current.low if current.low >= previous.low else INT_MIN
+    high = current.high if current.high <= previous.high else INT_MAX
+    return Bounds(low, high, current.known, current.bits) if low != high else current
+
+def value_ranges(instructions: list[Instruction]) -> RangeAnalysis:
+    """Computes the range and known bits analysis of a function.
+
+    Instructions are numbered from 0 in the order of `instructions`."""
+    analysis = RangeAnalysis(instructions)
+    analysis.compute()
+    return analysis
+
+def fold_function_ranges(instructions: list[Instruction]) -> list[Instruction]:
+    """Replaces the intrinsic calls and conditional jumps whose outcome the value
+    ranges decide by constants and jumps."""
+    ranges = value_ranges(instructions)
+    result = list(instructions)
+    for i, insn, state in ranges.states():
+        match insn:
+            case Call() if insn.fun.name in arithmetic or insn.fun.name in negated or insn.fun.name in ['unary_-', 'unary_not']:
+                args = [ranges.value(state, arg) for arg in insn.args]
+                value = evaluate(insn.fun.name, args).constant()
+                if value is not None:
+                    if insn.fun.name in negated or insn.fun.name == 'unary_not':
+                        result[i] = LoadBoolConst(insn.location, bool(value), insn.dest)
+                    else:
+                        result[i] = LoadIntConst(insn.location, value, insn.dest)
+                elif insn.fun.name == '%' and is_remainder_identity(*args):
+                    result[i] = Copy(insn.location, insn.args[0], insn.dest)
+            case CondJump():
+                value = ranges.value(state, insn.cond).constant()
+                if value is not None:
+                    result[i] = Jump(insn.location, insn.then_label if value else insn.else_label)
+            case Select():
+                value = ranges.value(state, insn.cond).constant()
+                if value is not None:
+                    result[i] = Copy(insn.location, insn.if_true if value else insn.if_false, insn.dest)
+    return result
+
+def nonnegative_dividends(instructions: list[Instruction]) -> set[int]:
+    """Returns the indices of the divisions and remainders in `instructions` whose
+    dividend the value ranges show is never negative."""
+    ranges = value_ranges(instructions)
+    return {
+        i for i, insn, state in ranges.states()
+        if isinstance(insn, Call) and insn.fun.name in ['/', '%'] and ranges.value(state, insn.args[0]).low >= 0
+    }
+
+def fold_ranges(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    """Folds comparisons, branches and arithmetic that the range and known bits
+    analysis shows always have the same outcome."""
+    return {name: fold_function_ranges(instructions) for name, instructions in ns_ins.items()}
@@ -0,0 +1,131 @@
+from collections import Counter
+from typing import Dict
+from compiler.inliner import call_graph, size
+from compiler.ir import Call, Instruction, IRVar, Label, LoadBoolConst, LoadBoolParam, LoadIntConst, LoadIntParam, LoadPointerParam, constant_values, map_defs, map_targets, map_uses
+
+# Functions are cloned for at most this many different sets of constant arguments
+MAX_SPECIALIZATIONS = 2
+# Larger functions are not cloned
+MAX_SPECIALIZED_SIZE = 100
+# Specializing can make the arguments of calls in the callee constant, those are handled in later rounds
+MAX_SPECIALIZATION_ROUNDS = 3
+
+type Arguments = Dict[int, int | bool]
+# A callee's parameter names followed by the constant arguments by parameter name
+type CloneKey = tuple[str, tuple[str, ...], tuple[tuple[str, int | bool], ...]]
+
+def constant_arguments(call: Call, constants: Dict[IRVar, int | bool]) -> Arguments:
+    """Returns the positions and values of the arguments of `call` that are constants."""
+    return {i: constants[arg] for i, arg in enumerate(call.args) if arg in constants}
+
+def parameters(instructions: list[Instruction]) -> tuple[str, ...]:
+    """Returns the names of the parameters of a function in the order they are passed."""
+    return tuple(insn.symbol.name for insn in instructions if isinstance(insn, (LoadIntParam, LoadBoolParam, LoadPointerParam)))
+
+def specialize(instructions: list[Instruction], arguments: Arguments) -> list[Instruction]:
+    """Returns the instructions of a function with the parameters at the positions of
+    `arguments` replaced by their values. Those parameters are no longer passed."""
+    result: list[Instruction] = []
+    loads: list[Instruction] = []
+    position = 0
+    body = 1 if instructions and isinstance(instructions[0], Label) else 0
+    for insn in instructions:
+        if isinstance(insn, (LoadIntParam, LoadBoolParam, LoadPointerParam)):
+            if position in arguments:
+                value = arguments[position]
+                if isinstance(value, bool):
+                    loads.append(LoadBoolConst(insn.location, value, insn.dest))
+                else:
+                    loads.append(LoadIntConst(insn.location, value, insn.dest))
+            else:
+                result.append(insn)
+            body = len(result)
+            position += 1
+        else:
+            result.append(insn)
+    # Stack parameters are loaded before anything else runs
+    return result[:body] + loads + result[body:]
+
+def rename(instructions: list[Instruction], suffix: str) -> list[Instruction]:
+    """Returns a copy of a function whose variables and labels do not clash with the original."""
+    def rename_var(var: IRVar) -> IRVar:
+        return var if var.name == 'unit' else IRVar(f'{var.name}_{suffix}')
+
+    def relabel(label: Label) -> Label:
+        return Label(label.location, f'{label.name}_{suffix}')
+
+    return [relabel(insn) if isinstance(insn, Label) else map_targets(map_defs(map_uses(insn, rename_var), rename_var), relabel) for insn in instructions]
+
+def drop_arguments(call: Call, callee: str, arguments: Arguments) -> Call:
+    return Call(call.location, IRVar(callee), [arg for i, arg in enumerate(call.args) if i not in arguments], call.dest)
+
+def specialize_functions(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    """Propagates constant arguments into user functions.
+
+    When every call to a function passes the same constant for a parameter, the parameter
+    is replaced by that constant. Otherwise the function is cloned for the sets of constant
+    arguments passed at the most call sites, and those calls go to the clones."""
+    ns_ins = dict(ns_ins)
+    # Positions shift when a callee loses a parameter, so clones are found by parameter
+    # name and only reused while the callee still has the signature they were made from
+    clones: Dict[CloneKey, str] = {}
+    clone_counts: Counter[str] = Counter()
+
+    def rewrite(sites: list[tuple[str, int]], callee: str, arguments: Arguments) -> None:
+        for name, i in sites:
+            instructions = list(ns_ins[name])
+            call = instructions[i]
+            assert isinstance(call, Call)
+            instructions[i] = drop_arguments(call, callee, arguments)
+            ns_ins[name] = instructions
+
+    for _ in range(MAX_SPECIALIZATION_ROUNDS):
+        changed = False
+        for callee in list(ns_ins):
+            if callee == 'main' or callee not in ns_ins:
+                continue
+            sites = [
+                (name, i) for name, instructions in ns_ins.items()
+                for i, insn in enumerate(instructions) if isinstance(insn, Call) and insn.fun.name == callee
+            ]
+            if not sites:
+                continue
+            constants = {name: constant_values(ns_ins[name]) for name in {name for name, _ in sites}}
+            keys = [constant_arguments(ns_ins[name][i], constants[name]) for name, i in sites] # type: ignore[arg-type]
+
+            agreed = {k: v for k, v in keys[0].items() if all(k in key and key[k] == v for key in keys)}
+            if agreed:
+                ns_ins[callee] = specialize(ns_ins[callee], agreed)
+                rewrite(sites, callee, agreed)
+                changed = True
+                continue
+
+            if size(ns_ins[callee]) > MAX_SPECIALIZED_SIZE:
+                continue
+            params = parameters(ns_ins[callee])
+            counts = Counter(tuple(sorted(key.items())) for key in keys if key)
+            for key, _ in counts.most_common():
+                clone_key = (callee, params, tuple((params[i], value) for i, value in key))
+                clone = clones.get(clone_key)
+                if clone is None:
+                    if clone_counts[callee] >= MAX_SPECIALIZATIONS:
+                        continue
+                    clone_counts[callee] += 1
+                    clone = f'{callee}.constprop.{clone_counts[callee]}'
+                    clones[clone_key] = clone
+                    ns_ins[clone] = specialize(rename(ns_ins[callee], f'cp{len(clones)}'), dict(key))
+                rewrite([site for site, site_key in zip(sites, keys) if tuple(sorted(site_key.items())) == key], clone, dict(key))
+                changed = True
+        if not changed:
+            break
+
+    # Originals that were cloned are only kept while a function that is kept still calls them
+    graph = call_graph(ns_ins)
+    reachable = {name for name in ns_ins if name == 'main' or name not in clone_counts}
+    stack = list(reachable)
+    while stack:
+        for callee in graph[stack.pop()]:
+            if callee not in reachable:
+                reachable.add(callee)
+                stack.append(callee)
+    return {name: instructions for name, instructions in ns_ins.items() if name in reachable}
@@ -0,0 +1,284 @@
+from typing import Callable, Dict
+from compiler.cfg import ControlFlowGraph, dominance_frontiers, dominator_tree, immediate_dominators, terminators
+from compiler.ir import Call, CondJump, Copy, IRVar, Instruction, Jump, JumpTable, Label, Phi, defs, map_defs, map_targets, map_uses, uses
+from compiler.liveness import liveness
+from compiler.pass_manager import AnalysisManager
+
+def address_taken_variables(instructions: list[Instruction]) -> set[IRVar]:
+    """Returns the variables whose address is taken with `unary_&`.
+
+    Such variables can change through any pointer, so they have to stay in memory."""
+    return {insn.args[0] for insn in instructions if isinstance(insn, Call) and insn.fun.name == 'unary_&'}
+
+def is_normal(cfg: ControlFlowGraph) -> bool:
+    """Tells whether a CFG has no unreachable blocks, every block starts with a label
+    and the entry block has no predecessors."""
+    return all(label is not None for label in cfg.labels) and all(cfg.reachable()) and not cfg.predecessors[0]
+
+def normalize(instructions: list[Instruction]) -> ControlFlowGraph:
+    """Builds a CFG without unreachable blocks, in which every block starts with a label
+    and the entry block has no predecessors."""
+    cfg = ControlFlowGraph(instructions)
+    if is_normal(cfg):
+        return cfg
+    reachable = cfg.reachable()
+    location = instructions[0].location
+    result: list[Instruction] = []
+    if cfg.predecessors[0]:
+        result.append(Label(location, 'ssa_entry'))
+    for b, block in enumerate(cfg.blocks):
+        if not reachable[b]:
+            continue
+        if cfg.labels[b] is None:
+            result.append(Label(location, f'ssa_block{b}'))
+        result.extend(block)
+    return ControlFlowGraph(result)
+
+def construct_ssa(instructions: list[Instruction], analyses: AnalysisManager | None = None, name: str = '') -> list[Instruction]:
+    """Converts a function into pruned SSA form.
+
+    Phis are placed on the iterated dominance frontiers of the definitions of every
+    variable that is live there. Renamed variables get a `.n` suffix. Variables whose
+    address is taken, and variables that are never assigned, keep their names.
+    The CFG, dominators and liveness of function `name` come from `analyses` when
+    they are given and the CFG needs no normalizing."""
+    if not instructions:
+        return []
+    if analyses is not None and is_normal(cached := analyses.get('cfg', name)):
+        cfg = cached
+        idom = analyses.get('dominators', name)
+        live_in, _ = analyses.get('liveness', name)
+    else:
+        cfg = normalize(instructions)
+        idom = immediate_dominators(cfg)
+        live_in, _ = liveness(cfg)
+    frontiers = dominance_frontiers(cfg, idom)
+
+    address_taken = address_taken_variables(cfg.instructions())
+    def_sites: Dict[IRVar, set[int]] = {}
+    for b, block in enumerate(cfg.blocks):
+        for insn in block:
+            for var in defs(insn):
+                if var not in address_taken:
+                    def_sites.setdefault(var, set()).add(b)
+
+    phis: list[list[IRVar]] = [[] for _ in cfg.blocks]
+    for var, sites in def_sites.items():
+        has_phi: set[int] = set()
+        worklist = list(sites)
+        while worklist:
+            b = worklist.pop()
+            for f in frontiers[b]:
+                if f in has_phi or var not in live_in[f]:
+                    continue
+                has_phi.add(f)
+                phis[f].append(var)
+                if f not in sites:
+                    worklist.append(f)
+
+    counters: Dict[IRVar, int] = {}
+    stacks: Dict[IRVar, list[IRVar]] = {var: [] for var in def_sites}
+
+    def current(var: IRVar) -> IRVar:
+        stack = stacks.get(var)
+        return stack[-1] if stack else var
+
+    def new_name(var: IRVar) -> IRVar:
+        if var not in stacks:
+            return var
+        counters[var] = counters.get(var, 0) + 1
+        name = IRVar(f'{var.name}.{counters[var]}')
+        stacks[var].append(name)
+        return name
+
+    phi_dests: list[list[IRVar]] = [[] for _ in cfg.blocks]
+    # phi_sources[b][i] maps a predecessor of b to the source of the i:th phi of b
+    phi_sources: list[list[Dict[int, IRVar]]] = [[{} for _ in p] for p in phis]
+    renamed: list[list[Instruction]] = [[] for _ in cfg.blocks]
+    children = dominator_tree(idom)
+
+    # Walk the dominator tree without recursion, big functions make deep trees
+    stack: list[tuple[int, bool]] = [(0, False)]
+    pushed: list[list[IRVar]] = [[] for _ in cfg.blocks]
+    while stack:
+        b, leaving = stack.pop()
+        if leaving:
+            for var in pushed[b]:
+                stacks[var].pop()
+            continue
+
+        def rename_def(var: IRVar) -> IRVar:
+            name = new_name(var)
+            if name is not var:
+                pushed[b].append(var)
+            return name
+
+        for var in phis[b]:
+            phi_dests[b].append(rename_def(var))
+        for insn in cfg.blocks[b]:
+            insn = map_uses(insn, current)
+            insn = map_defs(insn, rename_def)
+            renamed[b].append(insn)
+        for s in cfg.successors[b]:
+            for i, var in enumerate(phis[s]):
+                phi_sources[s][i][b] = current(var)
+
+        stack.append((b, True))
+        for child in reversed(children[b]):
+            stack.append((child, False))
+
+    result: list[Instruction] = []
+    for b, block in enumerate(renamed):
+        label = block[0]
+        result.append(label)
+        for i, dest in enumerate(phi_dests[b]):
+            preds = cfg.predecessors[b]
+            result.append(Phi(
+                label.location,
+                [phi_sources[b][i].get(p, phis[b][i]) for p in preds],
+                [cfg.labels[p] for p in preds], # type: ignore[misc]
+                dest
+            ))
+        result.extend(block[1:])
+
+    return result
+
+def sequentialize(copies: list[tuple[IRVar, IRVar]], fresh: Callable[[], IRVar]) -> list[tuple[IRVar, IRVar]]:
+    """Orders parallel copies `(dest, source)` so that no copy overwrites
+    a source that a later copy still needs, breaking cycles with temporaries."""
+    pending = {dest: source for dest, source in copies if dest != source}
+    result: list[tuple[IRVar, IRVar]] = []
+    while pending:
+        sources = set(pending.values())
+        ready = [dest for dest in pending if dest not in sources]
+        if ready:
+            for dest in ready:
+                result.append((dest, pending.pop(dest)))
+        else:
+            # Everything left is a cycle, save one value to break it
+            dest = next(iter(pending))
+            temp = fresh()
+            result.append((temp, dest))
+            pending = {d: (temp if s == dest else s) for d, s in pending.items()}
+    return result
+
+def split_critical_edges(instructions: list[Instruction]) -> list[Instruction]:
+    """Gives every edge into a block with phis from a block with several successors its own block."""
+    cfg = ControlFlowGraph(instructions)
+    count = 0
+    extra: list[list[Instruction]] = []
+    blocks = [list(b) for b in cfg.blocks]
+    for s, block in enumerate(cfg.blocks):
+        if len(cfg.predecessors[s]) < 2 or not any(isinstance(insn, Phi) for insn in block):
+            continue
+        target = cfg.labels[s]
+        assert target is not None
+        for p in cfg.predecessors[s]:
+            # Copies cannot go in front of a conditional jump, they could overwrite its condition
+            if len(cfg.successors[p]) < 2 and not isinstance(cfg.blocks[p][-1], (CondJump, JumpTable)):
+                continue
+            count += 1
+            source = cfg.labels[p]
+            assert source is not None
+            edge = Label(target.location, f'{target.name}_edge{count}')
+            last = blocks[p][-1]
+            blocks[p][-1] = map_targets(last, lambda l: edge if l == target else l)
+            extra.append([edge, Jump(target.location, target)])
+            for i, insn in enumerate(blocks[s]):
+                if isinstance(insn, Phi):
+                    blocks[s][i] = Phi(insn.location, insn.sources, [edge if l == source else l for l in insn.blocks], insn.dest)
+
+    return [insn for b in blocks + extra for insn in b]
+
+def interference(cfg: ControlFlowGraph, candidates: set[IRVar]) -> set[frozenset[IRVar]]:
+    """Returns the pairs of `candidates` that are live at the same time somewhere."""
+    _, live_out = liveness(cfg)
+    result: set[frozenset[IRVar]] = set()
+    for b, block in enumerate(cfg.blocks):
+        live = {v for v in live_out[b] if v in candidates}
+        body = [insn for insn in block if not isinstance(insn, Phi)]
+        for insn in reversed(body):
+            for d in defs(insn):
+                if d in candidates:
+                    result.update(frozenset((d, v)) for v in live if v != d)
+                live.discard(d)
+            live.update(v for v in uses(insn) if v in candidates)
+        phi_dests = [insn.dest for insn in block if isinstance(insn, Phi) and insn.dest in candidates]
+        for d in phi_dests:
+            result.update(frozenset((d, v)) for v in live | set(phi_dests) if v != d)
+    return result
+
+def destruct_ssa(instructions: list[Instruction]) -> list[Instruction]:
+    """Converts a function out of SSA form by replacing phis with copies.
+
+    Variables connected by a phi share one name when their live ranges do not
+    overlap, so most phis disappear without any copies."""
+    if not any(isinstance(insn, Phi) for insn in instructions):
+        return instructions
+    cfg = ControlFlowGraph(split_critical_edges(instructions))
+
+    # Variables never defined in the function, such as `unit`, keep their names
+    defined = {var for insn in cfg.instructions() for var in defs(insn)}
+    candidates: set[IRVar] = set()
+    for insn in cfg.instructions():
+        if isinstance(insn, Phi):
+            candidates.add(insn.dest)
+            candidates.update(var for var in insn.sources if var in defined)
+    interferes = interference(cfg, candidates)
+
+    # Union-find over variables connected by phis
+    parent: Dict[IRVar, IRVar] = {}
+    members: Dict[IRVar, list[IRVar]] = {}
+
+    def find(var: IRVar) -> IRVar:
+        while parent.get(var, var) != var:
+            var = parent[var]
+        return var
+
+    def try_union(a: IRVar, b: IRVar) -> None:
+        ra, rb = find(a), find(b)
+        if ra == rb:
+            return
+        class_a, class_b = members.get(ra, [ra]), members.get(rb, [rb])
+        if any(frozenset((x, y)) in interferes for x in class_a for y in class_b):
+            return
+        parent[rb] = ra
+        members[ra] = class_a + class_b
+
+    for insn in cfg.instructions():
+        if isinstance(insn, Phi):
+            for source in insn.sources:
+                if source in candidates:
+                    try_union(insn.dest, source)
+
+    rename = lambda var: find(var) if var in candidates else var
+    temps = 0
+    def fresh() -> IRVar:
+        nonlocal temps
+        temps += 1
+        return IRVar(f'ssa_tmp{temps}')
+
+    blocks = [[map_defs(map_uses(insn, rename), rename) for insn in block] for block in cfg.blocks]
+    for s, block in enumerate(blocks):
+        block_phis = [insn for insn in block if isinstance(insn, Phi)]
+        if not block_phis:
+            continue
+        for p in cfg.predecessors[s]:
+            label = cfg.labels[p]
+            copies = [(phi.dest, phi.sources[phi.blocks.index(label)]) for phi in block_phis] # type: ignore[arg-type]
+            location = block_phis[0].location
+            moves: list[Instruction] = [Copy(location, source, dest) for dest, source in sequentialize(copies, fresh)]
+            if blocks[p] and isinstance(blocks[p][-1], terminators):
+                blocks[p][-1:-1] = moves
+            else:
+                blocks[p].extend(moves)
+        blocks[s] = [insn for insn in block if not isinstance(insn, Phi)]
+
+    return [insn for block in blocks for insn in block]
+
+def to_ssa(ns_ins: Dict[str, list[Instruction]], analyses: AnalysisManager | None = None) -> Dict[str, list[Instruction]]:
+    """Converts every function into SSA form. `analyses` holds the analyses of `ns_ins` when they are already known."""
+    return {name: construct_ssa(instructions, analyses, name) for name, instructions in ns_ins.items()}
+
+def from_ssa(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    return {name: destruct_ssa(instructions) for name, instructions in ns_ins.items()}
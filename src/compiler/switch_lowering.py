@@ -0,0 +1,184 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict
+from compiler.cfg import terminators
+from compiler.dead_code import is_removable
+from compiler.ir import Call, CondJump, Instruction, IRVar, Jump, JumpTable, Label, LoadIntConst, NameTable, Phi, constant_values, defs, targets, uses
+from compiler.location import Location
+from compiler.ssa import address_taken_variables
+
+# Shorter chains are left as they are
+MIN_SWITCH_CASES = 4
+# A jump table is used when at least this share of its entries go to a case
+MIN_TABLE_DENSITY = 0.4
+# Comparison trees test this many cases one by one at their leaves
+LINEAR_SEARCH_CASES = 3
+
+@dataclass
+class Chain:
+    """Comparisons of `value` against distinct constants, each jumping to its case when
+    equal and otherwise continuing with the next comparison, as positions in the instruction list."""
+    branch: int
+    value: IRVar
+    cases: list[tuple[int, Label]]
+    default: Label
+    # The blocks of the comparisons after the first one, which only the chain enters
+    tests: list[tuple[int, int]]
+
+def equality(instructions: list[Instruction], start: int, end: int, constants: Dict[IRVar, int | bool]) -> tuple[IRVar, int] | None:
+    """Returns the variable and the constant that the condition of the jump at `end` compares,
+    when it is computed between `start` and the jump by an `==` with one constant operand."""
+    branch = instructions[end]
+    assert isinstance(branch, CondJump)
+    for j in range(end-1, start-1, -1):
+        insn = instructions[j]
+        if branch.cond not in defs(insn):
+            continue
+        if not isinstance(insn, Call) or insn.fun.name != '==':
+            return None
+        left, right = insn.args
+        if type(constants.get(left)) is int:
+            left, right = right, left
+        constant = constants.get(right)
+        if type(constant) is not int or type(constants.get(left)) is int:
+            return None
+        # The jump must see the value the comparison read
+        if any(left in defs(other) for other in instructions[j+1:end]):
+            return None
+        return left, constant
+    return None
+
+def switch_chains(instructions: list[Instruction]) -> list[Chain]:
+    """Finds the chains of `==` comparisons that else-if expressions on one variable generate."""
+    constants = constant_values(instructions)
+    address_taken = address_taken_variables(instructions)
+    references = Counter(label.name for insn in instructions for label in targets(insn))
+    labels = {insn.name: i for i, insn in enumerate(instructions) if isinstance(insn, Label)}
+    use_positions: Dict[IRVar, list[int]] = {}
+    for i, insn in enumerate(instructions):
+        for var in uses(insn):
+            use_positions.setdefault(var, []).append(i)
+
+    def block_end(start: int) -> int:
+        end = start
+        while end < len(instructions) and not isinstance(instructions[end], terminators):
+            if end > start and isinstance(instructions[end], Label):
+                break
+            end += 1
+        return end
+
+    def block_start(end: int) -> int:
+        start = end
+        while start > 0 and not isinstance(instructions[start-1], (Label, *terminators)):
+            start -= 1
+        return start
+
+    def test_block(label: Label, value: IRVar, seen: set[int]) -> tuple[int, int, int] | None:
+        # A block that only compares `value` to a constant, entered only from the previous comparison
+        start = labels[label.name]
+        if references[label.name] != 1 or start == 0 or not isinstance(instructions[start-1], terminators):
+            return None
+        end = block_end(start)
+        if end == len(instructions) or not isinstance(instructions[end], CondJump):
+            return None
+        for insn in instructions[start+1:end]:
+            if not is_removable(insn):
+                return None
+            for var in defs(insn):
+                if var == value or var in address_taken or any(not start < j <= end for j in use_positions.get(var, [])):
+                    return None
+        compared = equality(instructions, start+1, end, constants)
+        if compared is None or compared[0] != value or compared[1] in seen:
+            return None
+        return start, end, compared[1]
+
+    chains: list[Chain] = []
+    consumed: set[int] = set()
+    for i, insn in enumerate(instructions):
+        if not isinstance(insn, CondJump) or i in consumed:
+            continue
+        compared = equality(instructions, block_start(i), i, constants)
+        if compared is None or compared[0] in address_taken:
+            continue
+        value, constant = compared
+        cases = [(constant, insn.then_label)]
+        default = insn.else_label
+        tests: list[tuple[int, int]] = []
+        while (test := test_block(default, value, {k for k, _ in cases})) is not None:
+            start, end, constant = test
+            if end in consumed or end == i:
+                break
+            branch = instructions[end]
+            assert isinstance(branch, CondJump)
+            cases.append((constant, branch.then_label))
+            tests.append((start, end))
+            default = branch.else_label
+        if len(cases) < MIN_SWITCH_CASES:
+            continue
+        consumed.add(i)
+        consumed.update(end for _, end in tests)
+        chains.append(Chain(i, value, cases, default, tests))
+    return chains
+
+def lower_switches_function(instructions: list[Instruction]) -> list[Instruction]:
+    """Replaces long else-if chains comparing one variable against constants
+    by a jump table when the constants are dense, otherwise by a binary search."""
+    if any(isinstance(insn, Phi) for insn in instructions):
+        return instructions
+    chains = switch_chains(instructions)
+    if not chains:
+        return instructions
+    names = {var.name for var in NameTable(instructions).variables}
+    label_names = {insn.name for insn in instructions if isinstance(insn, Label)}
+
+    def fresh(prefix: str, taken: set[str]) -> str:
+        n = 0
+        while f'{prefix}{n}' in taken:
+            n += 1
+        taken.add(f'{prefix}{n}')
+        return f'{prefix}{n}'
+
+    def dispatch(chain: Chain, location: Location) -> list[Instruction]:
+        cases = sorted(chain.cases, key=lambda case: case[0])
+        low, high = cases[0][0], cases[-1][0]
+        if len(cases) >= MIN_TABLE_DENSITY * (high - low + 1):
+            table = dict(cases)
+            return [JumpTable(location, chain.value, low, [table.get(k, chain.default) for k in range(low, high + 1)], chain.default)]
+
+        def new_label() -> Label:
+            return Label(location, fresh(f'{chain.default.name}_switch', label_names))
+
+        def compare(op: str, constant: int, then_label: Label, else_label: Label) -> list[Instruction]:
+            var, cond = IRVar(fresh('switch_tmp', names)), IRVar(fresh('switch_tmp', names))
+            return [
+                LoadIntConst(location, constant, var),
+                Call(location, IRVar(op), [chain.value, var], cond),
+                CondJump(location, cond, then_label, else_label),
+            ]
+
+        def search(cases: list[tuple[int, Label]]) -> list[Instruction]:
+            if len(cases) <= LINEAR_SEARCH_CASES:
+                code: list[Instruction] = []
+                for constant, target in cases:
+                    following = new_label()
+                    code += compare('==', constant, target, following) + [following]
+                return code + [Jump(location, chain.default)]
+            middle = len(cases) // 2
+            below, above = new_label(), new_label()
+            return compare('<', cases[middle][0], below, above) + [below] + search(cases[:middle]) + [above] + search(cases[middle:])
+
+        return search(cases)
+
+    replaced = {chain.branch: chain for chain in chains}
+    removed = {j for chain in chains for start, end in chain.tests for j in range(start, end + 1)}
+    result: list[Instruction] = []
+    for i, insn in enumerate(instructions):
+        if i in replaced:
+            result += dispatch(replaced[i], insn.location)
+        elif i not in removed:
+            result.append(insn)
+    return result
+
+def lower_switches(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    """Turns else-if chains that dispatch on one value into jump tables or comparison trees."""
+    return {name: lower_switches_function(instructions) for name, instructions in ns_ins.items()}
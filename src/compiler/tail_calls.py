@@ -0,0 +1,74 @@
+from typing import Dict
+from compiler.ir import Call, Copy, Instruction, IRVar, Jump, Label, LoadBoolParam, LoadIntParam, LoadPointerParam, ReturnValue
+from compiler.ssa import address_taken_variables, sequentialize
+
+def is_tail_call(instructions: list[Instruction], index: int, labels: Dict[str, int]) -> bool:
+    """Tells whether the function returns the result of the call at `index` right away.
+
+    Copies passing the result on, labels and jumps may come between the call and the return."""
+    call = instructions[index]
+    assert isinstance(call, Call)
+    result = call.dest
+    seen: set[str] = set()
+    i = index + 1
+    while i < len(instructions):
+        insn = instructions[i]
+        match insn:
+            case Copy() if insn.source == result:
+                result = insn.dest
+            case Label():
+                pass
+            case Jump():
+                if insn.label.name in seen:
+                    return False
+                seen.add(insn.label.name)
+                i = labels[insn.label.name]
+                continue
+            case ReturnValue():
+                return insn.var == result
+            case _:
+                return False
+        i += 1
+    return False
+
+def eliminate_function_tail_calls(name: str, instructions: list[Instruction]) -> list[Instruction]:
+    """Turns calls a function makes to itself in tail position into a jump back to its start."""
+    if address_taken_variables(instructions):
+        # A pointer to a local of an earlier call would see the variable change
+        return instructions
+    labels = {insn.name: i for i, insn in enumerate(instructions) if isinstance(insn, Label)}
+    tail_calls = [
+        i for i, insn in enumerate(instructions)
+        if isinstance(insn, Call) and insn.fun.name == name and is_tail_call(instructions, i, labels)
+    ]
+    if not tail_calls:
+        return instructions
+
+    param_insns = [insn for insn in instructions if isinstance(insn, (LoadIntParam, LoadBoolParam, LoadPointerParam))]
+    params = [insn.dest for insn in param_insns]
+    body_start = max([instructions.index(insn) for insn in param_insns], default=0) + 1
+    start = Label(instructions[0].location, 'tail_call_start')
+
+    temps = 0
+    def fresh() -> IRVar:
+        nonlocal temps
+        temps += 1
+        return IRVar(f'tail_tmp{temps}')
+
+    result: list[Instruction] = []
+    for i, insn in enumerate(instructions):
+        if i == body_start:
+            result.append(start)
+        if i in tail_calls:
+            assert isinstance(insn, Call)
+            # The arguments may read the parameters they replace
+            for dest, source in sequentialize(list(zip(params, insn.args)), fresh):
+                result.append(Copy(insn.location, source, dest))
+            result.append(Jump(insn.location, start))
+        else:
+            result.append(insn)
+    return result
+
+def eliminate_tail_calls(ns_ins: Dict[str, list[Instruction]]) -> Dict[str, list[Instruction]]:
+    """Turns self-recursive tail calls into loops, so they run in constant stack space."""
+    return {name: eliminate_function_tail_calls(name, instructions) for name, instructions in ns_ins.items()}
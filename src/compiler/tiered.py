@@ -0,0 +1,154 @@
+import ctypes
+import tempfile
+from dataclasses import fields
+from os import path
+from typing import Callable
+from compiler.assembler import assemble_shared_object
+from compiler.assembly_generator import generate_ns_assembly
+from compiler.ast import Expression, FuncCall, FuncDef, Literal, Module
+from compiler.interpreter import Evaluation, Function, interpret_module
+from compiler.intrinsics import all_intrinsics
+from compiler.ir import Call, generate_root_var_types
+from compiler.ir_generator import generate_ir
+from compiler.ir_interpreter import intrinsic_semantics, wrap
+from compiler.types import Bool, Int, SymbolTable, Value, get_global_symbol_table
+
+DEFAULT_THRESHOLD = 1000
+# Not a valid identifier, so it cannot clash with a user function
+MODULE_ENTRY = '.tiered'
+
+class TieredFunction(Function):
+    """Interpreted function that asks its runner to compile it once it gets hot."""
+    runner: 'TieredRunner'
+
+    def __init__(self, definition: FuncDef, closure: SymbolTable, runner: 'TieredRunner') -> None:
+        super().__init__(definition, closure)
+        self.runner = runner
+
+    def call(self, *args: Value) -> Evaluation:
+        if self.native is None and self.calls + self.back_edges >= self.runner.threshold:
+            self.runner.promote(self)
+        return (yield from super().call(*args))
+
+def called_functions(expr: Expression) -> set[str]:
+    """Returns the names of all functions called somewhere inside `expr`."""
+    names = set()
+    if isinstance(expr, FuncCall):
+        names.add(expr.name.name)
+
+    for field in fields(expr):
+        value = getattr(expr, field.name)
+        children = value if isinstance(value, list) else [value]
+        for child in children:
+            if isinstance(child, Expression):
+                names |= called_functions(child)
+
+    return names
+
+def get_wrapping_symbol_table() -> SymbolTable[Value]:
+    """Returns the global symbol table with integer arithmetic that wraps at 64 bits,
+    so that interpreted and native calls compute the same values."""
+    root_table = get_global_symbol_table()
+    for op in ('unary_-', '+', '-', '*', '/', '%'):
+        root_table.add_local(op, intrinsic_semantics[op])
+    root_table.add_local('read_int', lambda: wrap(int(input())))
+    return root_table
+
+def has_native_signature(definition: FuncDef) -> bool:
+    # Only values that fit in a single register can cross the ctypes boundary
+    return all(arg.declared_type is Int or arg.declared_type is Bool for arg in definition.args) and \
+        (definition.declared_type is Int or definition.declared_type is Bool)
+
+class TieredRunner:
+    """Runs a type checked module in the interpreter, moving hot functions to native code.
+
+    Every user function counts its calls and the loop back-edges taken in its body.
+    When the sum passes `threshold` and the function is pure (takes and returns
+    only `Int`s and `Bool`s, and only calls intrinsics and other such functions),
+    it is compiled together with its callees into a shared object and all further
+    calls are dispatched natively through ctypes. Integers wrap at 64 bits in both tiers."""
+    threshold: int
+    functions: dict[str, TieredFunction]
+    rejected: set[str]
+    libraries: list[ctypes.CDLL]
+
+    def __init__(self, threshold: int = DEFAULT_THRESHOLD) -> None:
+        self.threshold = threshold
+        self.functions = {}
+        self.rejected = set()
+        self.libraries = []
+
+    def make_function(self, definition: FuncDef, closure: SymbolTable) -> Function:
+        function = TieredFunction(definition, closure, self)
+        self.functions[definition.name.name] = function
+        return function
+
+    def run(self, module: Module, root_table: SymbolTable | None = None) -> Value:
+        if root_table is None:
+            root_table = get_wrapping_symbol_table()
+        return interpret_module(module, root_table, make_function=self.make_function)
+
+    def native_group(self, name: str) -> list[FuncDef] | None:
+        """Returns `name` and every function it transitively calls,
+        or None if any of them cannot be compiled on its own."""
+        group: dict[str, FuncDef] = {}
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            if current in group:
+                continue
+            if current in self.rejected or current not in self.functions:
+                return None
+            definition = self.functions[current].definition
+            if not has_native_signature(definition):
+                return None
+            group[current] = definition
+            pending.extend(n for n in called_functions(definition.body) if n not in all_intrinsics)
+
+        return list(group.values())
+
+    def promote(self, function: TieredFunction) -> None:
+        name = function.definition.name.name
+        if name in self.rejected:
+            return
+
+        group = self.native_group(name)
+        natives = self.compile(group) if group is not None else None
+        if natives is None:
+            self.rejected.add(name)
+            return
+
+        for n, native in natives.items():
+            if self.functions[n].native is None:
+                self.functions[n].native = native
+
+    def compile(self, group: list[FuncDef]) -> dict[str, Callable[..., Value]] | None:
+        try:
+            # Globals are not part of this module, so any function reading one fails here
+            ns_ins = generate_ir(generate_root_var_types(), Module('tiered', [*group, Literal(None)]), entry=MODULE_ENTRY)
+        except Exception:
+            return None
+        del ns_ins[MODULE_ENTRY]
+
+        for instructions in ns_ins.values():
+            for insn in instructions:
+                if isinstance(insn, Call) and insn.fun.name not in all_intrinsics and insn.fun.name not in ns_ins:
+                    return None
+
+        with tempfile.TemporaryDirectory(prefix='compiler_') as workdir:
+            shared_object = path.join(workdir, 'tiered.so')
+            assemble_shared_object(generate_ns_assembly(ns_ins, reduce_strength=True, entry=MODULE_ENTRY), shared_object, workdir)
+            # The file can go away once it has been mapped into the process
+            library = ctypes.CDLL(shared_object)
+        self.libraries.append(library)
+
+        return {definition.name.name: load_native(library, definition) for definition in group}
+
+def load_native(library: ctypes.CDLL, definition: FuncDef) -> Callable[..., Value]:
+    native = library[definition.name.name]
+    native.argtypes = [ctypes.c_int64 for _ in definition.args]
+    native.restype = ctypes.c_int64
+
+    if definition.declared_type is Bool:
+        return lambda *args: bool(native(*args))
+    return native
@@ -126,6 +126,11 @@ def get_global_symbol_table_types() -> SymbolTable[Type]:
         'read_int': FunctionSignature([], Int)},
         parent=None)
 
+def truncating_division(x: int, y: int) -> int:
+    # Rounds toward zero like 'idivq' does, so that interpreted and compiled programs agree
+    quotient = abs(x) // abs(y)
+    return quotient if (x < 0) == (y < 0) else -quotient
+
 def get_global_symbol_table() -> SymbolTable[Value]:
     return SymbolTable[Value](bindings={ # type: ignore[valid-type]
         'unary_-': lambda x: -x,
@@ -133,8 +138,8 @@ def get_global_symbol_table() -> SymbolTable[Value]:
         '+': lambda x,y: x+y,
         '-': lambda x,y: x-y,
         '*': lambda x,y: x*y,
-        '/': lambda x,y: x/y,
-        '%': lambda x,y: x%y,
+        '/': lambda x,y: truncating_division(x, y),
+        '%': lambda x,y: x - y*truncating_division(x, y),
         '<': lambda x,y: x<y,
         '>': lambda x,y: x>y,
         '<=': lambda x,y: x<=y,
@@ -0,0 +1,189 @@
+from dataclasses import dataclass
+from typing import Dict
+from compiler.ir import Call, CondJump, Copy, Instruction, IRVar, Jump, Label, LoadBoolConst, LoadIntConst, ReturnValue, constant_values, defs, map_targets, targets, uses
+from compiler.ir_interpreter import intrinsic_semantics
+from compiler.ssa import address_taken_variables
+
+# How many instructions unrolling a loop may add to its function
+DEFAULT_UNROLL_BUDGET = 64
+# Partially unrolled loops run at most this many copies of their body per iteration
+MAX_UNROLL_FACTOR = 4
+# Loops whose condition does not move steadily towards its bound are only simulated this far
+MAX_SIMULATED_TRIPS = 1000
+
+INT_MIN = -2**63
+INT_MAX = 2**63 - 1
+
+comparisons = ['<', '<=', '>', '>=', '==', '!=']
+
+@dataclass
+class CountedLoop:
+    """A while loop whose induction variable goes from `init` in steps of `step` and
+    whose condition compares it with a constant, as positions in the instruction list."""
+    start: int
+    body: int
+    end: int
+    var: IRVar
+    init: int
+    step: int
+    trips: int
+
+def trip_count(op: str, var_first: bool, bound: int, init: int, step: int) -> int | None:
+    """Returns how many times the body of a counted loop runs, or None when the
+    induction variable would wrap around or the loop would not stop."""
+    def holds(n: int) -> bool:
+        value = init + n*step
+        return bool(intrinsic_semantics[op](value, bound) if var_first else intrinsic_semantics[op](bound, value))
+
+    if not holds(0):
+        return 0
+    if step == 0:
+        return None
+    # The last trip before the induction variable leaves the 64-bit range
+    last = (INT_MAX - init) // step if step > 0 else (init - INT_MIN) // -step
+    if op in ['==', '!=']:
+        n = 0
+        while holds(n):
+            n += 1
+            if n > min(last, MAX_SIMULATED_TRIPS):
+                return None
+        return n
+    if holds(last):
+        return None
+    # The variable moves in one direction, so the condition holds up to some trip
+    low, high = 0, last
+    while high - low > 1:
+        middle = (low + high) // 2
+        if holds(middle):
+            low = middle
+        else:
+            high = middle
+    return high
+
+def counted_loop(instructions: list[Instruction], start: int, constants: Dict[IRVar, int | bool]) -> CountedLoop | None:
+    """Recognizes the counted while loop whose start label is at `start`.
+
+    The header must only compare the induction variable with a constant. The body must
+    end by adding a constant to the variable, assign it nowhere else and not leave the
+    loop any other way. The variable must get a constant value right before the loop."""
+    header: list[Instruction] = []
+    i = start + 1
+    while i < len(instructions) and not isinstance(instructions[i], (CondJump, Label)):
+        header.append(instructions[i])
+        i += 1
+    if i == len(instructions) or not isinstance(instructions[i], CondJump) or not header:
+        return None
+    branch = instructions[i]
+    assert isinstance(branch, CondJump)
+    body = i + 1
+    if body >= len(instructions) or instructions[body] != branch.then_label:
+        return None
+    end = next((j for j in range(body, len(instructions)) if instructions[j] == branch.else_label), None)
+    if end is None or end < body + 4:
+        return None
+    back = instructions[end-1]
+    if not isinstance(back, Jump) or back.label != instructions[start]:
+        return None
+
+    compare = header[-1]
+    if not isinstance(compare, Call) or compare.fun.name not in comparisons or compare.dest != branch.cond:
+        return None
+    if not all(isinstance(insn, (LoadIntConst, LoadBoolConst)) for insn in header[:-1]):
+        return None
+    a, b = compare.args
+    var, bound, var_first = (a, b, True) if b in constants else (b, a, False)
+    if var in constants or var in address_taken_variables(instructions) or not isinstance(constants.get(bound), int) or isinstance(constants.get(bound), bool):
+        return None
+
+    increment, assign = instructions[end-3], instructions[end-2]
+    if not isinstance(increment, Call) or increment.fun.name not in ['+', '-'] or not isinstance(assign, Copy):
+        return None
+    if assign.source != increment.dest or assign.dest != var or var not in increment.args:
+        return None
+    other = increment.args[1] if increment.args[0] == var else increment.args[0]
+    step = constants.get(other)
+    if not isinstance(step, int) or isinstance(step, bool) or (increment.fun.name == '-' and increment.args[0] != var):
+        return None
+    if increment.fun.name == '-':
+        step = -step
+
+    body_insns = instructions[body+1:end-3]
+    inner_labels = {insn.name for insn in body_insns if isinstance(insn, Label)}
+    for insn in body_insns:
+        if isinstance(insn, ReturnValue) or var in defs(insn) or increment.dest in uses(insn):
+            return None
+        if any(label.name not in inner_labels for label in targets(insn)):
+            # Break and continue leave the loop early
+            return None
+    # The header is left out when the loop is fully unrolled
+    header_vars = {dest for insn in header for dest in defs(insn)}
+    if any(v in header_vars for insn in instructions[:start] + body_insns + instructions[end:] for v in uses(insn)):
+        return None
+
+    init: int | None = None
+    for insn in reversed(instructions[:start]):
+        if isinstance(insn, Label) or isinstance(insn, (Jump, CondJump)):
+            break
+        if var in defs(insn):
+            if isinstance(insn, LoadIntConst):
+                init = insn.value
+            elif isinstance(insn, Copy) and isinstance(constants.get(insn.source), int) and not isinstance(constants.get(insn.source), bool):
+                init = constants[insn.source] # type: ignore[assignment]
+            break
+    if init is None:
+        return None
+
+    trips = trip_count(compare.fun.name, var_first, bound=constants[bound], init=init, step=step) # type: ignore[arg-type]
+    if trips is None:
+        return None
+    return CountedLoop(start, body, end, var, init, step, trips)
+
+def unroll_function_loops(instructions: list[Instruction], budget: int = DEFAULT_UNROLL_BUDGET) -> list[Instruction]:
+    """Unrolls the counted while loops of a function, inner loops first.
+
+    A loop is fully unrolled when all copies of its body fit in the budget. Otherwise it runs
+    several copies of its body per iteration, with the iterations that do not fill a whole
+    round peeled in front of it, so the original condition is still exact."""
+    if budget <= 0:
+        return instructions
+    copies = 0
+    done: set[str] = set()
+
+    def copy(body: list[Instruction]) -> list[Instruction]:
+        nonlocal copies
+        copies += 1
+        suffix = f'u{copies}'
+        def relabel(label: Label) -> Label:
+            return Label(label.location, f'{label.name}_{suffix}')
+        return [relabel(insn) if isinstance(insn, Label) else map_targets(insn, relabel) for insn in body]
+
+    while True:
+        starts = [i for i, insn in enumerate(instructions) if isinstance(insn, Label) and insn.name.startswith('while_start') and insn.name not in done]
+        if not starts:
+            return instructions
+        # Inner loops come after the start of the loops around them
+        start = starts[-1]
+        done.add(instructions[start].name) # type: ignore[attr-defined]
+        loop = counted_loop(instructions, start, constant_values(instructions))
+        if loop is None:
+            continue
+
+        body = instructions[loop.body+1:loop.end-1]
+        size = len([insn for insn in body if not isinstance(insn, Label)])
+        before, after = instructions[:loop.start], instructions[loop.end:]
+        if loop.trips * size <= budget:
+            unrolled = [insn for _ in range(loop.trips) for insn in copy(body)]
+            instructions = before + unrolled + after
+            continue
+
+        factor = next((k for k in range(MAX_UNROLL_FACTOR, 1, -1) if loop.trips >= k and (k - 1 + loop.trips % k) * size <= budget), None)
+        if factor is None:
+            continue
+        peeled = [insn for _ in range(loop.trips % factor) for insn in copy(body)]
+        header = instructions[loop.start:loop.body+1]
+        rounds = body + [insn for _ in range(factor - 1) for insn in copy(body)]
+        instructions = before + peeled + header + rounds + instructions[loop.end-1:]
+
+def unroll_loops(ns_ins: Dict[str, list[Instruction]], budget: int = DEFAULT_UNROLL_BUDGET) -> Dict[str, list[Instruction]]:
+    """Unrolls counted while loops with a constant bound and step. A budget of 0 turns unrolling off."""
+    return {name: unroll_function_loops(instructions, budget) for name, instructions in ns_ins.items()}
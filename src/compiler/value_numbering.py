@@ -0,0 +1,91 @@
+from typing import Dict, Hashable
+from compiler.cfg import ControlFlowGraph, dominator_tree, immediate_dominators
+from compiler.intrinsics import all_intrinsics
+from compiler.ir import Call, Copy, CopyPointer, IRVar, Instruction, LoadBoolConst, LoadIntConst, defs, map_uses
+from compiler.ir_interpreter import intrinsic_semantics
+from compiler.partial_evaluator import impure_builtins
+from compiler.pass_manager import AnalysisManager
+from compiler.ssa import address_taken_variables, from_ssa, to_ssa
+
+# Intrinsics whose result only depends on their operands, and on memory for 'unary_*'
+numbered_intrinsics = [*intrinsic_semantics, 'unary_*']
+
+commutative_intrinsics = ['+', '*', '==', '!=']
+
+def number_values(instructions: list[Instruction]) -> list[Instruction]:
+    """Replaces recomputations of an available intrinsic call in a function in SSA form by a copy.
+
+    Calls are available in the blocks dominated by the block computing them.
+    Loads through pointers and calls reading address-taken variables are only
+    reused within a block, until memory may have been written."""
+    cfg = ControlFlowGraph(instructions)
+    children = dominator_tree(immediate_dominators(cfg))
+    address_taken = address_taken_variables(instructions)
+
+    # Variables known to hold the same value as a variable defined before them
+    leaders: Dict[IRVar, IRVar] = {}
+
+    def leader(var: IRVar) -> IRVar:
+        return leaders.get(var, var)
+
+    available: Dict[Hashable, IRVar] = {}
+    added: list[list[Hashable]] = [[] for _ in cfg.blocks]
+    blocks = [list(block) for block in cfg.blocks]
+    # Incremented whenever memory may change, which makes earlier loads unavailable
+    epoch = 0
+
+    stack: list[tuple[int, bool]] = [(0, False)]
+    while stack:
+        b, leaving = stack.pop()
+        if leaving:
+            for expired in added[b]:
+                del available[expired]
+            continue
+
+        def make_available(key: Hashable, var: IRVar) -> None:
+            available[key] = var
+            added[b].append(key)
+
+        for i, insn in enumerate(blocks[b]):
+            key: Hashable
+            match insn:
+                case Copy() if insn.source not in address_taken and insn.dest not in address_taken:
+                    leaders[insn.dest] = leader(insn.source)
+                case LoadIntConst() | LoadBoolConst() if insn.dest not in address_taken:
+                    key = (type(insn), insn.value)
+                    if key in available:
+                        leaders[insn.dest] = available[key]
+                    else:
+                        make_available(key, insn.dest)
+                case Call() if insn.fun.name in numbered_intrinsics and insn.dest not in address_taken:
+                    args = [leader(arg) for arg in insn.args]
+                    if insn.fun.name in commutative_intrinsics:
+                        args.sort(key=lambda var: var.name)
+                    key = (insn.fun.name, *args)
+                    if insn.fun.name == 'unary_*' or any(arg in address_taken for arg in insn.args):
+                        key = (key, b, epoch)
+                    if key in available:
+                        blocks[b][i] = Copy(insn.location, available[key], insn.dest)
+                        leaders[insn.dest] = available[key]
+                    else:
+                        make_available(key, insn.dest)
+                case CopyPointer():
+                    epoch += 1
+                case Call() if insn.fun.name not in all_intrinsics and insn.fun.name not in impure_builtins:
+                    # User functions may write through the pointers they get
+                    epoch += 1
+            if any(var in address_taken for var in defs(insn)):
+                epoch += 1
+
+        stack.append((b, True))
+        for child in reversed(children[b]):
+            stack.append((child, False))
+
+    replace = lambda var: var if var in address_taken else leader(var)
+    return [map_uses(insn, replace) for block in blocks for insn in block]
+
+def eliminate_common_subexpressions(ns_ins: Dict[str, list[Instruction]], analyses: AnalysisManager | None = None) -> Dict[str, list[Instruction]]:
+    """Runs global value numbering on every function, going through SSA form.
+    `analyses` holds the analyses of `ns_ins` when they are already known."""
+    ssa = to_ssa(ns_ins, analyses)
+    return from_ssa({name: number_values(instructions) for name, instructions in ssa.items()})
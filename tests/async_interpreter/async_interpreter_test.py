@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from compiler.ast import Module
+from compiler.async_interpreter import AsyncInterpreter, ProgramStreams, StepBudgetExceeded, run_programs
+from compiler.parser import parse
+from compiler.tokenizer import tokenize
+
+import unittest
+
+def p(input: str) -> Module:
+    return parse(tokenize(input))
+
+def streams(inputs: list[str], output: list[str]) -> ProgramStreams:
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for line in inputs:
+        queue.put_nowait(line)
+
+    async def write(text: str) -> None:
+        output.append(text)
+
+    return ProgramStreams(read_line=queue.get, write=write)
+
+class AsyncInterpreterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_interpret_simple(self) -> None:
+        result = await AsyncInterpreter(streams([], [])).interpret_module(p('var x = 1; while x < 10 do x = x * 2; x'))
+        assert result == 16
+
+    async def test_interpret_function(self) -> None:
+        result = await AsyncInterpreter(streams([], [])).interpret_module(p('fun f(x: Int): Int { if x <= 1 then 1 else x * f(x-1) } f(5)'))
+        assert result == 120
+
+    async def test_read_and_print(self) -> None:
+        output: list[str] = []
+        await AsyncInterpreter(streams(['4', '5'], output)).interpret_module(p('print_int(read_int() * read_int()); print_bool(true)'))
+        assert output == ['20\n', 'True\n']
+
+    async def test_read_waits_for_input(self) -> None:
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        output: list[str] = []
+
+        async def write(text: str) -> None:
+            output.append(text)
+
+        task = asyncio.create_task(AsyncInterpreter(ProgramStreams(queue.get, write)).interpret_module(p('print_int(read_int() + 1)')))
+        await asyncio.sleep(0)
+        assert not task.done()
+        await queue.put('41')
+        await task
+        assert output == ['42\n']
+
+    async def test_budget_exceeded(self) -> None:
+        with self.assertRaises(StepBudgetExceeded):
+            await AsyncInterpreter(streams([], []), budget=1000).interpret_module(p('while true do { 1 }'))
+
+    async def test_programs_are_interleaved(self) -> None:
+        output: list[str] = []
+        program = 'var i = 0; while i < 3 do { print_int(i); i = i + 1 }'
+        await run_programs([(p(program), streams([], output)), (p(program), streams([], output))])
+        assert output == ['0\n', '0\n', '1\n', '1\n', '2\n', '2\n']
+
+    async def test_failing_program_does_not_stop_others(self) -> None:
+        results = await run_programs([
+            (p('while true do { 1 }'), streams([], [])),
+            (p('1 + 2'), streams([], [])),
+        ], budget=500)
+        assert isinstance(results[0], StepBudgetExceeded)
+        assert results[1] == 3
+
+    async def test_max_concurrent(self) -> None:
+        output: list[str] = []
+        program = 'var i = 0; while i < 2 do { print_int(i); i = i + 1 }'
+        await run_programs([(p(program), streams([], output)), (p(program), streams([], output))], max_concurrent=1)
+        assert output == ['0\n', '1\n', '0\n', '1\n']
+
+    async def test_cancelled_program_stops(self) -> None:
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        output: list[str] = []
+
+        async def write(text: str) -> None:
+            output.append(text)
+
+        task = asyncio.create_task(AsyncInterpreter(ProgramStreams(queue.get, write)).interpret_module(p('print_int(read_int()); print_int(2)')))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        assert output == []
+
+    async def test_runs_without_threads(self) -> None:
+        threads: list[int] = []
+
+        async def write(text: str) -> None:
+            threads.append(threading.active_count())
+
+        before = threading.active_count()
+        await AsyncInterpreter(ProgramStreams(asyncio.Queue[str]().get, write)).interpret_module(p('var i = 0; while i < 3 do { print_int(i); i = i + 1 }'))
+        assert threads == [before] * 3
+
+    async def test_calls_count_as_steps(self) -> None:
+        with self.assertRaises(StepBudgetExceeded):
+            await AsyncInterpreter(streams([], []), budget=50).interpret_module(p('fun f(n: Int): Int { if n == 0 then 0 else f(n - 1) } f(100)'))
+        assert await AsyncInterpreter(streams([], []), budget=150).interpret_module(p('fun f(n: Int): Int { if n == 0 then 0 else f(n - 1) + 1 } f(100)')) == 100
@@ -0,0 +1,40 @@
+from compiler.cfg import ControlFlowGraph
+from compiler.ir import CondJump, IRVar, Jump, Label, LoadIntConst, ReturnValue
+from compiler.location import Location
+from tests.helpers import compile
+
+import unittest
+
+class CFGTest(unittest.TestCase):
+    def test_blocks_after_jumps_need_no_label(self) -> None:
+        location = Location('test', 0, 0)
+        a, b = IRVar('a'), IRVar('b')
+        then_label, end_label = Label(location, 'then'), Label(location, 'end')
+        cfg = ControlFlowGraph([
+            LoadIntConst(location, 1, a),
+            CondJump(location, a, then_label, end_label),
+            LoadIntConst(location, 2, b),
+            Jump(location, end_label),
+            then_label,
+            Jump(location, end_label),
+            end_label,
+            ReturnValue(location, a),
+        ])
+        assert cfg.starts == [0, 2, 4, 6]
+        assert cfg.labels == [None, None, then_label, end_label]
+        assert cfg.block_of_label == {'then': 2, 'end': 3}
+        assert cfg.successors == [[2, 3], [3], [3], []]
+        assert cfg.predecessors == [[], [], [0], [0, 1, 2]]
+        # The block after the unconditional jump can never run
+        assert cfg.rpo_number == [0, -1, 1, 2]
+        assert cfg.reachable() == [True, False, True, True]
+
+    def test_only_loop_back_edges_go_backwards_in_reverse_postorder(self) -> None:
+        instructions = compile('var i = 0; while i < 3 do { if i == 1 then print_int(i); i = i + 1 }; i')['main']
+        cfg = ControlFlowGraph(instructions)
+        assert cfg.instructions() == instructions
+        assert cfg.reverse_postorder()[0] == 0
+        assert sorted(cfg.rpo_number[b] for b in cfg.reverse_postorder()) == list(range(len(cfg.reverse_postorder())))
+        backwards = [(b, s) for b in cfg.reverse_postorder() for s in cfg.successors[b] if cfg.rpo_number[s] <= cfg.rpo_number[b]]
+        assert len(backwards) == 1
+        assert isinstance(cfg.blocks[backwards[0][1]][0], Label)
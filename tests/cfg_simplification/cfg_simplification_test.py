@@ -0,0 +1,56 @@
+from compiler.assembly_generator import generate_assembly
+from compiler.cfg_simplification import simplify_control_flow
+from compiler.ir import CondJump, Copy, Instruction, IRVar, Jump, Label, LoadIntConst, ReturnValue
+from compiler.location import Location
+from tests.helpers import compile, run
+
+import unittest
+
+L = Location('', 0, 0)
+
+def label(name: str) -> Label:
+    return Label(L, name)
+
+class CFGSimplificationTest(unittest.TestCase):
+    def test_removes_jumps_to_the_next_label(self) -> None:
+        ns_ins = simplify_control_flow(compile('var x = read_int(); if x > 0 then print_int(1) else print_int(2); x'))
+        instructions = ns_ins['main']
+        for i, insn in enumerate(instructions[:-1]):
+            assert not (isinstance(insn, Jump) and instructions[i+1] == insn.label)
+        assert run(ns_ins, [1]) == '1\n1\n'
+        assert run(ns_ins, [-1]) == '2\n-1\n'
+
+    def test_threads_jumps_through_empty_blocks(self) -> None:
+        c = IRVar('c')
+        instructions: list[Instruction] = [
+            label('Start'), LoadIntConst(L, 1, c),
+            CondJump(L, c, label('a'), label('b')),
+            label('a'), Jump(L, label('c')),
+            label('b'), label('c'), ReturnValue(L, c),
+        ]
+        result = simplify_control_flow({'f': instructions})['f']
+        assert result == [label('Start'), LoadIntConst(L, 1, c), ReturnValue(L, c)]
+
+    def test_merges_blocks_entered_by_a_single_jump(self) -> None:
+        x, y = IRVar('x'), IRVar('y')
+        instructions: list[Instruction] = [
+            label('Start'), LoadIntConst(L, 1, x), Jump(L, label('later')),
+            label('loop'), Jump(L, label('loop')),
+            label('later'), Copy(L, x, y), ReturnValue(L, y),
+        ]
+        result = simplify_control_flow({'f': instructions})['f']
+        assert result == [label('Start'), LoadIntConst(L, 1, x), Copy(L, x, y), ReturnValue(L, y)]
+
+    def test_keeps_infinite_loops(self) -> None:
+        instructions: list[Instruction] = [label('Start'), label('loop'), Jump(L, label('loop'))]
+        result = simplify_control_flow({'f': instructions})['f']
+        assert result == [label('Start'), label('loop'), Jump(L, label('loop'))]
+
+    def test_branch_polarity_lets_the_next_block_fall_through(self) -> None:
+        c = IRVar('c')
+        then_next: list[Instruction] = [LoadIntConst(L, 1, c), CondJump(L, c, label('then'), label('else')), label('then'), label('else'), ReturnValue(L, c)]
+        assembly = generate_assembly('f', then_next)
+        assert 'je .Lf_else' in assembly and 'jne' not in assembly
+        else_next: list[Instruction] = [LoadIntConst(L, 1, c), CondJump(L, c, label('then'), label('else')), label('else'), label('then'), ReturnValue(L, c)]
+        assembly = generate_assembly('f', else_next)
+        assert 'jne .Lf_then' in assembly and 'jmp .Lf_else' not in assembly
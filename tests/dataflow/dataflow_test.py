@@ -0,0 +1,122 @@
+from compiler.cfg import terminators
+from compiler.dataflow import UNINITIALIZED, BitVectorDataFlow, available_copies, reaching_definitions
+from compiler.ir import Instruction, IRVar, Label, defs, targets, uses, variables
+from typing import Dict
+from tests.helpers import compile, generated_source
+
+import unittest
+
+def find(program: list[Instruction], text: str) -> int:
+    return [str(insn) for insn in program].index(text)
+
+def iterate_instructions(ns_ins: Dict[str, list[Instruction]]) -> list[Dict[IRVar, set[int]]]:
+    """Reaching definitions found by sweeping over every instruction until nothing changes."""
+    inputs: list[Dict[IRVar, set[int]]] = []
+    successors: list[list[int]] = []
+    for instructions in ns_ins.values():
+        first = len(inputs)
+        labels = {insn.name: first + i for i, insn in enumerate(instructions) if isinstance(insn, Label)}
+        inputs += [{} for _ in instructions]
+        inputs[first] = {var: {UNINITIALIZED} for insn in instructions for var in variables(insn)}
+        for i, insn in enumerate(instructions, first):
+            following = [] if isinstance(insn, terminators) or i+1 == first + len(instructions) else [i+1]
+            successors.append([labels[label.name] for label in targets(insn)] + following)
+    program = [insn for instructions in ns_ins.values() for insn in instructions]
+    changed = True
+    while changed:
+        changed = False
+        for i, insn in enumerate(program):
+            output = dict(inputs[i])
+            for var in defs(insn):
+                output[var] = {i}
+            for s in successors[i]:
+                for var, definitions in output.items():
+                    if not definitions <= inputs[s].get(var, set()):
+                        inputs[s][var] = inputs[s].get(var, set()) | definitions
+                        changed = True
+    return inputs
+
+class DataFlowTest(unittest.TestCase):
+    def test_loop_back_edge_reaches_condition(self) -> None:
+        ns_ins = compile('var i = 0; while i < 10 do { i = i + 1 }; i')
+        program = [insn for instructions in ns_ins.values() for insn in instructions]
+        dataflow = reaching_definitions(ns_ins)
+        condition = find(program, 'Call(<, [x2, x3], x4)')
+        assert dataflow.reaching(condition, IRVar('x2')) == {find(program, 'Copy(x1, x2)'), find(program, 'Copy(x6, x2)')}
+
+    def test_both_branches_reach_the_join(self) -> None:
+        ns_ins = compile('var x = 1; if x > 0 then { x = 2 } else { x = 3 }; x')
+        program = [insn for instructions in ns_ins.values() for insn in instructions]
+        dataflow = reaching_definitions(ns_ins)
+        last_use = find(program, 'Call(print_int, [x2], x8)')
+        assert dataflow.reaching(last_use, IRVar('x2')) == {find(program, 'Copy(x6, x2)'), find(program, 'Copy(x7, x2)')}
+
+    def test_fallthrough_into_a_label(self) -> None:
+        ns_ins = compile('var x = 1; if x > 0 then { x = 2 }; x')
+        program = [insn for instructions in ns_ins.values() for insn in instructions]
+        dataflow = reaching_definitions(ns_ins)
+        last_use = find(program, 'Call(print_int, [x2], x6)')
+        assert dataflow.reaching(last_use, IRVar('x2')) == {find(program, 'Copy(x1, x2)'), find(program, 'Copy(x5, x2)')}
+
+    def test_functions_start_without_definitions(self) -> None:
+        ns_ins = compile('fun f(a: Int): Int { var b = a; b } var b = 1; f(b)')
+        program = [insn for instructions in ns_ins.values() for insn in instructions]
+        dataflow = reaching_definitions(ns_ins)
+        start = find(program, 'Label(Start_f)')
+        assert dataflow.reaching(start, IRVar('x2')) == {UNINITIALIZED}
+
+    def test_copies_end_when_their_source_changes_on_some_path(self) -> None:
+        ns_ins = compile('var x = read_int(); var y = x; while y > 0 do { print_int(y); x = read_int(); }; print_int(y)')
+        program = [insn for instructions in ns_ins.values() for insn in instructions]
+        copies = available_copies(ns_ins)
+        assert copies.available_copy(find(program, 'Copy(x2, x3)'), IRVar('x2')) == find(program, 'Copy(x1, x2)')
+        # The loop redefines `x` before going back to the condition
+        assert copies.available_copy(find(program, 'Call(>, [x3, x4], x5)'), IRVar('x3')) is None
+        assert copies.available_copy(find(program, 'Call(print_int, [x3], x8)'), IRVar('x3')) is None
+
+    def test_agrees_with_instruction_by_instruction_iteration(self) -> None:
+        ns_ins = compile(generated_source(20))
+        program = [insn for instructions in ns_ins.values() for insn in instructions]
+        dataflow = reaching_definitions(ns_ins)
+        expected = iterate_instructions(ns_ins)
+        for index, insn in enumerate(program):
+            for var in uses(insn):
+                assert dataflow.reaching(index, var) == expected[index].get(var, {UNINITIALIZED}), (index, var)
+
+    def test_large_functions(self) -> None:
+        ns_ins = compile(generated_source(400))
+        assert len(ns_ins['main']) > 10000
+        dataflow = reaching_definitions(ns_ins)
+        # Blocks are only visited again when a loop changes their input
+        assert dataflow.visits <= 2 * len(dataflow.blocks)
+        last = len(ns_ins['main']) - 2
+        assert len(dataflow.reaching(last, uses(ns_ins['main'][last])[0])) > 1
+
+    def test_functions_number_their_own_facts(self) -> None:
+        ns_ins = compile('fun f(a: Int): Int { var b = a + 1; b } ' + generated_source(20))
+        assert list(ns_ins) == ['main', 'f']
+        dataflow = reaching_definitions(ns_ins)
+        first = len(ns_ins['main'])
+        f_states = [state for index, state in dataflow.inp.items() if index >= first]
+        # The states of the small function do not grow with the large one before it
+        assert max(state.bit_length() for state in f_states) <= len(dataflow.facts[1]) < 10
+        last = len(ns_ins['f']) - 1
+        assert len(dataflow.reaching(first + last, uses(ns_ins['f'][last])[0])) == 1
+
+    def test_analyses_keep_their_own_state(self) -> None:
+        first_program = compile('var x = 1; while x < 10 do { x = x + 1 }; x')
+        first = reaching_definitions(first_program)
+        condition = find(first_program['main'], 'Call(<, [x2, x3], x4)')
+        before = first.reaching(condition, IRVar('x2'))
+        second = reaching_definitions(compile('var y = read_int(); print_int(y)'))
+        assert first.inp is not second.inp and first.outp is not second.outp
+        assert first.reaching(condition, IRVar('x2')) == before
+        assert all(isinstance(state, int) for state in first.inp.values())
+
+    def test_incomplete_analyses_cannot_be_created(self) -> None:
+        class NoFacts(BitVectorDataFlow):
+            def describe(self, index: int, state: int) -> list[str]:
+                return []
+
+        with self.assertRaises(TypeError):
+            NoFacts(compile('print_int(1)'))  # type: ignore[abstract]
@@ -1,11 +1,26 @@
 import os
+from typing import Callable, Dict
 from compiler.assembler import assemble
 from compiler.assembly_generator import generate_ns_assembly
+from compiler.cfg_simplification import simplify_control_flow
 from compiler.ast import Module
-from compiler.ir import generate_root_var_types
+from compiler.escape_analysis import promote_variables
+from compiler.if_conversion import if_convert
+from compiler.inliner import inline_functions
+from compiler.ir import Instruction, generate_root_var_types
 from compiler.ir_generator import generate_ir
+from compiler.loop_invariants import hoist_loop_invariants
+from compiler.loop_rotation import rotate_loops
+from compiler.optimizer import optimize, simplify
 from compiler.parser import parse
+from compiler.ranges import fold_ranges
+from compiler.specialization import specialize_functions
+from compiler.switch_lowering import lower_switches
+from compiler.ssa import from_ssa, to_ssa
+from compiler.tail_calls import eliminate_tail_calls
+from compiler.value_numbering import eliminate_common_subexpressions
 from compiler.tokenizer import tokenize
+from compiler.unrolling import unroll_loops
 from compiler.type_checker import typecheck_module
 from compiler.types import get_global_symbol_table_types
 import unittest
@@ -16,10 +31,12 @@ def tokenize_parse_and_typecheck(inpt: str) -> Module:
     typecheck_module(parsed, get_global_symbol_table_types())
     return parsed
 
-def run_test_case(test_count: int, test_namespace: str, test_case: tuple[str, str]) -> None:
+type Transform = Callable[[Dict[str, list[Instruction]]], Dict[str, list[Instruction]]]
+
+def run_test_case(test_count: int, test_namespace: str, test_case: tuple[str, str], optimization_level: int = 0, transform: Transform = lambda ns_ins: ns_ins) -> None:
     source, expected = test_case
     try:
-        assembly = generate_ns_assembly(generate_ir(generate_root_var_types(), tokenize_parse_and_typecheck(source)))
+        assembly = generate_ns_assembly(transform(optimize(generate_ir(generate_root_var_types(), tokenize_parse_and_typecheck(source)), optimization_level)), reduce_strength=optimization_level >= 1)
         assemble(assembly, f'{test_namespace}_{test_count}_out')
         proc = subprocess.run([f'{os.getcwd()}/{test_namespace}_{test_count}_out'], capture_output = True, text = True)
         output = proc.stdout
@@ -30,7 +47,7 @@ def run_test_case(test_count: int, test_namespace: str, test_case: tuple[str, st
     except Exception:
         raise Exception(f'Compiler failed at test {test_namespace}_{test_count}')
 
-def read_test_cases() -> None:
+def read_test_cases(optimization_level: int = 0, transform: Transform = lambda ns_ins: ns_ins) -> None:
     path = './tests/end2end/test_programs'
     files = [f for f in os.listdir(path)]
 
@@ -44,8 +61,56 @@ def read_test_cases() -> None:
                 expected = lines[i+1].strip().split('#')[1]
                 count += 1
                 i = i + 3
-                run_test_case(count, f, (inpt, expected))
+                run_test_case(count, f, (inpt, expected), optimization_level, transform)
 
 class End2EndTest(unittest.TestCase):
     def test_all_cases(self) -> None:
-        read_test_cases()
\ No newline at end of file
+        read_test_cases()
+
+    def test_all_cases_optimized(self) -> None:
+        read_test_cases(optimization_level=1)
+
+    def test_all_cases_optimized_for_speed(self) -> None:
+        read_test_cases(optimization_level=2)
+
+    def test_all_cases_through_ssa(self) -> None:
+        read_test_cases(transform=lambda ns_ins: from_ssa(to_ssa(ns_ins)))
+
+    def test_all_cases_simplified(self) -> None:
+        read_test_cases(transform=simplify)
+
+    def test_all_cases_value_numbered(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(eliminate_common_subexpressions(ns_ins)))
+
+    def test_all_cases_with_hoisted_invariants(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(hoist_loop_invariants(ns_ins)))
+
+    def test_all_cases_with_simplified_control_flow(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify_control_flow(simplify(ns_ins)))
+
+    def test_all_cases_inlined(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(inline_functions(ns_ins)))
+
+    def test_all_cases_without_tail_calls(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(eliminate_tail_calls(ns_ins)))
+
+    def test_all_cases_unrolled(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(unroll_loops(ns_ins)))
+
+    def test_all_cases_specialized(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(specialize_functions(ns_ins)))
+
+    def test_all_cases_with_promoted_variables(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(promote_variables(ns_ins)))
+
+    def test_all_cases_if_converted(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(if_convert(ns_ins)))
+
+    def test_all_cases_with_folded_ranges(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(fold_ranges(ns_ins)))
+
+    def test_all_cases_with_lowered_switches(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(lower_switches(ns_ins)))
+
+    def test_all_cases_with_rotated_loops(self) -> None:
+        read_test_cases(transform=lambda ns_ins: simplify(rotate_loops(ns_ins)))
@@ -0,0 +1,51 @@
+from compiler.escape_analysis import promotable_variables, promote_variables
+from compiler.ir import Call, CopyPointer, Instruction, IRVar
+from compiler.optimizer import simplify
+from compiler.ssa import address_taken_variables
+from tests.helpers import compile, run
+
+import unittest
+
+def memory_operations(instructions: list[Instruction]) -> int:
+    return len([insn for insn in instructions if isinstance(insn, CopyPointer) or isinstance(insn, Call) and insn.fun.name in ['unary_&', 'unary_*']])
+
+class EscapeAnalysisTest(unittest.TestCase):
+    def test_promotes_variables_only_used_through_local_pointers(self) -> None:
+        ns_ins = compile('var x = read_int(); var p = &x; var q = p; *q = *p + 5; print_int(*p); x')
+        assert len(promotable_variables(ns_ins['main'])) == 1
+        promoted = promote_variables(ns_ins)
+        assert memory_operations(promoted['main']) == 0
+        assert address_taken_variables(promoted['main']) == set()
+        assert run(simplify(promoted), [1]) == '6\n6\n'
+
+    def test_addresses_escaping_the_function_stay_in_memory(self) -> None:
+        for source in [
+            'fun inc(p: Int*) { *p = *p + 1; } var x = 1; inc(&x); x',
+            'var x = 1; var y = 2; var p = &x; var pp = &p; *pp = &y; *p = 3; x + y',
+        ]:
+            ns_ins = compile(source)
+            promoted = promote_variables(ns_ins)
+            assert memory_operations(promoted['main']) > 0, source
+            assert run(promoted) == run(ns_ins), source
+
+    def test_addresses_kept_in_memory_escape(self) -> None:
+        # p can be promoted, but x is reachable through the memory p lived in
+        ns_ins = compile('fun f(): Int { var x = 1; var p = &x; var pp = &p; **pp = 3; x } f()')
+        assert len(promotable_variables(ns_ins['f'])) == 1
+        promoted = promote_variables(ns_ins)
+        assert memory_operations(promoted['f']) == 2
+        assert run(promoted) == '3\n'
+
+    def test_pointers_to_several_variables_are_not_resolved(self) -> None:
+        source = 'var x = 1; var y = 2; var p = &x; if read_int() > 0 then p = &y; *p = 10; print_int(x); y'
+        ns_ins = compile(source)
+        assert promotable_variables(ns_ins['main']) == set()
+        for value in [0, 1]:
+            assert run(promote_variables(ns_ins), [value]) == run(ns_ins, [value])
+
+    def test_promotes_some_variables_of_a_function(self) -> None:
+        source = 'fun inc(p: Int*) { *p = *p + 1; } var x = 1; var y = 2; var p = &x; *p = *p + 5; var q = &y; inc(q); print_int(y); x'
+        ns_ins = compile(source)
+        assert [var.name for var in promotable_variables(ns_ins['main'])] == ['x2']
+        assert run(promote_variables(ns_ins)) == '3\n6\n'
+        assert address_taken_variables(promote_variables(ns_ins)['main']) == {IRVar('x4')}
@@ -0,0 +1,41 @@
+import os
+from typing import Dict
+from compiler.ir import Instruction, generate_root_var_types
+from compiler.ir_generator import generate_ir
+from compiler.ir_interpreter import IRInterpreter
+from compiler.parser import parse
+from compiler.tokenizer import tokenize
+from compiler.type_checker import typecheck_module
+from compiler.types import get_global_symbol_table_types
+
+def compile(source: str) -> Dict[str, list[Instruction]]:
+    """Type checks `source` and generates its IR."""
+    module = parse(tokenize(source))
+    typecheck_module(module, get_global_symbol_table_types())
+    return generate_ir(generate_root_var_types(), module)
+
+def run(ns_ins: Dict[str, list[Instruction]], inputs: list[int] = []) -> str:
+    """Interprets the IR, reading `inputs`, and returns what it printed."""
+    values = iter(inputs)
+    interpreter = IRInterpreter(ns_ins, read_int=lambda: next(values))
+    interpreter.run()
+    return interpreter.output_text()
+
+def read_programs() -> list[tuple[str, str]]:
+    """Returns the source and the expected output of every end-to-end test program."""
+    path = './tests/end2end/test_programs'
+    programs = []
+    for f in os.listdir(path):
+        with open(f'{path}/{f}') as file:
+            lines = file.readlines()
+        for i in range(0, len(lines), 3):
+            programs.append((lines[i].strip().split('#')[1], lines[i+1].strip().split('#')[1]))
+    return programs
+
+def generated_source(statements: int) -> str:
+    """Returns a program whose main function has about 26 instructions per statement,
+    each with a branch and a loop."""
+    parts = ['var s = read_int(); var i = 0;']
+    for k in range(statements):
+        parts.append(f'var v{k} = s + {k}; if v{k} > {3 * k} then {{ s = s + v{k} }} else {{ s = s - 1 }}; while i < {k} do {{ i = i + 1; s = s + i }};')
+    return ' '.join(parts) + ' print_int(s)'
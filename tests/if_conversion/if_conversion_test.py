@@ -0,0 +1,80 @@
+import os
+import subprocess
+from compiler.assembler import assemble
+from compiler.assembly_generator import generate_ns_assembly
+from compiler.if_conversion import if_convert, is_profitable
+from compiler.ir import Call, CondJump, Instruction, IRVar, LoadIntConst, Select
+from compiler.location import Location
+from compiler.optimizer import simplify
+from tests.helpers import compile, run
+
+import unittest
+
+def count(instructions: list[Instruction], cls: type) -> int:
+    return len([insn for insn in instructions if isinstance(insn, cls)])
+
+class IfConversionTest(unittest.TestCase):
+    def test_and_and_or_become_selects(self) -> None:
+        ns_ins = if_convert(compile('var a = read_int(); var b = read_int(); print_bool(a < 3 and b > 2 or a == 1)'))
+        assert count(ns_ins['main'], CondJump) == 0
+        assert count(ns_ins['main'], Select) == 2
+        for a, b, expected in [(1, 0, 'true'), (2, 3, 'true'), (2, 2, 'false'), (5, 3, 'false')]:
+            assert run(ns_ins, [a, b]) == f'{expected}\n'
+
+    def test_if_expressions_and_statements_become_selects(self) -> None:
+        source = '''
+            var a = read_int(); var b = read_int();
+            var m = if a < b then a else b;
+            if a > m then { m = a };
+            if m > 5 then m = 2 else { m = m + 1 };
+            print_int(m)
+        '''
+        ns_ins = if_convert(compile(source))
+        assert count(ns_ins['main'], CondJump) == 0
+        for a, b in [(1, 2), (7, 3), (4, 4), (9, 12)]:
+            assert run(ns_ins, [a, b]) == run(compile(source), [a, b])
+
+    def test_keeps_branches_with_side_effects(self) -> None:
+        for source in [
+            'var a = read_int(); if a > 0 then print_int(a)',
+            'var a = read_int(); var b = if a != 0 then 10 / a else 0; print_int(b)',
+            'var a = read_int(); var p = &a; var b = if a > 0 then *p else 0; print_int(b)',
+        ]:
+            ns_ins = compile(source)
+            assert count(if_convert(ns_ins)['main'], CondJump) == count(ns_ins['main'], CondJump), source
+
+    def test_keeps_branches_over_expensive_arms(self) -> None:
+        source = 'var a = read_int(); var b = if a > 0 then a*a*a*a*a + a*a*a*a + a*a*a else a; print_int(b)'
+        ns_ins = if_convert(compile(source))
+        assert count(ns_ins['main'], Select) == 0
+        assert run(ns_ins, [2]) == '56\n'
+
+    def test_cost_model(self) -> None:
+        location = Location('test', 0, 0)
+        def arm(size: int, fun: str = '+') -> list[Instruction]:
+            return [Call(location, IRVar(fun), [IRVar('a'), IRVar('a')], IRVar(f'x{i}')) for i in range(size)]
+        assert is_profitable(arm(1), arm(1), 1)
+        assert is_profitable(arm(10), [], 1)
+        assert not is_profitable(arm(8), arm(8), 1)
+        assert not is_profitable(arm(4, '*'), [LoadIntConst(location, 1, IRVar('y'))], 1)
+
+    def test_selects_run_natively(self) -> None:
+        source = '''
+            var i = 0; var lows = 0; var m = 0;
+            while i < 1000 do {
+                var v = (i * 7919) % 1000;
+                lows = lows + (if v > 100 and v < 500 then 1 else 0);
+                if v > m then { m = v };
+                i = i + 1;
+            }
+            print_int(lows); print_int(m);
+        '''
+        ns_ins = simplify(if_convert(compile(source)))
+        assembly = generate_ns_assembly(ns_ins)
+        assert 'cmovneq' in assembly and 'andq' in assembly
+        assemble(assembly, 'if_conversion_out')
+        try:
+            output = subprocess.run([f'{os.getcwd()}/if_conversion_out'], capture_output=True, text=True).stdout
+        finally:
+            os.remove('if_conversion_out')
+        assert output == run(compile(source))
@@ -0,0 +1,42 @@
+from compiler.inliner import bottom_up_order, call_graph, inline_functions, recursive_functions
+from compiler.optimizer import simplify
+from tests.helpers import compile, run
+
+import unittest
+
+class InlinerTest(unittest.TestCase):
+    def test_inlines_small_functions_at_every_call_site(self) -> None:
+        ns_ins = inline_functions(compile('fun double(x: Int): Int { x * 2 } print_int(double(read_int())); double(double(3))'))
+        assert list(ns_ins) == ['main']
+        assert run(ns_ins, [5]) == '10\n12\n'
+
+    def test_inlines_functions_calling_other_functions(self) -> None:
+        source = 'fun inc(x: Int): Int { x + 1 } fun twice(x: Int): Int { inc(inc(x)) } twice(read_int())'
+        ns_ins = inline_functions(compile(source))
+        assert list(ns_ins) == ['main']
+        assert run(simplify(ns_ins), [1]) == '3\n'
+
+    def test_does_not_inline_recursive_functions(self) -> None:
+        source = 'fun f(x: Int): Int { if x < 10 then f(x+1) else x } fun g(x: Int): Int { h(x) } fun h(x: Int): Int { if x > 0 then g(x-1) else 0 } f(1) + g(3)'
+        ns_ins = compile(source)
+        assert recursive_functions(call_graph(ns_ins)) == {'f', 'g', 'h'}
+        ns_ins = inline_functions(ns_ins)
+        assert 'f' in ns_ins
+        assert run(ns_ins) == '10\n'
+
+    def test_budget_limits_copies(self) -> None:
+        source = 'fun f(x: Int): Int { var y = x * x; var z = y + x; z * z - y } print_int(f(1)); print_int(f(2)); f(3)'
+        assert 'f' in inline_functions(compile(source), budget=10)
+        assert 'f' not in inline_functions(compile(source), budget=100)
+        assert 'f' in inline_functions(compile(source), budget=0)
+        assert run(inline_functions(compile(source), budget=100)) == run(compile(source))
+
+    def test_keeps_pointer_semantics(self) -> None:
+        source = 'fun square(p: Int*): Unit { *p = *p * *p; } var x: Int = 3; square(&x); print_int(x);'
+        ns_ins = inline_functions(compile(source))
+        assert list(ns_ins) == ['main']
+        assert run(ns_ins) == '9\n'
+
+    def test_callees_come_first(self) -> None:
+        graph = {'main': ['a', 'b'], 'a': ['b'], 'b': []}
+        assert bottom_up_order(graph) == ['b', 'a', 'main']
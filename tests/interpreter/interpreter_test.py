@@ -88,4 +88,14 @@ class InterpreterTest(unittest.TestCase):
         self.assertRaises(Exception, interpret_module, p('print_bool(true, 2)'), get_global_symbol_table())
 
     def test_func_fails_with_wrong_arg_amount2(self) -> None:
-        self.assertRaises(Exception, interpret_module, p('read_int(2)'), get_global_symbol_table())
\ No newline at end of file
+        self.assertRaises(Exception, interpret_module, p('read_int(2)'), get_global_symbol_table())
+
+    def test_interpret_function_call(self) -> None:
+        assert interpret_module(p('fun f(x: Int, y: Int): Int { x * y } f(3, 4)'), get_global_symbol_table()) == 12
+
+    def test_interpret_mutual_recursion(self) -> None:
+        assert interpret_module(p('fun even(n: Int): Bool { if n == 0 then true else odd(n-1) } fun odd(n: Int): Bool { if n == 0 then false else even(n-1) } even(10)'), get_global_symbol_table()) == True
+
+    def test_interpret_division_truncates(self) -> None:
+        assert interpret_module(p('-7 / 2'), get_global_symbol_table()) == -3
+        assert interpret_module(p('-7 % 2'), get_global_symbol_table()) == -1
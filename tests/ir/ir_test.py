@@ -0,0 +1,60 @@
+from compiler import ir
+from compiler.ir import Call, CondJump, Copy, CopyPointer, IRVar, Instruction, Jump, Label, LoadIntConst, LoadPointerParam, NameTable, ReturnValue, defs, map_defs, map_targets, map_uses, operand_info, targets, uses, variables
+from compiler.location import Location
+
+import unittest
+
+L = Location('', 0, 0)
+
+def v(name: str) -> IRVar:
+    return IRVar(name)
+
+class IRTest(unittest.TestCase):
+    def test_every_instruction_class_is_registered(self) -> None:
+        for value in vars(ir).values():
+            if isinstance(value, type) and issubclass(value, Instruction) and value is not Instruction:
+                assert value in operand_info, value
+
+    def test_operands(self) -> None:
+        call = Call(L, v('f'), [v('a'), v('b')], v('c'))
+        assert uses(call) == [v('a'), v('b')]
+        assert defs(call) == [v('c')]
+        assert targets(call) == []
+        assert variables(call) == [v('a'), v('b'), v('c')]
+
+    def test_copy_pointer_only_reads(self) -> None:
+        insn = CopyPointer(L, v('a'), v('p'))
+        assert uses(insn) == [v('a'), v('p')]
+        assert defs(insn) == []
+
+    def test_parameters_define_only_their_destination(self) -> None:
+        assert variables(LoadPointerParam(L, v('p'), v('x1'))) == [v('x1')]
+
+    def test_jump_targets(self) -> None:
+        insn = CondJump(L, v('c'), Label(L, 'then'), Label(L, 'else'))
+        assert uses(insn) == [v('c')]
+        assert targets(insn) == [Label(L, 'then'), Label(L, 'else')]
+        assert targets(Jump(L, Label(L, 'end'))) == [Label(L, 'end')]
+
+    def test_map_operands(self) -> None:
+        rename = lambda var: IRVar(var.name + "'")
+        call = Call(L, v('f'), [v('a')], v('c'))
+        assert map_uses(call, rename) == Call(L, v('f'), [v("a'")], v('c'))
+        assert map_defs(call, rename) == Call(L, v('f'), [v('a')], v("c'"))
+        assert map_uses(Copy(L, v('a'), v('b')), rename) == Copy(L, v("a'"), v('b'))
+        assert map_targets(Jump(L, Label(L, 'x')), lambda l: Label(L, 'y')) == Jump(L, Label(L, 'y'))
+
+    def test_name_table(self) -> None:
+        names = NameTable([
+            Label(L, 'start'),
+            LoadIntConst(L, 1, v('x1')),
+            Call(L, v('+'), [v('x1'), v('x1')], v('x2')),
+            ReturnValue(L, v('x2')),
+        ])
+        assert names.variables == [v('x1'), v('x2')]
+        assert names.var_id(v('x2')) == 1
+        assert names.labels == ['start']
+
+    def test_labels_compare_by_name(self) -> None:
+        assert Label(L, 'a') == Label(Location('', 1, 2), 'a')
+        assert len({Label(L, 'a'), Label(Location('', 1, 2), 'a')}) == 1
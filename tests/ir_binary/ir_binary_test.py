@@ -0,0 +1,71 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from compiler.assembly_generator import generate_assembly
+from compiler.ir import IRVar, Jump, Label, LoadIntConst
+from compiler.ir_binary import IRFile, IRFormatError, read_ir_file, write_ir_file
+from compiler.location import Location
+from compiler.ssa import to_ssa
+from compiler.switch_lowering import lower_switches
+from tests.helpers import compile, read_programs
+
+import unittest
+
+def function_assembly(path: str, name: str) -> str:
+    with IRFile(path) as file:
+        return generate_assembly(name, file.load(name))
+
+class IRBinaryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'program.irb')
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_programs_round_trip(self) -> None:
+        for source, _ in read_programs():
+            for ns_ins in [compile(source), to_ssa(compile(source)), lower_switches(compile(source))]:
+                write_ir_file(self.path, ns_ins)
+                assert read_ir_file(self.path) == ns_ins, source
+
+    def test_round_trips_extreme_constants_and_locations(self) -> None:
+        ns_ins = compile('var x = 9223372036854775807; var y = -9223372036854775807 - 1; print_bool(x > y); x')
+        write_ir_file(self.path, ns_ins)
+        loaded = read_ir_file(self.path)
+        assert loaded == ns_ins
+        assert [insn.location for insn in loaded['main']] == [insn.location for insn in ns_ins['main']]
+
+    def test_label_operands_keep_their_own_locations(self) -> None:
+        end = Label(Location('labels', 7, 8), 'end')
+        write_ir_file(self.path, {'main': [Jump(Location('jumps', 3, 4), end), end]})
+        jump, label = read_ir_file(self.path)['main']
+        assert isinstance(jump, Jump)
+        assert jump.label.location == Location('labels', 7, 8)
+        assert label.location == Location('labels', 7, 8)
+
+    def test_rejects_constants_wider_than_64_bits(self) -> None:
+        for value in [2**63, -2**63 - 1]:
+            with self.assertRaises(IRFormatError):
+                write_ir_file(self.path, {'main': [LoadIntConst(Location('wide', 1, 1), value, IRVar('x'))]})
+
+    def test_loads_single_functions(self) -> None:
+        ns_ins = compile('fun f(x: Int): Int { x + 1 } fun g(b: Bool): Bool { not b } print_bool(g(true)); f(1)')
+        write_ir_file(self.path, ns_ins)
+        with IRFile(self.path) as file:
+            assert file.functions() == ['main', 'f', 'g']
+            assert file.load('g') == ns_ins['g']
+
+    def test_functions_load_in_worker_processes(self) -> None:
+        ns_ins = compile('fun f(x: Int): Int { x + 1 } fun g(b: Bool): Bool { not b } print_bool(g(true)); f(1)')
+        write_ir_file(self.path, ns_ins)
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            assembly = list(pool.map(function_assembly, [self.path] * len(ns_ins), list(ns_ins)))
+        assert assembly == [generate_assembly(name, instructions) for name, instructions in ns_ins.items()]
+
+    def test_rejects_other_files(self) -> None:
+        for content in [b'', b'INIR', b'not an IR file at all, just some text']:
+            with open(self.path, 'wb') as file:
+                file.write(content)
+            with self.assertRaises(IRFormatError):
+                read_ir_file(self.path)
@@ -0,0 +1,37 @@
+from compiler.ir_interpreter import IRExecutionError, IRInterpreter, InputRequired, StepBudgetExceeded, wrap
+from tests.helpers import compile, read_programs
+
+import unittest
+
+def run(source: str, inputs: list[int] = [], budget: int = 100_000) -> str:
+    values = iter(inputs)
+    interpreter = IRInterpreter(compile(source), budget, read_int=lambda: next(values))
+    interpreter.run()
+    return interpreter.output_text()
+
+class IRInterpreterTest(unittest.TestCase):
+    def test_end_to_end_programs(self) -> None:
+        for source, expected in read_programs():
+            assert run(source).strip() == expected, source
+
+    def test_wraps_like_64_bit_integers(self) -> None:
+        assert run('9223372036854775807 + 1') == '-9223372036854775808\n'
+        assert wrap(2**64 + 5) == 5
+
+    def test_division_rounds_toward_zero(self) -> None:
+        assert run('print_int(-7 / 2); print_int(-7 % 2); print_int(7 % -2)') == '-3\n-1\n1\n'
+
+    def test_division_by_zero_fails(self) -> None:
+        self.assertRaises(IRExecutionError, run, 'var x = 0; 1 / x')
+
+    def test_read_int(self) -> None:
+        assert run('read_int() * 2', inputs=[21]) == '42\n'
+
+    def test_read_int_without_input(self) -> None:
+        self.assertRaises(InputRequired, IRInterpreter(compile('read_int()')).run)
+
+    def test_pointers(self) -> None:
+        assert run('fun square(p: Int*): Unit { *p = *p * *p; } var x: Int = 3; square(&x); print_int(x);') == '9\n'
+
+    def test_budget(self) -> None:
+        self.assertRaises(StepBudgetExceeded, run, 'while true do { 1 }', budget=1000)
@@ -0,0 +1,47 @@
+from compiler.cfg import ControlFlowGraph, immediate_dominators
+from compiler.ir import Call, Instruction, Label
+from compiler.loop_invariants import hoist_loop_invariants
+from compiler.loops import natural_loops
+from compiler.optimizer import simplify
+from tests.helpers import compile, run
+
+import unittest
+
+def position(instructions: list[Instruction], fun: str) -> int:
+    return next(i for i, insn in enumerate(instructions) if isinstance(insn, Call) and insn.fun.name == fun)
+
+def label(instructions: list[Instruction], name: str) -> int:
+    return next(i for i, insn in enumerate(instructions) if isinstance(insn, Label) and insn.name == name)
+
+class LoopInvariantsTest(unittest.TestCase):
+    def test_finds_nested_loops_inner_first(self) -> None:
+        instructions = compile('var i = 0; while i < 3 do { var j = 0; while j < 3 do { if j == 1 then continue; j = j + 1 }; i = i + 1 }; i')['main']
+        cfg = ControlFlowGraph(instructions)
+        loops = natural_loops(cfg, immediate_dominators(cfg))
+        assert [cfg.labels[loop.header].name for loop in loops] == ['while_start2', 'while_start1'] # type: ignore[union-attr]
+        assert loops[0].blocks < loops[1].blocks
+        assert len(loops[0].latches) == 2
+
+    def test_hoists_out_of_nested_loops(self) -> None:
+        source = 'var a = read_int(); var s = 0; var i = 0; while i < 10 do { var j = 0; while j < 3 do { s = s + a * 2; j = j + 1 }; i = i + 1 }; s'
+        ns_ins = simplify(hoist_loop_invariants(compile(source)))
+        assert position(ns_ins['main'], '*') < label(ns_ins['main'], 'while_start1')
+        assert run(ns_ins, [5]) == '300\n'
+
+    def test_keeps_loads_when_the_loop_writes_memory(self) -> None:
+        source = 'var x = 1; var p = &x; var s = 0; var i = 0; while i < 3 do { s = s + *p; *p = *p + 1; i = i + 1 }; s'
+        ns_ins = hoist_loop_invariants(compile(source))
+        assert position(ns_ins['main'], 'unary_*') > label(ns_ins['main'], 'while_start1')
+        assert run(ns_ins) == '6\n'
+
+    def test_hoists_loads_when_memory_does_not_change(self) -> None:
+        source = 'var x = 4; var p = &x; var s = 0; var i = 0; while i < 3 do { s = s + *p; i = i + 1 }; s'
+        ns_ins = hoist_loop_invariants(compile(source))
+        assert position(ns_ins['main'], 'unary_*') < label(ns_ins['main'], 'while_start1')
+        assert run(ns_ins) == '12\n'
+
+    def test_does_not_hoist_division_that_may_trap(self) -> None:
+        source = 'var d = read_int(); var s = 0; while s > 0 do { s = 100 / d }; s'
+        ns_ins = hoist_loop_invariants(compile(source))
+        assert position(ns_ins['main'], '/') > label(ns_ins['main'], 'while_start1')
+        assert run(ns_ins, [0]) == '0\n'
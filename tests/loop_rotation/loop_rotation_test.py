@@ -0,0 +1,61 @@
+from typing import Dict
+from compiler.ir import CondJump, Instruction, Jump, Label
+from compiler.ir_interpreter import IRInterpreter
+from compiler.loop_rotation import rotate_loops
+from compiler.optimizer import simplify
+from tests.helpers import compile
+
+import unittest
+
+def run(ns_ins: Dict[str, list[Instruction]], inputs: list[int] = []) -> tuple[str, int]:
+    values = iter(inputs)
+    interpreter = IRInterpreter(ns_ins, read_int=lambda: next(values))
+    interpreter.run()
+    return interpreter.output_text(), interpreter.steps
+
+def back_jumps(instructions: list[Instruction]) -> int:
+    return len([insn for insn in instructions if isinstance(insn, Jump) and insn.label.name.startswith('while_start')])
+
+class LoopRotationTest(unittest.TestCase):
+    def test_loops_test_their_condition_at_the_bottom(self) -> None:
+        source = 'var n = read_int(); var i = 0; var s = 0; while i < n do { s = s + i; i = i + 1 }; print_int(s)'
+        ns_ins = simplify(compile(source))
+        rotated = simplify(rotate_loops(ns_ins))
+        instructions = rotated['main']
+        assert back_jumps(instructions) == 0
+        end = next(i for i, insn in enumerate(instructions) if isinstance(insn, Label) and insn.name == 'while_end1')
+        assert isinstance(instructions[end-1], CondJump)
+        for n in [0, 1, 10]:
+            output, steps = run(rotated, [n])
+            expected, expected_steps = run(ns_ins, [n])
+            assert output == expected
+            assert steps <= expected_steps - n
+
+    def test_continue_and_break_reach_the_condition_and_exit(self) -> None:
+        source = '''
+            var n = read_int(); var i = 0; var s = 0;
+            while i < n do {
+                i = i + 1;
+                if i % 3 == 0 then continue;
+                var j = 0;
+                while j < i do { j = j + 1; if j > 4 then break; s = s + j }
+                if s > 200 then break;
+            }
+            print_int(i); print_int(s);
+        '''
+        ns_ins = rotate_loops(compile(source))
+        assert back_jumps(ns_ins['main']) == 1
+        for n in [0, 1, 3, 8, 50]:
+            assert run(ns_ins, [n])[0] == run(compile(source), [n])[0], n
+
+    def test_conditions_with_side_effects_run_as_often_as_before(self) -> None:
+        source = 'var s = 0; while read_int() > 0 do s = s + 1; print_int(s)'
+        ns_ins = rotate_loops(compile(source))
+        assert back_jumps(ns_ins['main']) == 0
+        assert run(ns_ins, [3, 1, 2, 0, 5])[0] == '3\n'
+        assert run(ns_ins, [0, 5])[0] == '0\n'
+
+    def test_keeps_loops_with_branching_conditions(self) -> None:
+        source = 'var i = 0; while i < 10 and i != 5 do i = i + 1; print_int(i)'
+        ns_ins = compile(source)
+        assert rotate_loops(ns_ins) == ns_ins
@@ -0,0 +1,64 @@
+from typing import Dict
+from compiler.dead_code import eliminate_dead_code, remove_unreachable_blocks
+from compiler.ir import Call, CondJump, Copy, Instruction
+from compiler.optimizer import optimize, simplify
+from compiler.propagation import propagate_constants, propagate_copies
+from tests.helpers import compile, run
+
+import unittest
+
+def count(ns_ins: Dict[str, list[Instruction]], kind: type) -> int:
+    return len([insn for instructions in ns_ins.values() for insn in instructions if isinstance(insn, kind)])
+
+class OptimizerTest(unittest.TestCase):
+    def test_folds_constant_arithmetic(self) -> None:
+        ns_ins = simplify(compile('var x = 2; var y = x * 3 + 1; y'))
+        assert count(ns_ins, Call) == 1
+        assert run(ns_ins) == '7\n'
+
+    def test_folds_known_conditions(self) -> None:
+        ns_ins = simplify(compile('var x = 1; if x > 0 then print_int(1) else print_int(2); 0'))
+        assert count(ns_ins, CondJump) == 0
+        assert run(ns_ins) == '1\n0\n'
+
+    def test_loop_variables_are_not_constant(self) -> None:
+        ns_ins = simplify(compile('var i = 0; while i < 3 do { i = i + 1 }; i'))
+        assert count(ns_ins, CondJump) == 1
+        assert run(ns_ins) == '3\n'
+
+    def test_propagates_copies(self) -> None:
+        ns_ins = eliminate_dead_code(propagate_copies(compile('var x = read_int(); var y = x; var z = y; z')))
+        assert count(ns_ins, Copy) == 2
+        assert run(ns_ins, [5]) == '5\n'
+        ns_ins = simplify(compile('var x = read_int(); var y = x; var z = y; z'))
+        assert count(ns_ins, Copy) == 0
+        assert run(ns_ins, [5]) == '5\n'
+
+    def test_does_not_propagate_through_pointers(self) -> None:
+        ns_ins = simplify(compile('var x = 1; var p = &x; *p = 2; x'))
+        assert run(ns_ins) == '2\n'
+
+    def test_keeps_division_by_zero(self) -> None:
+        ns_ins = simplify(compile('var x = 0; 1 / x; 2'))
+        assert any(isinstance(insn, Call) and insn.fun.name == '/' for insn in ns_ins['main'])
+
+    def test_removes_unreachable_blocks(self) -> None:
+        ns_ins = remove_unreachable_blocks(propagate_constants(compile('if true then 1 else 2')))
+        assert run(ns_ins) == '1\n'
+        assert count(ns_ins, Instruction) < count(compile('if true then 1 else 2'), Instruction)
+
+    def test_does_not_propagate_copies_past_redefinitions_in_loops(self) -> None:
+        # `v1` is read again after the copy into `v7`, on the path back to the use of `v7`
+        source = '''
+            var v1 = read_int(); var i6 = 0;
+            while i6 != 2 do {
+                var v7 = v1; var i8 = 0;
+                while i8 < 3 do { i8 = i8 + 1; print_int(v7); v1 = read_int(); };
+                i6 = i6 + 1
+            };
+            0
+        '''
+        inputs = [1, 2, 3, 4, 5, 6, 7]
+        assert run(compile(source), inputs) == '1\n1\n1\n4\n4\n4\n0\n'
+        assert run(simplify(compile(source)), inputs) == '1\n1\n1\n4\n4\n4\n0\n'
+        assert run(optimize(compile(source), 1), inputs) == '1\n1\n1\n4\n4\n4\n0\n'
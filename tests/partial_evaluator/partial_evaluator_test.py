@@ -0,0 +1,66 @@
+from typing import Dict
+from compiler.ir import Call, Instruction, LoadBoolConst, LoadIntConst, generate_root_var_types
+from compiler.ir_generator import generate_ir
+from compiler.ir_interpreter import IRInterpreter
+from compiler.parser import parse
+from compiler.partial_evaluator import evaluate_calls, partially_evaluate, pure_functions
+from compiler.tokenizer import tokenize
+from compiler.type_checker import typecheck_module
+from compiler.types import get_global_symbol_table_types
+
+import unittest
+
+def ir(source: str) -> Dict[str, list[Instruction]]:
+    module = parse(tokenize(source))
+    typecheck_module(module, get_global_symbol_table_types())
+    return generate_ir(generate_root_var_types(), module)
+
+def calls(instructions: list[Instruction]) -> list[str]:
+    return [insn.fun.name for insn in instructions if isinstance(insn, Call)]
+
+class PartialEvaluatorTest(unittest.TestCase):
+    def test_pure_functions(self) -> None:
+        ns_ins = ir('fun f(x: Int): Int { x+1 } fun g(x: Int): Int { print_int(x); x } fun h(x: Int): Int { g(x) } fun k(p: Int*): Int { *p } 1')
+        assert pure_functions(ns_ins) == {'f'}
+
+    def test_call_with_constant_arguments_is_folded(self) -> None:
+        ns_ins = evaluate_calls(ir('fun f(x: Int, y: Int): Int { x*y+1 } print_int(f(10, 20) + read_int())'))
+        assert 'f' not in calls(ns_ins['main'])
+        assert any(isinstance(insn, LoadIntConst) and insn.value == 201 for insn in ns_ins['main'])
+
+    def test_bool_call_is_folded(self) -> None:
+        ns_ins = evaluate_calls(ir('fun even(x: Int): Bool { x % 2 == 0 } print_bool(even(4) and read_int() > 0)'))
+        assert 'even' not in calls(ns_ins['main'])
+        assert any(isinstance(insn, LoadBoolConst) and insn.value is True for insn in ns_ins['main'])
+
+    def test_nested_calls_are_folded(self) -> None:
+        ns_ins = evaluate_calls(ir('fun f(x: Int): Int { x*2 } var y = f(f(f(1))); print_int(y + read_int())'))
+        assert 'f' not in calls(ns_ins['main'])
+
+    def test_call_with_unknown_argument_is_kept(self) -> None:
+        ns_ins = evaluate_calls(ir('fun f(x: Int): Int { x*2 } f(read_int())'))
+        assert 'f' in calls(ns_ins['main'])
+
+    def test_reassigned_argument_is_kept(self) -> None:
+        ns_ins = evaluate_calls(ir('fun f(x: Int): Int { x*2 } var a = 1; if read_int() > 0 then a = 2; f(a)'))
+        assert 'f' in calls(ns_ins['main'])
+
+    def test_failing_call_is_kept(self) -> None:
+        ns_ins = evaluate_calls(ir('fun f(x: Int): Int { 10 / x } if read_int() > 0 then f(0) else 1'))
+        assert 'f' in calls(ns_ins['main'])
+
+    def test_non_terminating_call_is_kept(self) -> None:
+        ns_ins = evaluate_calls(ir('fun f(x: Int): Int { while true do { x = x + 1 }; x } if read_int() > 0 then f(0) else 1'), budget=1000)
+        assert 'f' in calls(ns_ins['main'])
+
+    def test_program_without_input_collapses_to_output(self) -> None:
+        ns_ins = partially_evaluate(ir('fun fib(n: Int): Int { if n < 2 then n else fib(n-1) + fib(n-2) } var i = 0; while i < 10 do { print_int(fib(i)); i = i + 1 }; i > 5'))
+        assert list(ns_ins.keys()) == ['main']
+        assert calls(ns_ins['main']) == ['print_int'] * 10 + ['print_bool']
+        interpreter = IRInterpreter(ns_ins)
+        interpreter.run()
+        assert interpreter.output_text() == '0\n1\n1\n2\n3\n5\n8\n13\n21\n34\ntrue\n'
+
+    def test_program_with_input_is_not_collapsed(self) -> None:
+        ns_ins = partially_evaluate(ir('fun f(x: Int): Int { x+1 } print_int(f(1)); print_int(read_int())'))
+        assert calls(ns_ins['main']) == ['print_int', 'read_int', 'print_int']
@@ -0,0 +1,62 @@
+import io
+from typing import Dict
+from compiler.ir import Instruction, IRVar, LoadIntConst
+from compiler.optimizer import pipeline
+from compiler.pass_manager import AnalysisManager, Pass, PassManager, Repeat
+from tests.helpers import compile, run
+
+import unittest
+
+def add_constant(ns_ins: Dict[str, list[Instruction]], _: AnalysisManager) -> Dict[str, list[Instruction]]:
+    main = ns_ins['main']
+    return {**ns_ins, 'main': [main[0], LoadIntConst(main[0].location, 1, IRVar('extra')), *main[1:]]}
+
+class PassManagerTest(unittest.TestCase):
+    def test_analyses_are_cached_until_invalidated(self) -> None:
+        seen: list[object] = []
+        def read_cfg(ns_ins: Dict[str, list[Instruction]], analyses: AnalysisManager) -> Dict[str, list[Instruction]]:
+            seen.append(analyses.get('cfg', 'main'))
+            seen.append(analyses.get('dominators', 'main'))
+            return ns_ins
+        reader = Pass('read', read_cfg, requires=('cfg', 'dominators'))
+
+        PassManager([reader, reader, Pass('keep', add_constant, invalidates=('liveness',)), reader, Pass('change', add_constant, invalidates=('cfg',)), reader]).run(compile('1 + 2'))
+        assert seen[0] is seen[2] and seen[1] is seen[3]
+        assert seen[2] is seen[4] and seen[3] is seen[5]
+        # Dominators are computed from the CFG, so they go stale with it
+        assert seen[4] is not seen[6] and seen[5] is not seen[7]
+
+    def test_unchanged_program_keeps_analyses(self) -> None:
+        seen: list[object] = []
+        def read(ns_ins: Dict[str, list[Instruction]], analyses: AnalysisManager) -> Dict[str, list[Instruction]]:
+            seen.append(analyses.get('reaching_definitions'))
+            return dict(ns_ins)
+        PassManager([Pass('read', read, requires=('reaching_definitions',))] * 2).run(compile('var x = 1; x'))
+        assert seen[0] is seen[1]
+
+    def test_repeat_stops_when_nothing_changes(self) -> None:
+        rounds: list[int] = []
+        def shrink(ns_ins: Dict[str, list[Instruction]], _: AnalysisManager) -> Dict[str, list[Instruction]]:
+            rounds.append(len(ns_ins['main']))
+            return {'main': ns_ins['main'][:3]}
+        PassManager([Repeat('shrink', [Pass('shrink', shrink)], 10)]).run(compile('var x = 1; var y = 2; x + y'))
+        assert len(rounds) == 2
+
+    def test_reports_time_and_size_of_every_pass(self) -> None:
+        manager = PassManager(pipeline(1))
+        ns_ins = manager.run(compile('var x = 1; var y = x + 2; print_int(y); y * 2'))
+        assert run(ns_ins) == '3\n6\n'
+        names = [timing.name for timing in manager.timings]
+        assert names[0] == 'promote_variables' and names[-1] == 'simplify_control_flow'
+        assert manager.timings[-1].size_after == sum(len(instructions) for instructions in ns_ins.values())
+        output = io.StringIO()
+        manager.report(output)
+        lines = output.getvalue().splitlines()
+        assert len(lines) == len(manager.timings) + 2
+        assert lines[-1].startswith('Total')
+
+    def test_levels(self) -> None:
+        assert pipeline(0) == []
+        o1, o2 = [[p.name for p in pipeline(level)] for level in [1, 2]]
+        assert 'inline_functions' not in o1
+        assert 'inline_functions' in o2 and set(o1) <= set(o2)
@@ -0,0 +1,78 @@
+from compiler.ir import Call, CondJump, Copy, Instruction, IRVar, Jump
+from compiler.optimizer import simplify
+from compiler.ranges import INT_MAX, INT_MIN, TOP, Bounds, add, bounds, compare, fold_ranges, multiply, remainder, value_ranges
+from tests.helpers import compile, generated_source, run
+
+import unittest
+
+def calls(instructions: list[Instruction], name: str) -> int:
+    return len([insn for insn in instructions if isinstance(insn, Call) and insn.fun.name == name])
+
+class RangesTest(unittest.TestCase):
+    def test_checks_implied_by_earlier_branches_are_removed(self) -> None:
+        source = 'var x = read_int(); if x > 10 then { if x > 5 then print_int(1) else print_int(2) } else { if x <= 10 then print_int(3) }'
+        ns_ins = simplify(fold_ranges(compile(source)))
+        assert len([insn for insn in ns_ins['main'] if isinstance(insn, CondJump)]) == 1
+        assert calls(ns_ins['main'], 'print_int') == 2
+        for x, expected in [(11, '1\n'), (10, '3\n'), (-5, '3\n')]:
+            assert run(ns_ins, [x]) == expected
+
+    def test_loop_counters_are_bounded_by_the_condition(self) -> None:
+        ns_ins = compile('var i = 0; while i < 10 do { print_int(i % 16); print_bool(i >= 0); i = i + 1; }')
+        instructions = ns_ins['main']
+        ranges = value_ranges(instructions)
+        mod = next(i for i, insn in enumerate(instructions) if isinstance(insn, Call) and insn.fun.name == '%')
+        assert ranges.bounds_of(mod, IRVar('x2')) == Bounds(0, 9)
+        folded = fold_ranges(ns_ins)
+        assert calls(folded['main'], '%') == 0 and calls(folded['main'], '>=') == 0
+        assert run(folded) == run(ns_ins)
+
+    def test_known_low_bits_decide_parity(self) -> None:
+        source = 'var x = read_int(); print_bool((x * 4 + 1) % 2 != 0); print_bool(x * 2 == 7); print_int((x * 8) % 4)'
+        ns_ins = fold_ranges(compile(source))
+        assert calls(ns_ins['main'], '!=') == 0 and calls(ns_ins['main'], '==') == 0
+        # The remainder of 4x + 1 is 1 or -1 depending on the sign of x
+        assert calls(ns_ins['main'], '%') == 1
+        assert run(ns_ins, [-3]) == 'true\nfalse\n0\n'
+
+    def test_division_by_positive_divisors(self) -> None:
+        source = '''
+            var x = read_int();
+            if x >= 0 then { if x < 100 then { print_int(x / 100); print_int(x % 100) } };
+            if x > -5 then { if x < 5 then print_int(x % 8) };
+            if x < 0 then print_int(x % 8);
+        '''
+        ns_ins = fold_ranges(compile(source))
+        assert calls(ns_ins['main'], '/') == 0
+        # Only the remainder of an unbounded negative dividend is left
+        assert calls(ns_ins['main'], '%') == 1
+        assert any(isinstance(insn, Copy) and insn.source == IRVar('x2') for insn in ns_ins['main'])
+        for x in [0, 3, 99, -4, -13, 150]:
+            assert run(ns_ins, [x]) == run(compile(source), [x])
+
+    def test_leaves_unknown_outcomes(self) -> None:
+        source = 'var x = read_int(); if x % 16 > 3 then print_int(x / 3) else print_int(x)'
+        ns_ins = compile(source)
+        assert fold_ranges(ns_ins) == ns_ins
+
+    def test_large_functions(self) -> None:
+        ns_ins = simplify(compile(generated_source(400)))
+        assert len(ns_ins['main']) > 10000
+        ranges = value_ranges(ns_ins['main'])
+        assert ranges.visits <= 2 * len(ranges.blocks)
+        # Block inputs keep only the few variables live across statements, not all of them
+        assert max(len(state) for state in ranges.inp.values() if state is not None) <= 4
+        assert run(fold_ranges(ns_ins), [5]) == run(ns_ins, [5])
+
+    def test_bounds_arithmetic(self) -> None:
+        one = bounds(1, 1)
+        # Overflow wraps around, but the low bits stay known
+        wrapped = add(Bounds(INT_MAX - 1, INT_MAX, 1, 0), bounds(2, 2))
+        assert (wrapped.low, wrapped.high, wrapped.known, wrapped.bits) == (INT_MIN, INT_MAX - 1, 1, 0)
+        assert multiply(Bounds(-3, 5), bounds(-2, -2)) == Bounds(-10, 6, 1, 0)
+        # Remainders take the sign of the dividend
+        assert remainder(Bounds(-20, -1), bounds(7, 7)) == Bounds(-6, 0)
+        assert remainder(Bounds(-20, 20), bounds(7, 7)) == Bounds(-6, 6)
+        assert compare('<', Bounds(0, 9), bounds(10, 10)) == one
+        assert compare('==', Bounds(0, 100, 1, 1), bounds(50, 50)).constant() == 0
+        assert compare('!=', TOP, bounds(3, 3)) == Bounds(0, 1)
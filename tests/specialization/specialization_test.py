@@ -0,0 +1,66 @@
+import os
+import subprocess
+from typing import Dict
+from compiler.assembler import assemble
+from compiler.assembly_generator import generate_ns_assembly
+from compiler.ir import Call, CondJump, Instruction, LoadBoolParam, LoadIntParam
+from compiler.optimizer import optimize, simplify
+from compiler.specialization import specialize_functions
+from tests.helpers import compile, run
+
+import unittest
+
+def params(instructions: list[Instruction]) -> int:
+    return len([insn for insn in instructions if isinstance(insn, (LoadIntParam, LoadBoolParam))])
+
+def callees(ns_ins: Dict[str, list[Instruction]], name: str) -> list[str]:
+    return [insn.fun.name for insn in ns_ins[name] if isinstance(insn, Call) and insn.fun.name in ns_ins]
+
+class SpecializationTest(unittest.TestCase):
+    def test_propagates_arguments_all_calls_agree_on(self) -> None:
+        source = 'fun f(x: Int, verbose: Bool): Int { if verbose then print_int(x); x * 2 } print_int(f(read_int(), false)); f(read_int(), false)'
+        ns_ins = simplify(specialize_functions(compile(source)))
+        assert params(ns_ins['f']) == 1
+        assert not any(isinstance(insn, CondJump) for insn in ns_ins['f'])
+        assert run(ns_ins, [1, 2]) == '2\n4\n'
+
+    def test_clones_functions_for_constant_arguments(self) -> None:
+        source = 'fun f(x: Int, verbose: Bool): Int { if verbose then print_int(x); x * 2 } print_int(f(read_int(), true)); print_int(f(read_int(), false)); f(read_int(), read_int() > 0)'
+        ns_ins = specialize_functions(compile(source))
+        assert callees(ns_ins, 'main') == ['f.constprop.1', 'f.constprop.2', 'f']
+        assert params(ns_ins['f.constprop.1']) == 1
+        assert run(simplify(ns_ins), [1, 2, 3, 1]) == '1\n2\n4\n3\n6\n'
+
+    def test_drops_original_when_all_calls_go_to_clones(self) -> None:
+        source = 'fun f(x: Int, up: Bool): Int { if up then x + 1 else x - 1 } print_int(f(read_int(), true)); f(read_int(), false)'
+        ns_ins = specialize_functions(compile(source))
+        assert 'f' not in ns_ins
+        assert run(ns_ins, [5, 5]) == '6\n4\n'
+
+    def test_recursive_calls_go_to_the_clone(self) -> None:
+        source = 'fun g(n: Int, up: Bool): Int { if n == 0 then 0 else if up then g(n - 1, up) + 1 else g(n - 1, up) - 1 } print_int(g(read_int(), true)); g(read_int(), false)'
+        ns_ins = specialize_functions(compile(source))
+        assert 'g' not in ns_ins
+        for name in ns_ins:
+            if name != 'main':
+                assert set(callees(ns_ins, name)) == {name}
+        assert run(ns_ins, [3, 4]) == '3\n-4\n'
+
+    def test_keeps_originals_that_clones_call(self) -> None:
+        # `g` is kept although main does not call it, and its clone of `f` recurses into `f`
+        source = 'fun f(a: Int, b: Int): Int { if a <= 0 then b else f(a - 1, b * 2) + 1 } fun g(x: Int): Int { f(x, 12) } print_int(read_int())'
+        ns_ins = specialize_functions(compile(source))
+        assert 'f.constprop.1' in ns_ins and 'f' in callees(ns_ins, 'f.constprop.1')
+        assert 'f' in ns_ins
+        assemble(generate_ns_assembly(optimize(compile(source), 2)), 'specialization_out')
+        try:
+            output = subprocess.run([f'{os.getcwd()}/specialization_out'], input='7\n', capture_output=True, text=True).stdout
+        finally:
+            os.remove('specialization_out')
+        assert output == '7\n'
+
+    def test_clones_are_not_reused_after_parameters_shift(self) -> None:
+        # After `g` is specialized its call to `h` matches a clone made for different positions
+        source = 'fun f(a: Int): Int { print_int(h(2, 1, a)); h(2, 1, 3) } fun g(b: Int): Int { h(1, b, 3) } fun h(x: Int, y: Int, z: Int): Int { x * 100 + y * 10 + z } print_int(f(read_int())); print_int(g(2)); print_int(h(read_int(), 1, 1))'
+        ns_ins = compile(source)
+        assert run(specialize_functions(ns_ins), [7, 7]) == run(ns_ins, [7, 7]) == '217\n213\n123\n711\n'
@@ -0,0 +1,70 @@
+from compiler.cfg import ControlFlowGraph, dominance_frontiers, immediate_dominators
+from compiler.ir import IRVar, Phi, defs
+from compiler.pass_manager import AnalysisManager
+from compiler.ssa import from_ssa, is_normal, sequentialize, to_ssa
+from compiler.value_numbering import number_values
+from tests.helpers import compile, read_programs, run
+
+import unittest
+
+class SSATest(unittest.TestCase):
+    def test_every_variable_is_assigned_once(self) -> None:
+        for source, _ in read_programs():
+            for name, instructions in to_ssa(compile(source)).items():
+                assigned = [var for insn in instructions for var in defs(insn)]
+                assert len(assigned) == len(set(assigned)), (source, name)
+
+    def test_ssa_form_runs_like_the_original(self) -> None:
+        for source, expected in read_programs():
+            ssa = to_ssa(compile(source))
+            assert run(ssa).strip() == expected, source
+            assert run(from_ssa(ssa)).strip() == expected, source
+
+    def test_loop_variable_gets_a_phi(self) -> None:
+        ssa = to_ssa(compile('var i = 0; while i < 10 do { i = i + 1 }; print_int(i)'))
+        phis = [insn for insn in ssa['main'] if isinstance(insn, Phi)]
+        assert len(phis) == 1
+        assert len(phis[0].sources) == 2
+
+    def test_phis_disappear(self) -> None:
+        ns_ins = from_ssa(to_ssa(compile('var x = 1; if read_int() > 0 then x = 2 else x = 3; print_int(x)')))
+        assert not any(isinstance(insn, Phi) for insn in ns_ins['main'])
+
+    def test_address_taken_variables_keep_their_names(self) -> None:
+        ssa = to_ssa(compile('var x = 1; var p = &x; x = 2; print_int(*p)'))
+        assigned = [var for insn in ssa['main'] for var in defs(insn)]
+        assert any(assigned.count(var) == 2 for var in assigned)
+        assert run(ssa) == '2\n'
+
+    def test_reuses_analyses_of_normal_functions(self) -> None:
+        ns_ins = compile('var i = 0; while i < 10 do { if i % 3 == 0 then print_int(i); i = i + 1 }; print_int(i)')
+        analyses = AnalysisManager(ns_ins)
+        cfg = analyses.get('cfg', 'main')
+        assert is_normal(cfg)
+        assert to_ssa(ns_ins, analyses) == to_ssa(ns_ins)
+        assert analyses.get('cfg', 'main') is cfg
+        assert ('dominators', 'main') in analyses.cache and ('liveness', 'main') in analyses.cache
+
+    def test_undefined_phi_sources_keep_their_names(self) -> None:
+        # Value numbering replaces copies of `unit` by `unit` itself
+        source = 'var u = if read_int() > 0 then { 1; } else { print_int(2) }; print_int(3)'
+        ssa = {name: number_values(instructions) for name, instructions in to_ssa(compile(source)).items()}
+        assert any(isinstance(insn, Phi) and IRVar('unit') in insn.sources for insn in ssa['main'])
+        for value, expected in [(1, '3\n'), (0, '2\n3\n')]:
+            assert run(from_ssa(ssa), [value]) == expected
+
+    def test_sequentialize_breaks_cycles(self) -> None:
+        a, b, c, t = IRVar('a'), IRVar('b'), IRVar('c'), IRVar('t')
+        copies = sequentialize([(a, b), (b, a), (c, a)], lambda: t)
+        values = {a: 1, b: 2, c: 3, t: 0}
+        for dest, source in copies:
+            values[dest] = values[source]
+        assert (values[a], values[b], values[c]) == (2, 1, 1)
+
+    def test_dominance_frontier_of_branches_is_the_join(self) -> None:
+        cfg = ControlFlowGraph(compile('if read_int() > 0 then print_int(1) else print_int(2); print_int(3)')['main'])
+        frontiers = dominance_frontiers(cfg, immediate_dominators(cfg))
+        join = [b for b, preds in enumerate(cfg.predecessors) if len(preds) == 2]
+        assert len(join) == 1
+        assert frontiers[0] == set()
+        assert all(frontiers[p] == {join[0]} for p in cfg.predecessors[join[0]])
@@ -0,0 +1,184 @@
+import os
+import re
+import subprocess
+from compiler.assembler import assemble
+from compiler.assembly_generator import generate_ns_assembly
+from compiler.intrinsics import IntrinsicArgs, all_intrinsics, magic_numbers
+from compiler.ir import generate_root_var_types
+from compiler.ir_generator import generate_ir
+from compiler.ir_interpreter import wrap
+from compiler.parser import parse
+from compiler.tokenizer import tokenize
+from compiler.type_checker import typecheck_module
+from compiler.types import get_global_symbol_table_types, truncating_division
+
+import unittest
+
+INT_MIN = -2**63
+INT_MAX = 2**63 - 1
+
+def unsigned(x: int) -> int:
+    return x % 2**64
+
+class Machine:
+    """Executes the few x86-64 instructions the arithmetic intrinsics emit."""
+    registers: dict[str, int]
+    memory: dict[str, int]
+
+    def __init__(self, memory: dict[str, int]) -> None:
+        self.registers = {'%rax': 0, '%rcx': 0, '%rdx': 0}
+        self.memory = memory
+
+    def read(self, operand: str) -> int:
+        if operand.startswith('$'):
+            return wrap(int(operand[1:]))
+        if operand in self.registers:
+            return self.registers[operand]
+        return self.memory[operand]
+
+    def write(self, operand: str, value: int) -> None:
+        if operand in self.registers:
+            self.registers[operand] = wrap(value)
+        else:
+            self.memory[operand] = wrap(value)
+
+    def run(self, lines: list[str]) -> None:
+        for line in lines:
+            op, _, rest = line.partition(' ')
+            lea = re.fullmatch(r'\((%\w+),(%\w+),(\d)\), (%\w+)', rest)
+            args = [arg.strip() for arg in rest.split(',')] if rest else []
+            match op:
+                case 'movq' | 'movabsq':
+                    self.write(args[1], self.read(args[0]))
+                case 'addq':
+                    self.write(args[1], self.read(args[1]) + self.read(args[0]))
+                case 'subq':
+                    self.write(args[1], self.read(args[1]) - self.read(args[0]))
+                case 'andq':
+                    self.write(args[1], self.read(args[1]) & self.read(args[0]))
+                case 'xorq':
+                    self.write(args[1], self.read(args[1]) ^ self.read(args[0]))
+                case 'negq':
+                    self.write(args[0], -self.read(args[0]))
+                case 'shlq':
+                    self.write(args[1], self.read(args[1]) << self.read(args[0]))
+                case 'sarq':
+                    self.write(args[1], self.read(args[1]) >> self.read(args[0]))
+                case 'shrq':
+                    self.write(args[1], unsigned(self.read(args[1])) >> self.read(args[0]))
+                case 'leaq':
+                    assert lea is not None, line
+                    base, index, scale, dest = lea.groups()
+                    self.write(dest, self.read(base) + self.read(index) * int(scale))
+                case 'imulq' if len(args) == 1:
+                    product = self.registers['%rax'] * self.read(args[0])
+                    self.write('%rax', product)
+                    self.write('%rdx', product >> 64)
+                case 'imulq' if len(args) == 2:
+                    self.write(args[1], self.read(args[1]) * self.read(args[0]))
+                case 'imulq':
+                    self.write(args[2], self.read(args[1]) * self.read(args[0]))
+                case _:
+                    raise Exception(f'Cannot execute {line}')
+
+def evaluate(op: str, x: int, constant: int, constant_first: bool = False, nonnegative: bool = False) -> int:
+    lines: list[str] = []
+    refs = ['-16(%rbp)', '-8(%rbp)'] if constant_first else ['-8(%rbp)', '-16(%rbp)']
+    all_intrinsics[op](IntrinsicArgs(
+        arg_refs=refs,
+        result_register='%rax',
+        emit=lines.append,
+        arg_constants=[constant, None] if constant_first else [None, constant],
+        arg_nonnegative=[nonnegative]
+    ))
+    assert not any(line.startswith('idivq') for line in lines), lines
+    machine = Machine({'-8(%rbp)': x, '-16(%rbp)': constant})
+    machine.run(lines)
+    return machine.registers['%rax']
+
+def divisors() -> list[int]:
+    result = set(range(-1000, 1001))
+    for k in range(1, 63):
+        for d in [2**k - 1, 2**k, 2**k + 1]:
+            result.update([d, -d])
+    result.update([INT_MAX, INT_MIN + 1, 10**9 + 7, -(10**18)])
+    return sorted(d for d in result if d not in [0, -1] and INT_MIN < d <= INT_MAX)
+
+def dividends(d: int) -> list[int]:
+    result = {0, 1, -1, 2, -2, INT_MIN, INT_MIN + 1, INT_MAX, INT_MAX - 1, 12345, -12345}
+    for q in [1, 2, 3, 7, 1000, INT_MAX // max(abs(d), 1)]:
+        for r in [-1, 0, 1]:
+            result.update([wrap(q*d + r), wrap(-q*d + r)])
+    return sorted(result)
+
+class StrengthReductionTest(unittest.TestCase):
+    def test_division_matches_idivq(self) -> None:
+        for d in divisors():
+            for x in dividends(d):
+                assert evaluate('/', x, d) == truncating_division(x, d), (x, d)
+
+    def test_remainder_matches_idivq(self) -> None:
+        for d in divisors():
+            for x in dividends(d):
+                assert evaluate('%', x, d) == x - d*truncating_division(x, d), (x, d)
+
+    def test_nonnegative_dividends_match_idivq(self) -> None:
+        for d in divisors():
+            for x in dividends(d):
+                if x >= 0:
+                    assert evaluate('/', x, d, nonnegative=True) == truncating_division(x, d), (x, d)
+                    assert evaluate('%', x, d, nonnegative=True) == x - d*truncating_division(x, d), (x, d)
+
+    def test_multiplication_wraps_like_imulq(self) -> None:
+        factors = [0, 1, -1, 2, 3, 5, 9, -3, -5, -9, 10, 2**31 - 1, -2**31, 2**31, 2**40, -2**62, INT_MAX, INT_MIN]
+        for c in factors + list(range(-70, 71)):
+            for x in [0, 1, -1, 7, -7, INT_MAX, INT_MIN, 2**32 + 3, -(2**40)]:
+                assert evaluate('*', x, c) == wrap(x * c), (x, c)
+                assert evaluate('*', x, c, constant_first=True) == wrap(x * c), (x, c)
+
+    def test_magic_numbers_of_known_divisors(self) -> None:
+        # Values from Hacker's Delight, table 10-2
+        assert magic_numbers(3) == (0x5555555555555556, 0)
+        assert magic_numbers(7) == (0x4924924924924925, 1)
+        assert magic_numbers(-3) == (0x5555555555555555, 1)
+        assert magic_numbers(-5) == (-0x6666666666666667, 1)
+
+    def test_division_by_zero_and_minus_one_is_left_to_idivq(self) -> None:
+        for d in [0, -1, INT_MIN]:
+            lines: list[str] = []
+            all_intrinsics['/'](IntrinsicArgs(['-8(%rbp)', '-16(%rbp)'], '%rax', lines.append, [None, d]))
+            assert any(line.startswith('idivq') for line in lines)
+
+    def test_nonnegative_dividends_skip_the_sign_fix_up(self) -> None:
+        source = 'var x = read_int(); if x >= 0 then { print_int(x / 8); print_int(x % 8) }; print_int(x / 8); 0'
+        module = parse(tokenize(source))
+        typecheck_module(module, get_global_symbol_table_types())
+        assembly = generate_ns_assembly(generate_ir(generate_root_var_types(), module), reduce_strength=True)
+        # Only the division after the check needs to round negative dividends toward zero
+        assert assembly.count('sarq $63') == 1
+        assert 'andq $7, %rax' in assembly
+        assemble(assembly, 'nonnegative_dividends_out')
+        try:
+            outputs = [
+                subprocess.run([f'{os.getcwd()}/nonnegative_dividends_out'], input=f'{x}\n', capture_output=True, text=True).stdout
+                for x in [29, 0, -29]
+            ]
+        finally:
+            os.remove('nonnegative_dividends_out')
+        assert outputs == ['3\n5\n3\n0\n', '0\n0\n0\n0\n', '-3\n0\n']
+
+    def test_native_code_matches(self) -> None:
+        # Negative literals are not constants in the IR, they negate a constant at run time
+        cases = [(x, d) for d in [2, 3, 7, 10, 16, 64, 1000] for x in [0, 5, -5, 99, -99, 1000000007, -1000000007]]
+        source = ''.join(f'print_int({x} / {d}); print_int({x} % {d}); print_int({x} * {d});' for x, d in cases) + '0'
+        module = parse(tokenize(source))
+        typecheck_module(module, get_global_symbol_table_types())
+        assembly = generate_ns_assembly(generate_ir(generate_root_var_types(), module), reduce_strength=True)
+        assert 'idivq' not in assembly
+        assemble(assembly, 'strength_reduction_out')
+        try:
+            output = subprocess.run([f'{os.getcwd()}/strength_reduction_out'], capture_output=True, text=True).stdout
+        finally:
+            os.remove('strength_reduction_out')
+        expected = ''.join(f'{truncating_division(x, d)}\n{x - d*truncating_division(x, d)}\n{x * d}\n' for x, d in cases) + '0\n'
+        assert output == expected
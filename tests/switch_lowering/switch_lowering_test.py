@@ -0,0 +1,73 @@
+import os
+import subprocess
+from compiler.assembler import assemble
+from compiler.assembly_generator import generate_ns_assembly
+from compiler.ir import Call, Instruction, JumpTable
+from compiler.optimizer import optimize, simplify
+from compiler.switch_lowering import lower_switches
+from tests.helpers import compile, run
+
+import unittest
+
+def comparisons(instructions: list[Instruction], op: str) -> int:
+    return len([insn for insn in instructions if isinstance(insn, Call) and insn.fun.name == op])
+
+def chain(cases: list[int]) -> str:
+    arms = ' else '.join(f'if op == {k} then {10 * i + 1}' for i, k in enumerate(cases))
+    return f'var op = read_int(); print_int({arms} else 0)'
+
+class SwitchLoweringTest(unittest.TestCase):
+    def test_dense_chains_become_jump_tables(self) -> None:
+        source = chain([3, 1, 2, 6, 4])
+        ns_ins = simplify(lower_switches(compile(source)))
+        tables = [insn for insn in ns_ins['main'] if isinstance(insn, JumpTable)]
+        assert len(tables) == 1
+        assert tables[0].low == 1 and len(tables[0].labels) == 6
+        assert comparisons(ns_ins['main'], '==') == 0
+        for op in range(-2, 9):
+            assert run(ns_ins, [op]) == run(compile(source), [op]), op
+
+    def test_sparse_chains_become_comparison_trees(self) -> None:
+        cases = [1000, -7, 3, 90, 250, 12, 7000, 5]
+        source = chain(cases)
+        ns_ins = simplify(lower_switches(compile(source)))
+        assert not any(isinstance(insn, JumpTable) for insn in ns_ins['main'])
+        assert comparisons(ns_ins['main'], '<') == 1
+        for op in cases + [-8, 0, 4, 6, 91, 7001]:
+            assert run(ns_ins, [op]) == run(compile(source), [op]), op
+
+    def test_keeps_short_and_mixed_chains(self) -> None:
+        for source in [
+            chain([1, 2, 3]),
+            'var a = read_int(); var b = read_int(); print_int(if a == 1 then 1 else if b == 2 then 2 else if a == 3 then 3 else if a == 4 then 4 else 0)',
+            'var a = read_int(); if a == 1 then print_int(1) else { print_int(0); if a == 2 then print_int(2) else if a == 3 then print_int(3) else if a == 4 then print_int(4) }',
+        ]:
+            ns_ins = compile(source)
+            assert lower_switches(ns_ins) == ns_ins, source
+
+    def test_stops_at_repeated_constants(self) -> None:
+        source = chain([1, 2, 3, 4, 2, 5])
+        ns_ins = simplify(lower_switches(compile(source)))
+        table = next(insn for insn in ns_ins['main'] if isinstance(insn, JumpTable))
+        assert len(table.labels) == 4
+        for op in range(0, 7):
+            assert run(ns_ins, [op]) == run(compile(source), [op]), op
+
+    def test_jump_tables_run_natively(self) -> None:
+        source = '''
+            var i = -3; var s = 0;
+            while i < 12 do {
+                s = s * 3 + (if i == 0 then 1 else if i == 1 then 5 else if i == 2 then 7 else if i == 4 then 2 else if i == 5 then 9 else 4);
+                s = s % 1000003;
+                i = i + 1;
+            }
+            print_int(s);
+        '''
+        assembly = generate_ns_assembly(optimize(compile(source), 1))
+        assert '.section .rodata' in assembly and 'jmp *%rdx' in assembly
+        assemble(assembly, 'switch_lowering_out')
+        try:
+            output = subprocess.run([f'{os.getcwd()}/switch_lowering_out'], capture_output=True, text=True).stdout
+        finally:
+            os.remove('switch_lowering_out')
+        assert output == run(compile(source))
@@ -0,0 +1,45 @@
+import os
+import subprocess
+from compiler.assembler import assemble
+from compiler.assembly_generator import generate_ns_assembly
+from compiler.ir import Call, Instruction
+from compiler.tail_calls import eliminate_tail_calls
+from tests.helpers import compile, run
+
+import unittest
+
+def calls(instructions: list[Instruction], name: str) -> int:
+    return len([insn for insn in instructions if isinstance(insn, Call) and insn.fun.name == name])
+
+class TailCallsTest(unittest.TestCase):
+    def test_self_tail_call_becomes_jump(self) -> None:
+        ns_ins = eliminate_tail_calls(compile('fun g(x: Int): Int { if x < 10 then g(x+1) else x } g(read_int())'))
+        assert calls(ns_ins['g'], 'g') == 0
+        assert run(ns_ins, [3]) == '10\n'
+
+    def test_arguments_are_assigned_in_parallel(self) -> None:
+        source = 'fun gcd(a: Int, b: Int): Int { if b == 0 then a else gcd(b, a % b) } gcd(read_int(), read_int())'
+        ns_ins = eliminate_tail_calls(compile(source))
+        assert calls(ns_ins['gcd'], 'gcd') == 0
+        assert run(ns_ins, [84, 36]) == '12\n'
+
+    def test_keeps_calls_not_in_tail_position(self) -> None:
+        source = 'fun fact(n: Int): Int { if n <= 1 then 1 else n * fact(n - 1) } fact(read_int())'
+        ns_ins = eliminate_tail_calls(compile(source))
+        assert calls(ns_ins['fact'], 'fact') == 1
+        assert run(ns_ins, [5]) == '120\n'
+
+    def test_keeps_functions_taking_addresses(self) -> None:
+        source = 'fun f(n: Int, p: Int*): Int { var x = n; if n == 0 then *p else f(n - 1, &x) } var y = 7; f(2, &y)'
+        ns_ins = eliminate_tail_calls(compile(source))
+        assert calls(ns_ins['f'], 'f') == 1
+        assert run(ns_ins) == '1\n'
+
+    def test_deep_recursion_runs_natively(self) -> None:
+        source = 'fun count(n: Int, acc: Int): Int { if n == 0 then acc else count(n - 1, acc + 2) } count(read_int() + 10000000, 0)'
+        assemble(generate_ns_assembly(eliminate_tail_calls(compile(source))), 'tail_calls_out')
+        try:
+            output = subprocess.run([f'{os.getcwd()}/tail_calls_out'], input='0\n', capture_output=True, text=True).stdout
+        finally:
+            os.remove('tail_calls_out')
+        assert output == '20000000\n'
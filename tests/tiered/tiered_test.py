@@ -0,0 +1,74 @@
+import io
+from compiler.ast import Module
+from compiler.parser import parse
+from compiler.tiered import TieredRunner
+from compiler.tokenizer import tokenize
+from compiler.type_checker import typecheck_module
+from compiler.types import get_global_symbol_table_types
+
+import unittest
+import unittest.mock
+
+def p(input: str) -> Module:
+    parsed = parse(tokenize(input))
+    typecheck_module(parsed, get_global_symbol_table_types())
+    return parsed
+
+class TieredTest(unittest.TestCase):
+    def test_cold_function_stays_interpreted(self) -> None:
+        runner = TieredRunner(threshold=10)
+        assert runner.run(p('fun f(x: Int): Int { x+1 } f(1)')) == 2
+        assert runner.functions['f'].native is None
+
+    def test_hot_function_is_promoted(self) -> None:
+        runner = TieredRunner(threshold=10)
+        result = runner.run(p('fun f(x: Int): Int { x+1 } var i = 0; while i < 50 do { i = f(i) }; i'))
+        assert result == 50
+        assert runner.functions['f'].native is not None
+
+    def test_callees_are_promoted_together(self) -> None:
+        runner = TieredRunner(threshold=5)
+        result = runner.run(p('fun sq(x: Int): Int { x*x } fun f(x: Int, y: Int): Int { sq(x) + sq(y) } var s = 0; var i = 0; while i < 20 do { s = s + f(i, 2); i = i + 1 }; s'))
+        assert result == sum(i*i + 4 for i in range(20))
+        assert runner.functions['f'].native is not None
+        assert runner.functions['sq'].native is not None
+
+    def test_bool_function_is_promoted(self) -> None:
+        runner = TieredRunner(threshold=3)
+        result = runner.run(p('fun even(x: Int): Bool { x % 2 == 0 } var c = 0; var i = -7; while i < 8 do { if even(i) then c = c + 1; i = i + 1 }; c'))
+        assert result == 7
+        assert runner.functions['even'].native is not None
+
+    def test_back_edges_count_towards_hotness(self) -> None:
+        runner = TieredRunner(threshold=100)
+        runner.run(p('fun f(n: Int): Int { var i = 0; while i < n do i = i + 1; i } f(500); f(1)'))
+        assert runner.functions['f'].back_edges == 500
+        assert runner.functions['f'].native is not None
+
+    def test_native_division_matches_interpreter(self) -> None:
+        runner = TieredRunner(threshold=1)
+        assert runner.run(p('fun d(x: Int, y: Int): Int { x / y } d(1, 1); d(-7, 2)')) == -3
+
+    @unittest.mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_impure_function_is_not_promoted(self, mock_stdout: io.StringIO) -> None:
+        runner = TieredRunner(threshold=2)
+        runner.run(p('fun f(x: Int): Int { print_int(x); x } f(1); f(2); f(3)'))
+        assert runner.functions['f'].native is None
+        assert 'f' in runner.rejected
+        self.assertEqual(mock_stdout.getvalue(), '1\n2\n3\n')
+
+    def test_function_reading_globals_is_not_promoted(self) -> None:
+        runner = TieredRunner(threshold=1)
+        assert runner.run(p('var g = 3; fun f(x: Int): Int { x + g } f(1); f(2)')) == 5
+        assert runner.functions['f'].native is None
+
+    def test_function_named_main_is_promoted(self) -> None:
+        runner = TieredRunner(threshold=5)
+        assert runner.run(p('fun main(x: Int): Int { x + 1 } var i = 0; while i < 20 do i = main(i); i')) == 20
+        assert runner.functions['main'].native is not None
+
+    def test_tiers_agree_on_overflow(self) -> None:
+        runner = TieredRunner(threshold=3)
+        result = runner.run(p('fun sq(x: Int): Int { x * x + 1 } var before = sq(4294967296); sq(1); sq(1); sq(1); var after = sq(4294967296); before == after'))
+        assert result is True
+        assert runner.functions['sq'].native is not None
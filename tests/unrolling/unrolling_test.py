@@ -0,0 +1,59 @@
+from compiler.ir import Instruction, Label
+from compiler.unrolling import trip_count, unroll_loops
+from tests.helpers import compile, run
+
+import unittest
+
+def loops(instructions: list[Instruction]) -> list[str]:
+    return [insn.name for insn in instructions if isinstance(insn, Label) and insn.name.startswith('while_start')]
+
+class UnrollingTest(unittest.TestCase):
+    def test_trip_count(self) -> None:
+        assert trip_count('<', True, bound=8, init=0, step=1) == 8
+        assert trip_count('<=', True, bound=8, init=0, step=3) == 3
+        assert trip_count('>', True, bound=0, init=10, step=-2) == 5
+        assert trip_count('>', False, bound=10, init=0, step=1) == 10
+        assert trip_count('!=', True, bound=12, init=0, step=3) == 4
+        assert trip_count('<', True, bound=0, init=5, step=1) == 0
+        # Never reaches the bound or wraps around
+        assert trip_count('!=', True, bound=5, init=0, step=2) is None
+        assert trip_count('<', True, bound=10, init=0, step=0) is None
+        assert trip_count('<=', True, bound=2**63 - 1, init=0, step=1) is None
+
+    def test_fully_unrolls_small_loops(self) -> None:
+        ns_ins = unroll_loops(compile('var i = 0; var s = 0; while i < 8 do { s = s + i; i = i + 1 }; s'))
+        assert loops(ns_ins['main']) == []
+        assert run(ns_ins) == '28\n'
+
+    def test_partially_unrolls_large_loops(self) -> None:
+        for bound in range(0, 40):
+            for step in [1, 2, 3, 7]:
+                source = f'var k = read_int(); var i = 0; var s = 0; while i < {bound} do {{ s = s + i * k; i = i + {step} }}; s'
+                ns_ins = unroll_loops(compile(source), budget=12)
+                assert run(ns_ins, [3]) == run(compile(source), [3]), source
+
+    def test_peels_remainder_before_loop(self) -> None:
+        source = 'var i = 0; var s = 0; while i < 1000 do { print_int(i); i = i + 1 }; s'
+        ns_ins = unroll_loops(compile(source))
+        assert loops(ns_ins['main']) == ['while_start1']
+        assert run(ns_ins) == ''.join(f'{i}\n' for i in range(1000)) + '0\n'
+
+    def test_unrolls_nested_loops(self) -> None:
+        source = 'var i = 0; var s = 0; while i < 3 do { var j = 0; while j < 3 do { s = s * 2 + i + j; j = j + 1 }; i = i + 1 }; s'
+        ns_ins = unroll_loops(compile(source), budget=200)
+        assert loops(ns_ins['main']) == []
+        assert run(ns_ins) == run(compile(source))
+
+    def test_leaves_loops_that_exit_early(self) -> None:
+        for source in [
+            'var i = 0; while i < 8 do { if i == 3 then break; i = i + 1 }; i',
+            'var i = 0; var s = 0; while i < 8 do { i = i + 1; if i == 3 then continue; s = s + i; i = i + 0 }; s',
+            'var i = 0; var s = 0; while i < 8 do { s = s + i; if s > 3 then i = i + 2; i = i + 1 }; s',
+        ]:
+            ns_ins = unroll_loops(compile(source))
+            assert loops(ns_ins['main']) == ['while_start1'], source
+            assert run(ns_ins) == run(compile(source))
+
+    def test_budget_of_zero_turns_unrolling_off(self) -> None:
+        source = 'var i = 0; while i < 2 do { i = i + 1 }; i'
+        assert loops(unroll_loops(compile(source), budget=0)['main']) == ['while_start1']
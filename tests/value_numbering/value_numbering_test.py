@@ -0,0 +1,48 @@
+from typing import Dict
+from compiler.ir import Call, Instruction
+from compiler.optimizer import simplify
+from compiler.value_numbering import eliminate_common_subexpressions
+from tests.helpers import compile, run
+
+import unittest
+
+def optimize(source: str) -> Dict[str, list[Instruction]]:
+    return simplify(eliminate_common_subexpressions(compile(source)))
+
+def calls(ns_ins: Dict[str, list[Instruction]], fun: str) -> int:
+    return len([insn for instructions in ns_ins.values() for insn in instructions if isinstance(insn, Call) and insn.fun.name == fun])
+
+class ValueNumberingTest(unittest.TestCase):
+    def test_reuses_loads_through_the_same_pointer(self) -> None:
+        ns_ins = optimize('var x: Int = 5; var y: Int* = &x; var z: Int = *y * *y; z')
+        assert calls(ns_ins, 'unary_*') == 1
+        assert run(ns_ins) == '25\n'
+
+    def test_reuses_commutative_operations(self) -> None:
+        ns_ins = optimize('var a = read_int(); var b = read_int(); print_int(a * b); print_int(b * a); 0')
+        assert calls(ns_ins, '*') == 1
+        assert run(ns_ins, [3, 4]) == '12\n12\n0\n'
+
+    def test_reuses_values_from_dominating_blocks(self) -> None:
+        ns_ins = optimize('var a = read_int(); var b = a + 1; if a > 0 then { print_int(a + 1) }; b')
+        assert calls(ns_ins, '+') == 1
+        assert run(ns_ins, [1]) == '2\n2\n'
+
+    def test_does_not_reuse_values_from_sibling_blocks(self) -> None:
+        ns_ins = optimize('var a = read_int(); if a > 0 then { print_int(a + 1) } else { print_int(a - 1) }; a + 1')
+        assert calls(ns_ins, '+') == 2
+
+    def test_pointer_writes_make_loads_unavailable(self) -> None:
+        ns_ins = optimize('var x = 1; var p = &x; var a = *p; *p = 2; var b = *p; a + b')
+        assert calls(ns_ins, 'unary_*') == 2
+        assert run(ns_ins) == '3\n'
+
+    def test_calls_make_loads_unavailable(self) -> None:
+        source = 'fun set(p: Int*): Unit { *p = 7; } var x = 1; var p = &x; var a = *p; set(p); var b = *p; a + b'
+        ns_ins = optimize(source)
+        assert calls(ns_ins, 'unary_*') == 2
+        assert run(ns_ins) == '8\n'
+
+    def test_address_taken_operands_are_not_reused_across_writes(self) -> None:
+        ns_ins = optimize('var x = 1; var p = &x; var a = x + 1; *p = 5; var b = x + 1; a + b')
+        assert run(ns_ins) == '8\n'